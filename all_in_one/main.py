@@ -0,0 +1,65 @@
+import logging
+from core.services import background_service as bt
+from core.services import gpt_service as gpt
+from core.services import metrics_service as metrics
+from core.services.parse_service import parse_pool
+from core.services.pipeline_service import pipeline
+from url_validation.main import app
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# All-in-one runner: serves url_validation's /start and runs the HTML and GPT phases in this process through
+# the in-memory dispatcher instead of the facilitate-requests -> html-processing -> gpt-processing HTTP chain.
+# Deploy with SERVICE_NAME=all_in_one; small deployments and load tests skip every service-to-service hop.
+pipeline.mode = "inprocess"
+
+# The HTML and GPT phases run here too: export their counters on url_validation's /metrics
+metrics.registry.register_collector("parse_pool", parse_pool.stats)
+metrics.registry.register_collector("recipe_cache", bt.recipe_cache.stats)
+metrics.registry.register_collector("gpt_cache", gpt.gpt_cache.stats)
+metrics.registry.register_collector("gpt_batch", gpt.ingredient_batcher.stats)
+metrics.registry.register_collector("singleflight_scrape", bt.scrape_flight.stats)
+metrics.registry.register_collector("singleflight_gpt", gpt.gpt_flight.stats)
+
+@app.on_event("startup")
+async def start_phases():
+    # Register the phase handlers and start the parse workers used by the HTML phase
+    pipeline.start()
+    parse_pool.start()
+    # The GPT phase runs here too: create its OpenAI client off the request path
+    gpt.warm_openai_client()
+
+@app.on_event("shutdown")
+async def stop_phases():
+    parse_pool.shutdown()
+    await gpt.close_openai_client()
+
+# Route to report parse pool queue depth and latency
+@app.get("/parse-pool/stats")
+async def parse_pool_stats():
+    return parse_pool.stats()
+
+# Route to report shared recipe cache hit/miss counters
+@app.get("/recipe-cache/stats")
+async def recipe_cache_stats():
+    return bt.recipe_cache.stats()
+
+# Route to report GPT memoization hit/miss counters
+@app.get("/gpt-cache/stats")
+async def gpt_cache_stats():
+    return gpt.gpt_cache.stats()
+
+# Route to report how ingredient lines from concurrent standardizations were micro-batched
+@app.get("/gpt-batch/stats")
+async def gpt_batch_stats():
+    return gpt.ingredient_batcher.stats()
+
+# Route to report how many scrapes and standardizations were coalesced into another in-flight call
+@app.get("/singleflight/stats")
+async def singleflight_stats():
+    return {"scrape": bt.scrape_flight.stats(), "gpt": gpt.gpt_flight.stats()}
+
+# This block is executed when running the script directly, starting the FastAPI app using Uvicorn
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,124 @@
+"""
+Encode/decode time and bytes stored for the Redis value codecs, on the values the pipeline stores per page.
+
+For every recorded page in benchmarks/fixtures/pages the benchmark builds what a session writes to Redis:
+the submission, the processed_html record field, the recipe cache entry and clean_processed_data (standardized
+with the local ingredient parser and nutrition normalizer, as the model would return it). Each value is then
+encoded with every codec and compression combination, and decoded back.
+
+    legacy   json.dumps strings, as stored before the codec existed
+    json     orjson (standard library json when orjson is missing) behind the version header
+    msgpack  msgpack behind the version header
+
+Compression applies to encoded values of at least --threshold bytes. zstd needs the zstandard package and msgpack
+the msgpack package; unavailable combinations are skipped.
+
+Usage:
+    python -m benchmarks.bench_codec [--repeat 2000] [--threshold 512] [--level 3]
+"""
+import argparse
+import time
+
+from benchmarks.bench_pipeline import load_fixtures, mock_reply
+from core.services.codec_service import ValueCodec
+from core.services.jsonld_service import JsonLdIndex, LdJsonScanner
+
+CODECS = (("legacy", "none"), ("json", "none"), ("json", "zlib"), ("json", "zstd"),
+          ("msgpack", "none"), ("msgpack", "zlib"), ("msgpack", "zstd"))
+
+
+def session_values(shape, page):
+    """Return {value name: value} for what one session stores in Redis for a page."""
+    scanner = LdJsonScanner()
+    scanner.feed(page)
+    index = JsonLdIndex.from_scripts(scanner.close())
+    recipe_image, recipe_name, recipe_video_url = index.recipe_image_name_video()
+    url = f"https://recipes.example.com/{shape}/1"
+    ingredients, nutrition = index.recipe_ingredients(), index.recipe_nutrition()
+
+    fields = {
+        "recipe_image": recipe_image, "recipe_name": recipe_name, "recipe_video_url": recipe_video_url,
+        "recipe_ingredients_raw": ingredients, "recipe_nutrition_raw": nutrition,
+    }
+    session = {"user_id": "bench-user", "session_id": f"bench-{shape}", "recipe_url": url}
+    return {
+        "submission": {"session_id": f"bench-{shape}", "url": url, "user_id": "bench-user"},
+        "processed_html": {**session, **fields, "bucket": "raw_processed_data"},
+        "recipe_cache": {"url": url, "fields": fields, "etag": '"5f3c-1a2b"', "last_modified": None,
+                         "stored_at": time.time()},
+        "clean_processed_data": {
+            **session, "recipe_name": recipe_name, "recipe_image": recipe_image, "recipe_video_url": recipe_video_url,
+            "recipe_ingredients_clean": mock_reply(f"Here's the ingredients: {ingredients}"),
+            "recipe_nutrition_clean": mock_reply(f"Here's the nutrition: {nutrition}"),
+            "bucket": "clean_processed_data",
+        },
+    }
+
+
+def measure(codec, values, repeat):
+    """
+    Encode and decode every value repeat times.
+
+    :return: A tuple (stored bytes per value name, mean encode µs per value, mean decode µs per value).
+    """
+    encoded = {name: codec.encode(value) for name, value in values}
+    for (name, value) in values:
+        if codec.decode(encoded[name]) != value:
+            raise AssertionError(f"{codec.serializer}/{codec.compression} does not round-trip {name}")
+
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        for _, value in values:
+            codec.encode(value)
+    encode_us = (time.perf_counter() - started_at) / (repeat * len(values)) * 1e6
+
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        for data in encoded.values():
+            codec.decode(data)
+    decode_us = (time.perf_counter() - started_at) / (repeat * len(values)) * 1e6
+
+    sizes = {}
+    for (name, _), data in zip(values, encoded.values()):
+        kind = name.split("/")[1]
+        sizes[kind] = sizes.get(kind, 0) + len(data)
+    return sizes, encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="Encode/decode passes over the corpus")
+    parser.add_argument("--threshold", type=int, default=512, help="Compress encoded values of at least this many bytes")
+    parser.add_argument("--level", type=int, default=3, help="zlib/zstd compression level")
+    args = parser.parse_args()
+
+    values = [
+        (f"{shape}/{name}", value)
+        for shape, page in load_fixtures().items()
+        for name, value in session_values(shape, page).items()
+    ]
+    print(f"{len(values)} values from {len(values) // 4} pages, {args.repeat} passes, threshold {args.threshold} bytes")
+
+    kinds = ["submission", "processed_html", "recipe_cache", "clean_processed_data"]
+    print(f"{'codec':<15} {'encode µs':>10} {'decode µs':>10} {'total B':>9} {'vs legacy':>10}  " +
+          " ".join(f"{kind:>20}" for kind in kinds))
+    baseline = None
+    for serializer, compression in CODECS:
+        try:
+            codec = ValueCodec(serializer, compression, args.threshold, args.level)
+        except ValueError as e:
+            print(f"{serializer + '/' + compression:<15} skipped: {e}")
+            continue
+        if (codec.serializer, codec.compression) != (serializer, compression):
+            print(f"{serializer + '/' + compression:<15} skipped: not installed")
+            continue
+
+        sizes, encode_us, decode_us = measure(codec, values, args.repeat)
+        total = sum(sizes.values())
+        baseline = baseline or total
+        print(f"{serializer + '/' + compression:<15} {encode_us:>10.1f} {decode_us:>10.1f} {total:>9} "
+              f"{total / baseline:>9.0%}  " + " ".join(f"{sizes[kind]:>20}" for kind in kinds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Cold-start benchmark for the four service entry points.
+
+Each service is measured in fresh processes, the way a new instance starts on scale-out:
+
+    import          importing {service}.main in a bare interpreter (and which heavy packages it loads)
+    ready           from launching uvicorn to the port accepting connections: interpreter start, imports
+                    and the startup handlers (uvicorn binds the port once they have run)
+    first request   the first real request once the port is open
+    first result    html_processing only: until the first scrape, run by a worker after the response,
+                    has stored the processed recipe
+
+Redis is a fakeredis TCP server and the recipe page and the OpenAI API are bench_pipeline's local mocks, so it
+runs without network access. The services run with PIPELINE_MODE=stream, the only mode whose next hop is
+local (in http mode the service URLs are the deployed Cloud Run addresses).
+
+Requires fakeredis: pip install -r requirements-bench.txt
+
+Usage:
+    python -m benchmarks.bench_cold_start [--runs 5] [--service all]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.bench_pipeline import LocalServers, load_fixtures
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICES = ("url_validation", "facilitate_requests", "html_processing", "gpt_processing")
+HEAVY_MODULES = ("openai", "httpx", "aiohttp", "bs4")
+
+IMPORT_PROBE = """
+import json, sys, time
+started_at = time.perf_counter()
+import {service}.main
+print(json.dumps({{"seconds": time.perf_counter() - started_at, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_redis():
+    """Serve an empty fakeredis server over TCP from a background thread; return its port."""
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    threading.Thread(target=server.serve_forever, name="bench-redis", daemon=True).start()
+    return server.server_address[1]
+
+
+def post(port, path, payload):
+    """POST JSON to a local service and return (status, seconds)."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    started_at = time.perf_counter()
+    connection.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    elapsed = time.perf_counter() - started_at
+    connection.close()
+    return response.status, elapsed
+
+
+class ColdStart:
+    """Launches each service in a fresh process against the shared local Redis, pages and mock OpenAI."""
+
+    def __init__(self, servers, redis_port):
+        import redis
+
+        self.servers = servers
+        self.redis = redis.Redis(port=redis_port, decode_responses=True)
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "REDIS_HOST": "127.0.0.1",
+            "REDIS_PORT": str(redis_port),
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": servers.openai_url,
+            "PIPELINE_MODE": "stream",
+            # Every run's first GPT request reaches the model, as on a fresh deployment
+            "GPT_CACHE_ENABLED": "false",
+        }
+        self.runs = 0
+
+    def measure_import(self, service):
+        """Import {service}.main in a bare interpreter; return (seconds, heavy modules loaded)."""
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(service=service, heavy=HEAVY_MODULES)],
+            env=self.env, cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        return probe["seconds"], probe["loaded"]
+
+    def measure_start(self, service, verbose=False):
+        """Launch the service and time it to ready, to its first response and (html_processing) its first result."""
+        self.runs += 1
+        session_id = f"cold-{service}-{self.runs}"
+        port = free_port()
+        output = None if verbose else subprocess.DEVNULL
+
+        started_at = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{service}.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            env=self.env, cwd=ROOT, stdout=output, stderr=output,
+        )
+        try:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{service} exited with {process.returncode} before accepting connections")
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.05).close()
+                    break
+                except OSError:
+                    time.sleep(0.005)
+            ready = time.perf_counter() - started_at
+
+            path, payload = self.first_request(service, session_id)
+            status, first_request = post(port, path, payload)
+            if status != 200:
+                raise RuntimeError(f"{service} answered {status} to its first request")
+
+            first_result = None
+            if service == "html_processing":
+                deadline = time.monotonic() + 60
+                while not self.redis.hexists(f"temp:{session_id}:record", "processed_html"):
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("html_processing stored no result within 60s")
+                    time.sleep(0.005)
+                first_result = time.perf_counter() - started_at - ready
+            return ready, first_request, first_result
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def first_request(self, service, session_id):
+        """Return the (path, payload) of a typical first request for the service, preparing any state it reads."""
+        url = self.servers.page_url(self.runs)
+        if service == "url_validation":
+            return "/start", {"user_id": "bench", "session_id": session_id, "url": url}
+        if service == "facilitate_requests":
+            return "/pubsub/events", {"user_id": "bench", "session_id": session_id, "url": url, "phase": "validation_complete"}
+        if service == "html_processing":
+            return "/process-html", {"user_id": "bench", "session_id": session_id, "url": url}
+
+        # gpt_processing reads the processed page the HTML phase stored; one ingredient line goes to the model
+        from core.services.jsonld_service import JsonLdIndex, LdJsonScanner
+
+        scanner = LdJsonScanner()
+        scanner.feed(self.servers.fixtures["list"])
+        index = JsonLdIndex.from_scripts(scanner.close())
+        recipe_image, recipe_name, recipe_video_url = index.recipe_image_name_video()
+        processed_html = {
+            "user_id": "bench", "session_id": session_id, "recipe_url": url, "recipe_name": recipe_name,
+            "recipe_image": recipe_image, "recipe_video_url": recipe_video_url,
+            "recipe_ingredients_raw": index.recipe_ingredients(), "recipe_nutrition_raw": index.recipe_nutrition(),
+        }
+        self.redis.hset(f"temp:{session_id}:record", "processed_html", json.dumps(processed_html))
+        return "/process-gpt", {
+            "user_id": "bench", "session_id": session_id, "recipe_name": recipe_name,
+            "redis_key": "processed_html", "phase": "chat_gpt_ingest",
+        }
+
+
+def summarize(values):
+    """Return "median / max" in ms, or "-" when there is nothing to report."""
+    values = [value for value in values if value is not None]
+    if not values:
+        return "-"
+    return f"{statistics.median(values) * 1000:.0f} / {max(values) * 1000:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=SERVICES + ("all",), default="all", help="Entry point to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per service and measurement")
+    parser.add_argument("--openai-latency", type=float, default=300, help="Mean mock OpenAI latency in ms")
+    parser.add_argument("--verbose", action="store_true", help="Show the services' own output")
+    args = parser.parse_args()
+
+    servers = LocalServers(load_fixtures(), args.openai_latency / 1000, 0)
+    servers.start()
+    bench = ColdStart(servers, start_fake_redis())
+    services = SERVICES if args.service == "all" else (args.service,)
+
+    print(f"{args.runs} runs per service, median / max in ms")
+    print(f"{'service':<21} {'import':>13} {'ready':>13} {'first request':>15} {'first result':>14}  loaded at import")
+    try:
+        for service in services:
+            imports = [bench.measure_import(service) for _ in range(args.runs)]
+            starts = [bench.measure_start(service, args.verbose) for _ in range(args.runs)]
+            print(
+                f"{service:<21} {summarize([seconds for seconds, _ in imports]):>13} "
+                f"{summarize([ready for ready, _, _ in starts]):>13} "
+                f"{summarize([first for _, first, _ in starts]):>15} "
+                f"{summarize([result for _, _, result in starts]):>14}  "
+                f"{', '.join(imports[-1][1]) or '-'}"
+            )
+    finally:
+        servers.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Accuracy and speed benchmark for the local ingredient parser.
+
+Checks every line of the golden corpus (benchmarks/fixtures/ingredients_golden.json) against its expected
+standardized value; an expected value of null means the parser must escalate the line to GPT. Then times
+the parser over the corpus and reports how many lines the fast path handles without a model call.
+
+Usage:
+    python -m benchmarks.bench_ingredient_parser [--rounds 2000] [--threshold 0.8]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from core.services.ingredient_service import DEFAULT_CONFIDENCE_THRESHOLD, parse_ingredient, parse_ingredients
+
+GOLDEN_PATH = Path(__file__).parent / "fixtures" / "ingredients_golden.json"
+
+
+def check_accuracy(corpus, threshold):
+    """Return the list of (line, expected, actual) mismatches against the golden corpus."""
+    mismatches = []
+    for case in corpus:
+        result, confidence = parse_ingredient(case["line"])
+        actual = result if confidence >= threshold else None
+        if actual != case["expected"]:
+            mismatches.append((case["line"], case["expected"], actual))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000, help="Passes over the corpus for the timing run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CONFIDENCE_THRESHOLD, help="Escalation threshold")
+    args = parser.parse_args()
+
+    corpus = json.loads(GOLDEN_PATH.read_text())
+    lines = [case["line"] for case in corpus]
+
+    mismatches = check_accuracy(corpus, args.threshold)
+    for line, expected, actual in mismatches:
+        print(f"MISMATCH {line!r}\n  expected: {expected}\n  actual:   {actual}")
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        _, escalate = parse_ingredients(lines, args.threshold)
+    elapsed = time.perf_counter() - start
+
+    print(f"golden lines:         {len(corpus)}")
+    print(f"accuracy:             {len(corpus) - len(mismatches)}/{len(corpus)}")
+    print(f"parsed locally:       {len(lines) - len(escalate)}/{len(lines)} (rest escalate to GPT)")
+    print(f"parse time:           {elapsed / (args.rounds * len(lines)) * 1e6:.2f} us/line")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
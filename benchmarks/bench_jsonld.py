@@ -0,0 +1,188 @@
+"""
+Per-page CPU benchmark for JSON-LD extraction in RecipeScraper.
+
+Compares the previous extraction path (three find_all scans and three json.loads passes per page,
+plus the recursive VideoObject search) with the shared JsonLdIndex built once per page, and the
+BeautifulSoup tree with the streaming LdJsonScanner.
+
+Usage:
+    python -m benchmarks.bench_jsonld [--pages 200] [--reviews 300]
+"""
+import argparse
+import json
+import time
+
+from bs4 import BeautifulSoup
+
+from core.services.jsonld_service import JsonLdIndex, LdJsonScanner
+
+
+def build_page(reviews=300, filler_kb=300):
+    """Build a synthetic recipe page with a large @graph blob, similar to WordPress recipe plugins."""
+    recipe = {
+        "@type": "Recipe",
+        "@id": "https://example.com/lasagna/#recipe",
+        "name": "Classic Lasagna",
+        "image": ["https://example.com/lasagna-1x1.jpg", "https://example.com/lasagna-16x9.jpg"],
+        "author": [{"@type": "Person", "name": "Jane Cook"}],
+        "recipeCategory": "Main Course",
+        "recipeYield": "8 servings",
+        "recipeIngredient": [f"{i} cups ingredient number {i}, chopped" for i in range(1, 25)],
+        "recipeInstructions": [{"@type": "HowToStep", "text": "Step text " * 40} for _ in range(15)],
+        "nutrition": {
+            "@type": "NutritionInformation",
+            "calories": "448 kcal",
+            "carbohydrateContent": "31 g",
+            "proteinContent": "29 g",
+            "fatContent": "23 g",
+            "sodiumContent": "1040 mg",
+        },
+        "video": {"@type": "VideoObject", "name": "How to make lasagna", "contentUrl": "https://example.com/lasagna.mp4"},
+        "review": [
+            {"@type": "Review", "author": {"@type": "Person", "name": f"Reviewer {i}"}, "reviewBody": "Great! " * 20}
+            for i in range(reviews)
+        ],
+    }
+    graph = {
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "WebSite", "@id": "https://example.com/#website", "name": "Example Kitchen"},
+            {"@type": "WebPage", "@id": "https://example.com/lasagna/", "name": "Classic Lasagna"},
+            {"@type": "BreadcrumbList", "itemListElement": [{"@type": "ListItem", "position": i} for i in range(5)]},
+            recipe,
+        ],
+    }
+    filler = "<div class='ad'><p>" + ("Lorem ipsum dolor sit amet. " * 36) + "</p></div>\n"
+    body = filler * filler_kb
+    return (
+        "<html><head><title>Classic Lasagna</title>"
+        "<script type='application/ld+json'>{\"@context\": \"https://schema.org\", \"@type\": \"Organization\", \"name\": \"Example\"}</script>"
+        f"<script type='application/ld+json'>{json.dumps(graph)}</script>"
+        f"</head><body>{body}</body></html>"
+    )
+
+
+# --- Previous implementation, reproduced verbatim in behaviour for comparison ---
+
+def _legacy_blocks(soup):
+    for script_tag in soup.find_all('script', type='application/ld+json'):
+        script_content = script_tag.string.strip()
+        if script_content.endswith(';'):
+            script_content = script_content[:-1]
+        yield json.loads(script_content)
+
+
+def _legacy_find_video(json_data):
+    if isinstance(json_data, dict):
+        if json_data.get('@type') == 'VideoObject':
+            return json_data.get('contentUrl', None)
+        for value in json_data.values():
+            if isinstance(value, (dict, list)):
+                result = _legacy_find_video(value)
+                if result:
+                    return result
+    elif isinstance(json_data, list):
+        for item in json_data:
+            result = _legacy_find_video(item)
+            if result:
+                return result
+    return None
+
+
+def _legacy_process(json_data):
+    recipe_name, recipe_image = json_data.get('name'), json_data.get('image')
+    recipe_video_url = _legacy_find_video(json_data)
+    for graph_item in json_data.get('@graph', []):
+        graph_type = graph_item.get('@type')
+        if graph_type == "Recipe" or (isinstance(graph_type, list) and "Recipe" in graph_type):
+            recipe_name = graph_item.get('name', recipe_name)
+            recipe_image = graph_item.get('image', recipe_image)
+    if isinstance(recipe_image, list):
+        recipe_image = recipe_image[-1]
+    return recipe_image, recipe_name, recipe_video_url
+
+
+def legacy_extract(soup):
+    image_name_video = None
+    for json_data in _legacy_blocks(soup):
+        items = json_data if isinstance(json_data, list) else [json_data]
+        for item in items:
+            recipe_image, recipe_name, recipe_video_url = _legacy_process(item)
+            if recipe_image and recipe_name:
+                image_name_video = (recipe_image, recipe_name, recipe_video_url)
+                break
+        if image_name_video:
+            break
+
+    ingredients = None
+    for json_data in _legacy_blocks(soup):
+        for graph_item in json_data.get('@graph', []):
+            if 'recipeIngredient' in graph_item:
+                ingredients = graph_item['recipeIngredient']
+                break
+        if ingredients:
+            break
+
+    nutrition = None
+    for json_data in _legacy_blocks(soup):
+        for graph_item in json_data.get('@graph', []):
+            if 'nutrition' in graph_item:
+                nutrition = graph_item['nutrition']
+                break
+        if nutrition:
+            break
+
+    return image_name_video, ingredients, nutrition
+
+
+def indexed_extract(soup):
+    index = JsonLdIndex.from_scripts(tag.string for tag in soup.find_all('script', type='application/ld+json'))
+    return index.recipe_image_name_video(), index.recipe_ingredients(), index.recipe_nutrition()
+
+
+def streamed_extract(page, chunk_size=64 * 1024):
+    scanner = LdJsonScanner()
+    for offset in range(0, len(page), chunk_size):
+        if scanner.feed(page[offset:offset + chunk_size]):
+            break
+    index = JsonLdIndex.from_scripts(scanner.close())
+    return index.recipe_image_name_video(), index.recipe_ingredients(), index.recipe_nutrition()
+
+
+def cpu_time_per_page(extract, soup, pages):
+    start = time.process_time()
+    for _ in range(pages):
+        extract(soup)
+    return (time.process_time() - start) / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="Pages to extract per variant")
+    parser.add_argument("--reviews", type=int, default=300, help="Review nodes in the @graph blob")
+    args = parser.parse_args()
+
+    page = build_page(reviews=args.reviews)
+    soup = BeautifulSoup(page, 'html.parser')
+    ld_json_bytes = sum(len(tag.string) for tag in soup.find_all('script', type='application/ld+json'))
+
+    start = time.process_time()
+    BeautifulSoup(page, 'html.parser')
+    soup_time = time.process_time() - start
+
+    legacy = cpu_time_per_page(legacy_extract, soup, args.pages)
+    indexed = cpu_time_per_page(indexed_extract, soup, args.pages)
+
+    print(f"page size:            {len(page) / 1024:.0f} KB ({ld_json_bytes / 1024:.0f} KB of JSON-LD)")
+    print(f"soup construction:    {soup_time * 1000:.2f} ms CPU/page")
+    print(f"legacy extraction:    {legacy * 1000:.3f} ms CPU/page")
+    print(f"indexed extraction:   {indexed * 1000:.3f} ms CPU/page")
+    print(f"speedup:              {legacy / indexed:.2f}x")
+
+    streamed = cpu_time_per_page(streamed_extract, page, args.pages)
+    print(f"soup + index:         {(soup_time + indexed) * 1000:.3f} ms CPU/page")
+    print(f"stream scan + index:  {streamed * 1000:.3f} ms CPU/page (no DOM)")
+
+
+if __name__ == "__main__":
+    main()
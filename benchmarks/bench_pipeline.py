@@ -0,0 +1,522 @@
+"""
+Offline end-to-end benchmark of the recipe pipeline on recorded pages.
+
+The saved pages in benchmarks/fixtures/pages cover the JSON-LD shapes met in the wild: a top-level list
+(list.html), an @graph container (graph.html), a single Recipe object (single.html) and a recipe without
+nutrition facts (no_nutrition.html). They are served from a local server, the shared Redis pool is pointed at
+an in-process fakeredis server, and the OpenAI client talks to a local mock with configurable latency, so the
+benchmark runs without network access.
+
+Known failure: extraction treats missing nutrition as an error and drops the recipe name, so no_nutrition.html
+fails in the html and full scenarios alike (the HTML phase reports "No recipe found"), a quarter of the pages.
+The gpt scenario reads the fixtures directly and processes it.
+
+Scenarios:
+    html   background_process_html for every page (the GPT phase is not run)
+    gpt    background_process_gpt on recipes extracted from the fixtures beforehand
+    full   url_validation, facilitate_requests, html_processing and gpt_processing served by uvicorn on local
+           ports and chained over HTTP, timed from POST /start to the session's completed progress event
+    all    each scenario in its own process, so peak RSS is reported per scenario
+
+Reports pages/sec, p50/p95/p99 of every phase and step timed by metrics_service (fetch, extract, GPT calls,
+service calls, Redis operations), the retries and hedges made by resilience_service, and the process's peak RSS.
+
+The mock OpenAI API can be given a latency tail (--openai-slow-rate, --openai-slow-latency) and transient 503s
+(--openai-error-rate), e.g. to compare p99 with and without OPENAI_HEDGE_AFTER_MS.
+
+Every page is processed from scratch: the recipe and GPT caches, single-flight coalescing and the per-host fetch
+scheduler (all pages come from one local host) are off unless their environment variables say otherwise.
+Any other setting applies as usual, e.g. INGREDIENT_PARSER_ENABLED=false sends every ingredient line to the mock.
+
+Requires fakeredis: pip install -r requirements-bench.txt
+
+Usage:
+    python -m benchmarks.bench_pipeline [--scenario all] [--pages 200] [--concurrency 16] [--openai-latency 300]
+"""
+import argparse
+import asyncio
+import ast
+import collections
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+PAGES_DIR = Path(__file__).parent / "fixtures" / "pages"
+SCENARIOS = ("html", "gpt", "full")
+
+# Defaults that make every page do the full work; the caller's environment wins
+BENCH_ENV = {
+    "OPENAI_API_KEY": "bench",
+    "RECIPE_CACHE_ENABLED": "false",
+    "GPT_CACHE_ENABLED": "false",
+    "SINGLEFLIGHT_ENABLED": "false",
+    "FETCH_SCHEDULER_ENABLED": "false",
+}
+
+
+def load_fixtures():
+    """Return {shape: page HTML} for every recorded page."""
+    return {path.stem: path.read_text() for path in sorted(PAGES_DIR.glob("*.html"))}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB (ru_maxrss is in KB on Linux, in bytes on macOS)."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class SampleRecorder:
+    """Keeps every observation made on the metrics_service histograms, so percentiles are exact."""
+
+    def __init__(self):
+        self.samples = collections.defaultdict(list)
+        self.notes = []  # Scenario-specific lines printed with the summary
+
+    def install(self, metrics):
+        """Wrap Histogram.observe so each observation is also recorded here."""
+        observe = metrics.Histogram.observe
+        samples = self.samples
+
+        def recording_observe(histogram, value, **labels):
+            observe(histogram, value, **labels)
+            detail = ",".join(f"{name}={label}" for name, label in sorted(labels.items()) if name not in ("phase", "outcome"))
+            name = f"{histogram.name}{{{detail}}}" if detail else histogram.name
+            if labels.get("outcome", "ok") != "ok":
+                name += f" [{labels['outcome']}]"
+            samples[(labels.get("phase", ""), name)].append(value)
+
+        metrics.Histogram.observe = recording_observe
+
+    def clear(self):
+        self.samples.clear()
+
+    def report(self, end_to_end):
+        """Print p50/p95/p99 per phase and step, then for the whole job."""
+        rows = sorted(self.samples.items()) + [(("", "end_to_end (per page)"), end_to_end)]
+        print(f"{'phase':<17} {'step':<62} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for (phase, name), values in rows:
+            if not values:
+                continue
+            values = sorted(values)
+            p50, p95, p99 = (percentile(values, pct) * 1000 for pct in (50, 95, 99))
+            print(f"{phase:<17} {name:<62} {len(values):>6} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+
+
+class LocalServers:
+    """
+    The recorded pages and a mock OpenAI chat completions API, served from a background thread with its own
+    event loop so serving them does not compete with the pipeline for its loop.
+    """
+
+    def __init__(self, fixtures, openai_latency, openai_jitter, openai_slow_rate=0.0, openai_slow_latency=0.0,
+                 openai_error_rate=0.0):
+        """
+        :param fixtures: {shape: page HTML}.
+        :param openai_latency: Mean seconds the mock takes to answer a completion.
+        :param openai_jitter: The mock's latency varies uniformly by up to this many seconds either way.
+        :param openai_slow_rate: Share of completions answered after openai_slow_latency instead (a latency tail).
+        :param openai_slow_latency: Seconds a slow completion takes.
+        :param openai_error_rate: Share of completions answered with a 503, as an overloaded API would.
+        """
+        self.fixtures = fixtures
+        self.openai_latency = openai_latency
+        self.openai_jitter = openai_jitter
+        self.openai_slow_rate = openai_slow_rate
+        self.openai_slow_latency = openai_slow_latency
+        self.openai_error_rate = openai_error_rate
+        self.port = None
+        self.completions = 0
+        self.errors = 0
+        self.loop = None
+        self.runner = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._serve, name="bench-servers", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.ready.wait()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def page_url(self, number):
+        """Return the URL of the number-th page: every page has its own URL, the fixtures are used in turn."""
+        shapes = sorted(self.fixtures)
+        return f"http://127.0.0.1:{self.port}/recipes/{shapes[number % len(shapes)]}/{number}"
+
+    @property
+    def openai_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _serve(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/recipes/{shape}/{number}", self._page)
+        app.router.add_post("/v1/chat/completions", self._completion)
+        self.loop = asyncio.new_event_loop()
+        self.runner = web.AppRunner(app, access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.SockSite(self.runner, self._bind())
+        self.loop.run_until_complete(site.start())
+        self.ready.set()
+        self.loop.run_forever()
+
+    def _bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        return sock
+
+    async def _page(self, request):
+        from aiohttp import web
+
+        page = self.fixtures.get(request.match_info["shape"])
+        if page is None:
+            raise web.HTTPNotFound()
+        return web.Response(text=page, content_type="text/html", charset="utf-8")
+
+    async def _completion(self, request):
+        from aiohttp import web
+
+        body = await request.json()
+        self.completions += 1
+        if random.random() < self.openai_error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "The server is overloaded", "type": "server_error"}}, status=503)
+        if random.random() < self.openai_slow_rate:
+            await asyncio.sleep(self.openai_slow_latency)
+        else:
+            await asyncio.sleep(max(0.0, self.openai_latency + random.uniform(-self.openai_jitter, self.openai_jitter)))
+        return web.json_response({
+            "id": f"chatcmpl-bench-{self.completions}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(mock_reply(body["messages"][-1]["content"]))},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+def mock_reply(user_content):
+    """
+    Answer a standardization request the way the prompts ask for, using the local parsers.
+
+    :param user_content: "Here's the ingredients: [...]" or "Here's the nutrition: {...}".
+    :return: The structured list the model would return.
+    """
+    from core.services.ingredient_service import parse_ingredient
+    from core.services.nutrition_service import normalize_nutrition
+
+    kind, payload = user_content.split(": ", 1)
+    if kind.endswith("nutrition"):
+        facts = ast.literal_eval(payload)
+        return normalize_nutrition(facts) if isinstance(facts, dict) else []
+    results = []
+    for line in ast.literal_eval(payload):
+        parsed, _ = parse_ingredient(line)
+        results.append(parsed if parsed and parsed.get("ingredient") else
+                       {"ingredient": line, "quantity": 1, "unit": "user discretion", "category": "other"})
+    return results
+
+
+def use_fake_redis():
+    """Point the process-wide Redis pool at an in-process fakeredis server (before any connection is made)."""
+    import fakeredis
+    from fakeredis.aioredis import FakeConnection
+    from core.services import data_service as ds
+
+    pool = ds.get_redis_pool()
+    pool.connection_class = FakeConnection
+    # No socket to health-check: fakeredis answers in-process
+    pool.connection_kwargs.update(host="fakeredis", port=6379, health_check_interval=0, server=fakeredis.FakeServer())
+
+
+def use_mock_openai(servers):
+    """Replace the OpenAI client with one talking to the mock, with the same pool limits."""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    from core.configs import settings
+
+    settings.OPENAI_CLIENT = AsyncOpenAI(
+        api_key="bench",
+        base_url=servers.openai_url,
+        timeout=settings.OPENAI_TIMEOUT,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=settings.OPENAI_MAX_INFLIGHT, max_keepalive_connections=settings.OPENAI_MAX_INFLIGHT),
+            timeout=settings.OPENAI_TIMEOUT,
+        ),
+    )
+
+
+async def drive(job, numbers, concurrency):
+    """
+    Run job(number) for every number with at most `concurrency` at a time.
+
+    :return: A tuple (elapsed seconds, per-job seconds of the jobs that succeeded, failures).
+    """
+    slots = asyncio.Semaphore(concurrency)
+    durations, failures = [], 0
+
+    async def run(number):
+        nonlocal failures
+        async with slots:
+            started_at = time.perf_counter()
+            try:
+                await job(number)
+            except Exception as e:
+                failures += 1
+                logging.warning(f"Benchmark job {number} failed: {e}")
+            else:
+                durations.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(run(number) for number in numbers))
+    return time.perf_counter() - started_at, durations, failures
+
+
+async def bench_html(args, servers, recorder):
+    """
+    background_process_html for every page; the GPT phase message is discarded. A page whose extraction found no
+    recipe name counts as failed, as it does in the full scenario.
+    """
+    from core.configs import schemas
+    from core.services import background_service as bt
+    from core.services.http_service import http_client
+    from core.services.parse_service import parse_pool
+    from core.services.pipeline_service import pipeline, CHAT_GPT_INGEST
+
+    async def discard(message):
+        pass
+
+    pipeline.mode = "inprocess"
+    pipeline.register(CHAT_GPT_INGEST, discard)
+    await http_client.start()
+    parse_pool.start()
+
+    async def job(number):
+        session_id = f"bench-html-{number}"
+        url = servers.page_url(number)
+        await bt.redis_manager.save_to_redis(session_id, "submission", {"session_id": session_id, "url": url, "user_id": "bench"}, prefix="temp")
+        await bt.background_process_html(schemas.SubmissionRequest(user_id="bench", session_id=session_id, url=url))
+        processed_html = await bt.redis_manager.get_session_field(session_id, "processed_html", prefix="temp")
+        if not (processed_html or {}).get("recipe_name"):
+            raise RuntimeError("html: No recipe found")
+
+    try:
+        return await measure(job, args, recorder)
+    finally:
+        await pipeline.drain()
+        await http_client.close()
+        parse_pool.shutdown()
+
+
+async def bench_gpt(args, servers, recorder):
+    """background_process_gpt on the fixtures' extracted recipes, stored in the session record beforehand."""
+    from core.configs import schemas
+    from core.services import background_service as bt
+    from core.services.jsonld_service import JsonLdIndex, LdJsonScanner
+    from core.services.pipeline_service import CHAT_GPT_INGEST
+
+    recipes = []
+    for shape, page in sorted(servers.fixtures.items()):
+        scanner = LdJsonScanner()
+        scanner.feed(page)
+        index = JsonLdIndex.from_scripts(scanner.close())
+        recipe_image, recipe_name, recipe_video_url = index.recipe_image_name_video()
+        recipes.append({
+            "recipe_name": recipe_name,
+            "recipe_image": recipe_image,
+            "recipe_video_url": recipe_video_url,
+            "recipe_ingredients_raw": index.recipe_ingredients(),
+            "recipe_nutrition_raw": index.recipe_nutrition(),
+        })
+
+    async def job(number):
+        session_id = f"bench-gpt-{number}"
+        recipe = recipes[number % len(recipes)]
+        raw_data = {"user_id": "bench", "session_id": session_id, "recipe_url": servers.page_url(number), **recipe}
+        await bt.redis_manager.save_session_fields(session_id, {"processed_html": raw_data}, prefix="temp")
+        await bt.background_process_gpt(schemas.ChatGptRequest(
+            user_id="bench", session_id=session_id, recipe_name=recipe["recipe_name"],
+            redis_key="processed_html", phase=CHAT_GPT_INGEST,
+        ))
+
+    return await measure(job, args, recorder)
+
+
+@contextlib.asynccontextmanager
+async def serve_app(app):
+    """Serve a FastAPI app with uvicorn on a free local port (running its startup and shutdown handlers)."""
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def bench_full(args, servers, recorder):
+    """The four services chained over HTTP, from POST /start to the completed progress event."""
+    from core.configs import settings
+    from core.services import data_service as ds
+    from core.services import progress_service as progress
+    from core.services.http_service import http_client
+    from core.services.progress_service import progress_hub
+    from facilitate_requests.main import app as facilitate_app
+    from gpt_processing.main import app as gpt_app
+    from html_processing.main import app as html_app
+    from url_validation.main import app as url_app
+
+    async with contextlib.AsyncExitStack() as stack:
+        settings.FACILITATE_REQUEST = await stack.enter_async_context(serve_app(facilitate_app)) + "/pubsub/events"
+        settings.PROCESS_HTML_REQUEST = await stack.enter_async_context(serve_app(html_app)) + "/process-html"
+        settings.CHAT_GPT_REQUEST = await stack.enter_async_context(serve_app(gpt_app)) + "/process-gpt"
+        start_url = await stack.enter_async_context(serve_app(url_app)) + "/start"
+        completed = []
+
+        async def job(number):
+            session_id = f"bench-full-{number}"
+            session = await http_client.get_session()
+            async with session.post(start_url, json={"user_id": "bench", "session_id": session_id, "url": servers.page_url(number)}) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"/start answered {response.status}")
+            updates = progress_hub.events(session_id, timeout=args.timeout)
+            async with contextlib.aclosing(updates):
+                async for update in updates:
+                    if update["event"] == progress.COMPLETED:
+                        completed.append(session_id)
+                        return
+                    if update["event"] == progress.FAILED:
+                        raise RuntimeError(f"{update.get('phase')}: {update.get('error')}")
+            raise RuntimeError(f"not completed after {args.timeout}s")
+
+        result = await measure(job, args, recorder)
+
+        # The service hops answer after the completed event: let them return, then look for intermediate keys
+        # the completed sessions left behind (SESSION_CLEANUP_ENABLED deletes them)
+        await asyncio.sleep(1)
+        redis_client = ds.RedisManager().redis_client
+        left = collections.Counter()
+        for session_id in completed:
+            for key in await redis_client.keys(f"temp:{session_id}:*"):
+                if key.rsplit(":", 1)[1] in ds.INTERMEDIATE_KEYS:
+                    left[ds.key_type(key)] += 1
+        recorder.notes.append(f"intermediate keys:    {dict(left) or 'none'} left by {len(completed)} completed sessions")
+        return result
+
+
+async def measure(job, args, recorder):
+    """Warm up (connections, parse workers), then run the measured pages."""
+    await drive(job, range(-args.warmup, 0), args.concurrency)
+    recorder.clear()
+    return await drive(job, range(args.pages), args.concurrency)
+
+
+def print_resilience():
+    """Print the retries, hedges and circuit breaker openings of every dependency called during the run."""
+    from core.services.resilience_service import resilience
+
+    stats = resilience.stats()
+    for name in stats["calls"]:
+        print(f"resilience:           {name}: {stats['calls'][name]} calls, {stats['retries'][name]} retries, "
+              f"{stats['hedges'][name]} hedges ({stats['hedge_wins'][name]} won), "
+              f"{stats['budget_exhausted'][name]} over budget, breaker opened {stats['breaker_opened'][name]}x")
+
+
+def run_scenario(args):
+    """Run one scenario in this process and print its report."""
+    for name, value in BENCH_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("PIPELINE_MODE", "http" if args.scenario == "full" else "inprocess")
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    use_fake_redis()
+    from core.services import metrics_service as metrics
+    recorder = SampleRecorder()
+    recorder.install(metrics)
+    logging.getLogger().setLevel(args.log_level)
+
+    servers = LocalServers(load_fixtures(), args.openai_latency / 1000, args.openai_jitter / 1000,
+                           args.openai_slow_rate, args.openai_slow_latency / 1000, args.openai_error_rate)
+    servers.start()
+    use_mock_openai(servers)
+    bench = {"html": bench_html, "gpt": bench_gpt, "full": bench_full}[args.scenario]
+    try:
+        elapsed, durations, failures = asyncio.run(bench(args, servers, recorder))
+    finally:
+        servers.stop()
+
+    print(f"== {args.scenario}: {args.pages} pages ({', '.join(sorted(servers.fixtures))}), concurrency {args.concurrency}, "
+          f"mock OpenAI {args.openai_latency:.0f}±{args.openai_jitter:.0f} ms")
+    print(f"pages/sec:            {len(durations) / elapsed:.1f} ({len(durations)} ok, {failures} failed in {elapsed:.2f} s)")
+    print(f"mock OpenAI calls:    {servers.completions} ({servers.errors} answered 503)")
+    print_resilience()
+    for note in recorder.notes:
+        print(note)
+    print(f"peak RSS:             {peak_rss_mb():.1f} MB (this process; parse workers not included)")
+    recorder.report(durations)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all", help="What to run")
+    parser.add_argument("--pages", type=int, default=200, help="Pages measured per scenario")
+    parser.add_argument("--warmup", type=int, default=8, help="Pages run before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="Pages in flight at a time")
+    parser.add_argument("--openai-latency", type=float, default=300, help="Mean mock OpenAI latency in ms")
+    parser.add_argument("--openai-jitter", type=float, default=100, help="Mock OpenAI latency varies by up to this many ms")
+    parser.add_argument("--openai-slow-rate", type=float, default=0, help="Share of mock OpenAI calls that are slow")
+    parser.add_argument("--openai-slow-latency", type=float, default=5000, help="Latency of a slow mock OpenAI call in ms")
+    parser.add_argument("--openai-error-rate", type=float, default=0, help="Share of mock OpenAI calls answered 503")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds a page may take in the full scenario")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the services under test")
+    args = parser.parse_args()
+
+    if args.scenario != "all":
+        run_scenario(args)
+        return
+
+    # One process per scenario: peak RSS and module state are not shared between them
+    for scenario in SCENARIOS:
+        command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--scenario", scenario]
+        for option in ("pages", "warmup", "concurrency", "openai_latency", "openai_jitter", "openai_slow_rate",
+                       "openai_slow_latency", "openai_error_rate", "timeout", "log_level"):
+            command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+        subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
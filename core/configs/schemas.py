@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel, HttpUrl
 
 class URLSubmission(BaseModel):
@@ -25,4 +26,10 @@ class URLSubmission(BaseModel):
 class SubmissionRequest(BaseModel):
     user_id: str
     session_id: str
-    url: HttpUrl
\ No newline at end of file
+    url: HttpUrl
+
+
+class BatchSubmissionRequest(BaseModel):
+    user_id: str
+    urls: List[HttpUrl]
+    batch_id: Optional[str] = None
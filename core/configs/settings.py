@@ -1,5 +1,5 @@
-from openai import OpenAI
 import os
+import threading
 # from dotenv import load_dotenv
 
 # # Load environment variables from .env file
@@ -7,9 +7,12 @@ import os
 
 PROJECT_ID = os.getenv("PROJECT_ID")
 
-# Initialize OpenAI client
+# OpenAI calls: per-call timeout (seconds) and the maximum number of requests in flight per instance
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+OPENAI_MAX_INFLIGHT = int(os.getenv("OPENAI_MAX_INFLIGHT", 16))
+
+# The async OpenAI client (settings.OPENAI_CLIENT) is built on first use, see __getattr__ below
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_CLIENT = OpenAI(api_key=OPENAI_API_KEY)
 
 REDIS_HOST= os.getenv("REDIS_HOST")
 REDIS_PORT= os.getenv("REDIS_PORT")
@@ -19,3 +22,179 @@ PROCESS_HTML_REQUEST = "https://html-processing-service-834521154069.us-east1.ru
 CHAT_GPT_REQUEST = "https://gpt-processing-service-834521154069.us-east1.run.app/process-gpt"
 FACILITATE_REQUEST = "https://facilitate-requests-service-834521154069.us-east1.run.app/pubsub/events"
 
+
+
+# HTML parsing: "stream" scans the response for ld+json blocks without building a DOM and falls back
+# to BeautifulSoup when no recipe block is found; "soup" always builds the full BeautifulSoup tree
+HTML_PARSER_MODE = os.getenv("HTML_PARSER_MODE", "stream")
+HTML_STREAM_CHUNK_SIZE = int(os.getenv("HTML_STREAM_CHUNK_SIZE", 64 * 1024))
+HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", 5 * 1024 * 1024))  # Stop downloading a page after this many bytes
+
+# Parse pool for the CPU-bound parse/extract step in html_processing: HTML_PARSE_WORKERS=0 runs it inline
+# on the event loop; HTML_PARSE_EXECUTOR is "process" (default) or "thread"
+HTML_PARSE_WORKERS = int(os.getenv("HTML_PARSE_WORKERS", os.cpu_count() or 1))
+HTML_PARSE_EXECUTOR = os.getenv("HTML_PARSE_EXECUTOR", "process")
+
+# Shared aiohttp client used for page fetches and service-to-service calls
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 60))
+# Service-to-service hops wait for the downstream phase, which includes its OpenAI calls (OPENAI_TIMEOUT per
+# attempt, retried for up to RETRY_DEADLINE): keep it well above both
+HTTP_SERVICE_TIMEOUT = float(os.getenv("HTTP_SERVICE_TIMEOUT", 300))
+
+# Process-wide Redis connection pool
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))  # Seconds to wait for a free connection
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 5))
+
+# Codec for session data and recipe cache entries: "json" (orjson) or "msgpack" behind a versioned header, or
+# "legacy" plain JSON strings. Every instance reads all three; keep REDIS_CODEC=legacy until all instances run
+# a version with the codec, since older ones only read plain JSON. clean_processed_data, read by the client,
+# is always written as plain JSON
+REDIS_CODEC = os.getenv("REDIS_CODEC", "legacy")
+REDIS_COMPRESSION = os.getenv("REDIS_COMPRESSION", "zstd")  # "zstd" (zstandard package, else zlib), "zlib" or "none"
+REDIS_COMPRESSION_THRESHOLD = int(os.getenv("REDIS_COMPRESSION_THRESHOLD", 512))  # Smaller values are stored as is
+REDIS_COMPRESSION_LEVEL = int(os.getenv("REDIS_COMPRESSION_LEVEL", 3))
+
+# TTL policy for session keys ({prefix}:{session_id}:{key}), by key type. Intermediate keys (submission, event_data,
+# the session record with processed_html) are deleted once the clean data is stored and
+# only expire on their own for sessions that never finish: keep it above the slowest redelivered phase
+# (PIPELINE_STREAM_CLAIM_IDLE_MS x PIPELINE_STREAM_MAX_DELIVERIES)
+SESSION_TTL_INTERMEDIATE = int(os.getenv("SESSION_TTL_INTERMEDIATE", 1800))
+SESSION_TTL_RESULT = int(os.getenv("SESSION_TTL_RESULT", 3600))  # clean_processed_data, read by the client
+SESSION_TTL_DEFAULT = int(os.getenv("SESSION_TTL_DEFAULT", 3600))  # Any other session key
+SESSION_CLEANUP_ENABLED = os.getenv("SESSION_CLEANUP_ENABLED", "true").lower() == "true"
+REDIS_MEMORY_SAMPLE = int(os.getenv("REDIS_MEMORY_SAMPLE", 2000))  # Most keys /redis-memory/stats samples with MEMORY USAGE
+
+# Admin routes (/redis-memory/stats) require this token in the X-Admin-Token header; unset, they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Cross-user recipe cache keyed by canonical URL
+RECIPE_CACHE_ENABLED = os.getenv("RECIPE_CACHE_ENABLED", "true").lower() == "true"
+RECIPE_CACHE_FRESH_SECONDS = int(os.getenv("RECIPE_CACHE_FRESH_SECONDS", 24 * 3600))  # Served without revalidation
+RECIPE_CACHE_TTL = int(os.getenv("RECIPE_CACHE_TTL", 7 * 24 * 3600))  # Evicted from Redis after this
+RECIPE_CACHE_LOCAL_SIZE = int(os.getenv("RECIPE_CACHE_LOCAL_SIZE", 1024))  # In-process LRU entries
+
+# Resilience of send_to_service and OpenAI calls: retries with jittered exponential backoff on transient failures
+# (408/429/5xx gateway errors, connection errors), capped by a per-target retry budget, and circuit breakers
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 3))  # Attempts per call, the first one included
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.2))  # Seconds; the backoff cap doubles per retry
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 5))  # Seconds; largest backoff cap (Retry-After may exceed it)
+RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", 30))  # No retry starts later than this after the first attempt
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", 0.2))  # Retries + hedges per call, per target
+RETRY_BUDGET_MAX = int(os.getenv("RETRY_BUDGET_MAX", 10))  # Tokens a target can save up for bursts
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))  # Consecutive failures that open a breaker
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))  # Seconds open before a probe call
+# Hedged requests: a second attempt once the first has not answered after this many ms (0 disables). OpenAI
+# completions can be hedged (at the cost of the duplicate tokens); service calls start pipeline phases, which are
+# not idempotent, so only hedge them knowingly
+OPENAI_HEDGE_AFTER_MS = int(os.getenv("OPENAI_HEDGE_AFTER_MS", 0))
+SERVICE_HEDGE_AFTER_MS = int(os.getenv("SERVICE_HEDGE_AFTER_MS", 0))
+
+# Memoization of GPT standardization results
+GPT_CACHE_ENABLED = os.getenv("GPT_CACHE_ENABLED", "true").lower() == "true"
+GPT_CACHE_TTL = int(os.getenv("GPT_CACHE_TTL", 30 * 24 * 3600))
+
+# Local rule-based ingredient parser: lines parsed with at least this confidence skip GPT
+INGREDIENT_PARSER_ENABLED = os.getenv("INGREDIENT_PARSER_ENABLED", "true").lower() == "true"
+INGREDIENT_PARSER_THRESHOLD = float(os.getenv("INGREDIENT_PARSER_THRESHOLD", 0.8))
+
+# Nutrition standardization: "local" uses the deterministic normalizer, "gpt" sends the facts to the model
+NUTRITION_NORMALIZER = os.getenv("NUTRITION_NORMALIZER", "local").lower()
+
+# Single-flight coalescing of identical in-flight scrapes and GPT calls, within and across instances
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+SINGLEFLIGHT_DISTRIBUTED = os.getenv("SINGLEFLIGHT_DISTRIBUTED", "true").lower() == "true"  # Redis lock + result fan-out
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv("SINGLEFLIGHT_LOCK_TTL", 90))  # Seconds; outlives a fetch or an OpenAI call
+SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", 90))  # Seconds a waiter waits for the leader
+SINGLEFLIGHT_RESULT_TTL = int(os.getenv("SINGLEFLIGHT_RESULT_TTL", 60))  # Seconds a fanned-out result stays readable
+
+# Pipeline wiring: "http" chains the services through facilitate-requests; "inprocess" runs every phase
+# in the receiving process through an in-memory asyncio dispatcher (all-in-one deployments, load tests)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "http").lower()
+PIPELINE_DRAIN_TIMEOUT = float(os.getenv("PIPELINE_DRAIN_TIMEOUT", 30))  # Seconds to finish running phases at shutdown
+
+# Redis Streams dispatch (PIPELINE_MODE=stream): one stream per phase, consumed through a consumer group
+PIPELINE_STREAM_GROUP = os.getenv("PIPELINE_STREAM_GROUP", "pipeline-workers")
+PIPELINE_STREAM_CONCURRENCY = int(os.getenv("PIPELINE_STREAM_CONCURRENCY", 4))  # Consumer tasks per phase per instance
+PIPELINE_STREAM_BLOCK_MS = int(os.getenv("PIPELINE_STREAM_BLOCK_MS", 2000))  # Must stay below REDIS_SOCKET_TIMEOUT
+# Messages pending longer than this are reclaimed; keep it above the slowest phase (fetch + GPT timeouts)
+PIPELINE_STREAM_CLAIM_IDLE_MS = int(os.getenv("PIPELINE_STREAM_CLAIM_IDLE_MS", 300000))
+PIPELINE_STREAM_CLAIM_INTERVAL = float(os.getenv("PIPELINE_STREAM_CLAIM_INTERVAL", 30))  # Seconds between reclaim passes
+PIPELINE_STREAM_MAX_DELIVERIES = int(os.getenv("PIPELINE_STREAM_MAX_DELIVERIES", 3))  # Attempts before dead-lettering
+PIPELINE_STREAM_MAXLEN = int(os.getenv("PIPELINE_STREAM_MAXLEN", 100000))  # Approximate cap on each stream's length
+
+# Bounded worker pool for /process-html: scrapes beyond the queue are rejected with 429 and Retry-After
+HTML_WORKER_CONCURRENCY = int(os.getenv("HTML_WORKER_CONCURRENCY", 16))
+HTML_WORKER_QUEUE_SIZE = int(os.getenv("HTML_WORKER_QUEUE_SIZE", 64))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", 30))  # Seconds to finish queued jobs at shutdown
+
+# Per-host fetch scheduler: per-instance concurrency limits, fair global slots, and a token bucket per host
+# shared across instances through Redis whose rate adapts to 429/Retry-After and latency (AIMD)
+FETCH_SCHEDULER_ENABLED = os.getenv("FETCH_SCHEDULER_ENABLED", "true").lower() == "true"
+FETCH_MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", 64))  # Page fetches per instance, all hosts
+FETCH_HOST_CONCURRENCY = int(os.getenv("FETCH_HOST_CONCURRENCY", 4))  # Page fetches per instance, per host
+FETCH_HOST_RATE = float(os.getenv("FETCH_HOST_RATE", 2.0))  # Initial requests/second per host, all instances
+FETCH_HOST_MIN_RATE = float(os.getenv("FETCH_HOST_MIN_RATE", 0.2))
+FETCH_HOST_MAX_RATE = float(os.getenv("FETCH_HOST_MAX_RATE", 20.0))
+FETCH_HOST_BURST = int(os.getenv("FETCH_HOST_BURST", 5))  # Requests a host may receive back to back
+FETCH_RATE_INCREASE = float(os.getenv("FETCH_RATE_INCREASE", 0.1))  # Requests/second added per fast success
+FETCH_LATENCY_TARGET = float(os.getenv("FETCH_LATENCY_TARGET", 3.0))  # Seconds; slower responses lower the rate
+FETCH_MAX_QUEUE_WAIT = float(os.getenv("FETCH_MAX_QUEUE_WAIT", 20))  # Seconds a fetch may wait for its host's bucket
+FETCH_MAX_RETRY_AFTER = float(os.getenv("FETCH_MAX_RETRY_AFTER", 300))  # Cap on an honoured Retry-After
+FETCH_HOST_STATE_TTL = int(os.getenv("FETCH_HOST_STATE_TTL", 3600))  # Seconds a host's shared bucket is kept
+
+# Micro-batching of ingredient lines that reach GPT from concurrent standardizations (bulk imports)
+GPT_BATCH_ENABLED = os.getenv("GPT_BATCH_ENABLED", "true").lower() == "true"
+GPT_BATCH_WINDOW_MS = int(os.getenv("GPT_BATCH_WINDOW_MS", 50))  # How long a batch collects lines
+GPT_BATCH_MAX_LINES = int(os.getenv("GPT_BATCH_MAX_LINES", 60))  # A batch is sent as soon as it has this many lines
+
+# Batch imports (/start-batch)
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", 500))  # Largest batch accepted in one request
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 8))  # URLs of one batch in the pipeline at a time
+BATCH_URL_TIMEOUT = float(os.getenv("BATCH_URL_TIMEOUT", 180))  # A URL without clean data after this is reported failed
+
+# Session progress pushed over Redis pub/sub (/progress/{session_id} SSE stream and batch imports, which need it)
+PROGRESS_EVENTS_ENABLED = os.getenv("PROGRESS_EVENTS_ENABLED", "true").lower() == "true"
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", 3600))  # Seconds a session's events are kept for replay
+PROGRESS_STREAM_TIMEOUT = float(os.getenv("PROGRESS_STREAM_TIMEOUT", 300))  # Longest a stream follows one session
+PROGRESS_HEARTBEAT = float(os.getenv("PROGRESS_HEARTBEAT", 15))  # Seconds between SSE keep-alive comments
+
+
+def _create_openai_client():
+    """Build the async OpenAI client on a shared, pooled HTTP client."""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT,
+        # Retries are made by resilience_service, under its retry budget and circuit breaker
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=OPENAI_MAX_INFLIGHT, max_keepalive_connections=OPENAI_MAX_INFLIGHT),
+            timeout=OPENAI_TIMEOUT,
+        ),
+    )
+
+
+_openai_client_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """
+    Create OPENAI_CLIENT the first time it is read. Importing openai and httpx takes about half a second,
+    and only the services that call the model need them; the other services start without paying for it.
+    """
+    if name == "OPENAI_CLIENT":
+        # The client may be warmed up in a worker thread while a request reads it
+        with _openai_client_lock:
+            if "OPENAI_CLIENT" not in globals():
+                globals()["OPENAI_CLIENT"] = _create_openai_client()
+        return globals()["OPENAI_CLIENT"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,58 +1,133 @@
 from core.configs import settings
 from core.configs import schemas
+from core.services import cache_service as cache
 from core.services import data_service as ds
+from core.services import gpt_service as gpt
+from core.services.pipeline_service import pipeline, CHAT_GPT_INGEST
+from core.services import metrics_service as metrics
+from core.services import progress_service as progress
+from core.services.progress_service import progress_hub
+from core.services.singleflight_service import SingleFlight
 
 from . import recipe_service as rp
 from fastapi import HTTPException
+import asyncio
+import json
 import logging
 
 
 # Initialize data managers
 redis_manager = ds.RedisManager()
 
-# Background task for processing HTML
-async def background_process_html(submission: schemas.SubmissionRequest):
+# Cross-user cache of extracted recipe fields, keyed by canonical URL
+recipe_cache = cache.RecipeCache(redis_manager)
+
+# Coalesces concurrent scrapes of the same canonical URL, within this instance and across instances
+scrape_flight = SingleFlight(redis_manager, "scrape")
+
+
+async def scrape_recipe(submitted_url: str, submission: schemas.SubmissionRequest):
     """
-    A background task that processes the HTML of a submitted URL.
-    The task fetches the HTML content, scrapes recipe data, and stores it in Redis.
-    
-    :param submission: A validated request containing user, session, and URL information.
+    Fetch and extract the recipe fields for a URL, serving them from the shared recipe cache when possible.
+    A fresh cache hit skips the fetch and parse entirely; a stale entry is revalidated with a conditional GET.
+
+    :param submitted_url: The submitted recipe URL.
+    :param submission: The submission the scrape belongs to (used for session/user logging).
+    :return: A dictionary with recipe_image, recipe_name, recipe_video_url, recipe_ingredients_raw and recipe_nutrition_raw.
     """
-    
-    logging.info(f"Starting HTML processing for session: {submission.session_id}")
+    canonical_url = cache.canonicalize_url(submitted_url)
+    cached = await recipe_cache.get(canonical_url) if settings.RECIPE_CACHE_ENABLED else None
+    if cached and recipe_cache.is_fresh(cached):
+        return cached["fields"]
 
-    # Retrieve previously stored submission data from Redis using session ID
-    stored_submission = await redis_manager.get_from_redis(submission.session_id, "submission", prefix="temp")
-    
-    # If no data is found in Redis, raise an HTTP 404 error
-    if not stored_submission:
-        logging.error(f"Session {submission.session_id} not found in Redis.")
-        raise HTTPException(status_code=404, detail="Session not found or data missing")
+    # Sessions submitting the same page at the same time share one fetch and extraction
+    return await scrape_flight.do(
+        cache.stable_hash(canonical_url),
+        lambda: fetch_recipe(submitted_url, canonical_url, cached, submission),
+    )
 
-    submitted_url = str(submission.url)  # Store the submitted URL
 
-    try:        
+async def fetch_recipe(submitted_url: str, canonical_url: str, cached, submission: schemas.SubmissionRequest):
+    """
+    Fetch the page and extract its recipe fields, then store complete extractions in the shared recipe cache.
+
+    :param submitted_url: The submitted recipe URL.
+    :param canonical_url: The URL returned by canonicalize_url, used as the cache key.
+    :param cached: A stale cache entry to revalidate with a conditional GET, or None.
+    :param submission: The submission the scrape belongs to (used for session/user logging).
+    :return: A dictionary with recipe_image, recipe_name, recipe_video_url, recipe_ingredients_raw and recipe_nutrition_raw.
+    """
+    recipe_fields = dict.fromkeys(
+        ("recipe_image", "recipe_name", "recipe_video_url", "recipe_ingredients_raw", "recipe_nutrition_raw")
+    )
+
+    try:
         logging.info(f"Scraping URL for recipe data: {submission.session_id}")
 
         # Initialize the RecipeScraper to handle the recipe scraping process
         scraper = rp.RecipeScraper(submitted_url, submission.session_id, submission.user_id, redis_manager)
 
-        # Fetch the HTML content from the submitted URL
-        await scraper.fetch_page_content()
+        # Fetch the HTML content from the submitted URL, revalidating a stale cache entry if there is one
+        await scraper.fetch_page_content(validators=cached)
+        if scraper.not_modified:
+            await recipe_cache.touch(cached)
+            return cached["fields"]
 
         # Extract recipe image and name from the fetched HTML
         recipe_image, recipe_name, recipe_video_url = await scraper.extract_recipe_image_name_video()
+        recipe_fields.update(recipe_image=recipe_image, recipe_name=recipe_name, recipe_video_url=recipe_video_url)
 
         # Extract recipe Ingredients
-        recipe_ingredients = await scraper.extract_ingredients()
+        recipe_fields["recipe_ingredients_raw"] = await scraper.extract_ingredients()
 
         # Extract recipe nutrition and tutorial video URL
-        recipe_nutrition = await scraper.extract_nutrition_data()
+        recipe_fields["recipe_nutrition_raw"] = await scraper.extract_nutrition_data()
 
     except Exception as e:
         # In case of errors during HTML fetching or parsing, log the error
         logging.error(f"Error extracting recipe data for session {submission.session_id}: {str(e)}")
-        recipe_image, recipe_name = None, None
+        recipe_fields["recipe_image"], recipe_fields["recipe_name"] = None, None
+        return recipe_fields
+
+    # Only complete extractions are shared with other users
+    if settings.RECIPE_CACHE_ENABLED:
+        await recipe_cache.put(canonical_url, recipe_fields, scraper.etag, scraper.last_modified)
+
+    return recipe_fields
+
+# Background task for processing HTML
+async def background_process_html(submission: schemas.SubmissionRequest):
+    """
+    A background task that processes the HTML of a submitted URL.
+    The task fetches the HTML content, scrapes recipe data, and stores it in Redis.
+    
+    :param submission: A validated request containing user, session, and URL information.
+    """
+    # Subscribers to the session's progress see the phase start, its partial results, and its end or failure;
+    # every timing recorded during the phase is labelled with it
+    async with metrics.phase(progress.HTML_PHASE), progress_hub.phase(submission.session_id, progress.HTML_PHASE):
+        await _process_html(submission)
+
+
+async def _process_html(submission: schemas.SubmissionRequest):
+    logging.info(f"Starting HTML processing for session: {submission.session_id}")
+
+    # Retrieve previously stored submission data from Redis using session ID
+    stored_submission = await redis_manager.get_from_redis(submission.session_id, "submission", prefix="temp")
+    
+    # If no data is found in Redis, raise an HTTP 404 error
+    if not stored_submission:
+        logging.error(f"Session {submission.session_id} not found in Redis.")
+        raise HTTPException(status_code=404, detail="Session not found or data missing")
+
+    submitted_url = str(submission.url)  # Store the submitted URL
+
+    recipe_fields = await scrape_recipe(submitted_url, submission)
+    recipe_image = recipe_fields["recipe_image"]
+    recipe_name = recipe_fields["recipe_name"]
+    recipe_video_url = recipe_fields["recipe_video_url"]
+    recipe_ingredients = recipe_fields["recipe_ingredients_raw"]
+    recipe_nutrition = recipe_fields["recipe_nutrition_raw"]
 
     # Check if the recipe name and image were extracted successfully
     if not recipe_image or not recipe_name:
@@ -79,18 +154,115 @@ async def background_process_html(submission: schemas.SubmissionRequest):
         "bucket" : 'raw_processed_data'
     }
 
-    # Save the processed HTML data to Redis under the "processed_html" key for the current session
-    await redis_manager.save_to_redis(submission.session_id, "processed_html", raw_data, prefix="temp")
+    # Save the processed HTML data to the session record under the "processed_html" field.
+    # It already holds the recipe info and ingredients, so they are not written separately.
+    await redis_manager.save_session_fields(submission.session_id, {"processed_html": raw_data}, prefix="temp")
+
+    # Push the recipe card (name and image) to the client before the GPT phase starts
+    await progress_hub.publish(submission.session_id, progress.RECIPE, {
+        "recipe_url": submitted_url,
+        "recipe_name": recipe_name,
+        "recipe_image": recipe_image,
+        "recipe_video_url": recipe_video_url,
+    })
+    if not recipe_name:
+        await progress_hub.publish(submission.session_id, progress.FAILED, {"phase": progress.HTML_PHASE, "error": "No recipe found"})
 
     gpt_request_data = {
         "user_id": submission.user_id,
         "session_id": submission.session_id,
         "recipe_name": recipe_name,
         "redis_key": "processed_html",
-        "phase": "chat_gpt_ingest"
+        "phase": CHAT_GPT_INGEST
     }
 
-    # Publish an event to Pub/Sub to indicate the completion of the HTML processing phase
-    await ds.send_to_service(settings.FACILITATE_REQUEST, gpt_request_data, submission.session_id, "Facilitate Request")
+    # Publish an event to Pub/Sub to indicate the completion of the HTML processing phase. It is handed off rather
+    # than awaited: in http mode the hop returns only after the GPT phase, and the html worker would wait on it
+    await pipeline.handoff(gpt_request_data)
+
+    logging.info(f"HTML processing complete for session: {submission.session_id}")
+
+
+async def _standardize_and_publish(session_id, event, field, standardization):
+    """
+    Await a standardization, decode it if the model returned a JSON string, and push it as a progress event.
+
+    :param session_id: The session being processed.
+    :param event: The progress event to publish (INGREDIENTS or NUTRITION).
+    :param field: The clean-data field name the result is published under.
+    :param standardization: The awaitable standardize_ingredients / standardize_nutrition call.
+    :return: The decoded result.
+    """
+    result = await standardization
+
+    # Check if the result is a string and convert only if necessary
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except json.JSONDecodeError as e:
+            logging.error(f"Error decoding {field}: {e}")
+            raise
+
+    await progress_hub.publish(session_id, event, {field: result})
+    return result
+
+
+# GPT processing phase
+async def background_process_gpt(gpt_request: schemas.ChatGptRequest):
+    """
+    Standardize the ingredients and nutrition of a processed recipe and store the clean data in Redis.
+
+    :param gpt_request: The chat_gpt_ingest message naming the session and the session field holding the processed HTML.
+    """
+    async with metrics.phase(progress.GPT_PHASE), progress_hub.phase(gpt_request.session_id, progress.GPT_PHASE):
+        await _process_gpt(gpt_request)
+    await progress_hub.publish(gpt_request.session_id, progress.COMPLETED)
+
+
+async def _process_gpt(gpt_request: schemas.ChatGptRequest):
+    session_id = gpt_request.session_id
+    redis_key = gpt_request.redis_key
+
+    # Read the processed HTML from the session record, falling back to the legacy per-key string during rollout
+    formatted_data = await redis_manager.get_session_field(session_id, redis_key, prefix="temp")
+    if formatted_data is None:
+        formatted_data = await redis_manager.get_from_redis(session_id, redis_key, prefix="temp")
+    if formatted_data is None and await redis_manager.get_from_redis(session_id, "clean_processed_data", prefix="temp"):
+        # A redelivered message for a session that already completed: its intermediate keys are gone
+        logging.info(f"Session {session_id} already has clean data, skipping GPT processing")
+        return
+
+    recipe_name = formatted_data['recipe_name']
+    recipe_ingredients = formatted_data['recipe_ingredients_raw']
+    recipe_nutrition = formatted_data['recipe_nutrition_raw']
+
+    # Standardize ingredients and nutrition concurrently; each is pushed to the client as soon as it is ready
+    clean_ingredients, clean_nutrition = await asyncio.gather(
+        _standardize_and_publish(session_id, progress.INGREDIENTS, "recipe_ingredients_clean",
+                                 gpt.standardize_ingredients(recipe_name, recipe_ingredients)),
+        _standardize_and_publish(session_id, progress.NUTRITION, "recipe_nutrition_clean",
+                                 gpt.standardize_nutrition(recipe_name, recipe_nutrition)),
+    )
+    logging.info("Ingredients and nutrition successfully processed")
+
+    # Clean Data
+    clean_data = {
+        "user_id": gpt_request.user_id,
+        "session_id": gpt_request.session_id,
+        "recipe_url": formatted_data['recipe_url'],
+        "recipe_name": gpt_request.recipe_name,
+        "recipe_image": formatted_data['recipe_image'],
+        "recipe_video_url" : formatted_data['recipe_video_url'],
+        "recipe_ingredients_clean" : clean_ingredients,
+        "recipe_nutrition_clean" : clean_nutrition,
+        "bucket" : 'clean_processed_data'
+    }
+
+    logging.info(f"Serialized Clean Object: {clean_data}")
+
+    # Send to Redis
+    await redis_manager.save_to_redis(session_id, 'clean_processed_data', clean_data, prefix="temp")
 
-    logging.info(f"HTML processing complete for session: {submission.session_id}")
\ No newline at end of file
+    # The session is complete: its submission, event data and processed HTML are no longer needed
+    if settings.SESSION_CLEANUP_ENABLED:
+        await redis_manager.cleanup_session(session_id, prefix="temp")
\ No newline at end of file
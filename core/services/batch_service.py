@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import uuid
+from core.configs import settings
+from core.services import cache_service as cache
+from core.services import progress_service as progress
+from core.services.progress_service import progress_hub
+
+# Configure logging to track batch imports
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Progress events streamed for every URL of a batch, in the order they can occur
+QUEUED, SUBMITTED, HTML_PROCESSED, COMPLETED, FAILED, DUPLICATE = (
+    "queued", "submitted", "html_processed", "completed", "failed", "duplicate"
+)
+
+
+def dedupe_urls(urls):
+    """
+    Drop URLs that canonicalize to one already in the batch (tracking parameters, fragments, host case...).
+
+    :param urls: The submitted URLs, in order.
+    :return: A tuple (unique URLs in first-seen order, list of (duplicate URL, URL it duplicates)).
+    """
+    unique, duplicates, seen = [], [], {}
+    for url in urls:
+        canonical_url = cache.canonicalize_url(url)
+        if canonical_url in seen:
+            duplicates.append((url, seen[canonical_url]))
+        else:
+            seen[canonical_url] = url
+            unique.append(url)
+    return unique, duplicates
+
+
+def format_event(event, sse=False):
+    """
+    Encode a progress event as one NDJSON line, or as a Server-Sent Event.
+
+    :param event: The event dictionary.
+    :param sse: True for text/event-stream framing.
+    :return: The encoded chunk.
+    """
+    data = json.dumps(event)
+    if sse:
+        return f"event: {event['status']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+class BatchImporter:
+    """
+    Runs a batch of URL submissions with at most BATCH_MAX_CONCURRENCY in the pipeline at a time and reports
+    each URL's progress as its phases complete. Progress comes from the sessions' pushed progress events,
+    so it works whichever pipeline mode (http, inprocess, stream) carries the phases.
+    """
+
+    def __init__(self):
+        # Batch counters
+        self.batches = 0
+        self.urls = 0
+        self.duplicates = 0
+        self.completed = 0
+        self.failed = 0
+        self.active = 0
+
+    async def run(self, user_id, urls, submit, batch_id=None):
+        """
+        Submit a batch of URLs and yield a progress event per URL and phase as it happens.
+
+        :param user_id: The user importing the batch.
+        :param urls: The submitted URLs; duplicates are reported and skipped.
+        :param submit: Coroutine function submit(session_id, user_id, url) that starts the pipeline for one URL.
+        :param batch_id: Optional caller-chosen batch id, a label only: session ids are
+                         "{batch_id}-{position}-{uuid}", fresh on every run, so resubmitting a batch id never
+                         replays an earlier run's progress events or results.
+        :return: An async generator of event dictionaries, ending with a "batch_complete" summary.
+        """
+        batch_id = batch_id or uuid.uuid4().hex
+        unique, duplicates = dedupe_urls([str(url) for url in urls])
+        self.batches += 1
+        self.urls += len(unique)
+        self.duplicates += len(duplicates)
+        started_at = time.monotonic()
+
+        sessions = [(f"{batch_id}-{position}-{uuid.uuid4().hex}", url) for position, url in enumerate(unique)]
+        events = asyncio.Queue()
+        jobs = asyncio.Queue()
+        for session in sessions:
+            jobs.put_nowait(session)
+
+        yield {"status": "batch_started", "batch_id": batch_id, "urls": len(unique), "duplicates": len(duplicates)}
+        for url, original in duplicates:
+            yield {"status": DUPLICATE, "batch_id": batch_id, "url": url, "duplicate_of": original}
+        for session_id, url in sessions:
+            yield {"status": QUEUED, "batch_id": batch_id, "session_id": session_id, "url": url}
+
+        workers = [
+            asyncio.create_task(self._work(jobs, events, user_id, submit))
+            for _ in range(min(settings.BATCH_MAX_CONCURRENCY, len(unique)))
+        ]
+        outcomes = {COMPLETED: 0, FAILED: 0}
+        try:
+            for _ in range(len(unique)):
+                while True:
+                    event = await events.get()
+                    event["batch_id"] = batch_id
+                    yield event
+                    if event["status"] in outcomes:
+                        outcomes[event["status"]] += 1
+                        break
+        finally:
+            # The client may disconnect mid-stream: stop polling, the submitted URLs keep processing
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        logging.info(f"Batch {batch_id} finished: {outcomes[COMPLETED]} completed, {outcomes[FAILED]} failed")
+        yield {
+            "status": "batch_complete",
+            "batch_id": batch_id,
+            "completed": outcomes[COMPLETED],
+            "failed": outcomes[FAILED],
+            "duplicates": len(duplicates),
+            "elapsed_ms": round((time.monotonic() - started_at) * 1000, 1),
+        }
+
+    async def _work(self, jobs, events, user_id, submit):
+        """Take URLs off the batch queue one at a time, submit them and follow them to the end."""
+        while not jobs.empty():
+            session_id, url = jobs.get_nowait()
+            self.active += 1
+            try:
+                await self._track(session_id, url, events, user_id, submit)
+            finally:
+                self.active -= 1
+
+    async def _track(self, session_id, url, events, user_id, submit):
+        """
+        Submit one URL and follow it to its outcome. Always queues exactly one COMPLETED or FAILED event for the
+        URL, even if following it fails (e.g. a Redis error in the progress listener), so run() never waits forever.
+        """
+        event = {"session_id": session_id, "url": url}
+        try:
+            outcome = await self._follow(event, events, user_id, submit)
+        except Exception as e:
+            logging.error(f"Lost track of batch session: {session_id} - {e}")
+            outcome = {"status": FAILED, "error": "progress tracking failed"}
+
+        if outcome["status"] == COMPLETED:
+            self.completed += 1
+        else:
+            self.failed += 1
+        events.put_nowait({**event, **outcome})
+
+    async def _follow(self, event, events, user_id, submit):
+        """
+        Submit one URL and report its phases until the clean data is stored, it fails, or BATCH_URL_TIMEOUT passes.
+
+        :return: The terminal status and its details, for _track to queue.
+        """
+        session_id = event["session_id"]
+        started_at = time.monotonic()
+        try:
+            await submit(session_id, user_id, event["url"])
+        except Exception as e:
+            logging.error(f"Batch submission failed for session: {session_id} - {e}")
+            return {"status": FAILED, "error": "submission failed"}
+        events.put_nowait({**event, "status": SUBMITTED})
+
+        # Follow the session's pushed progress events instead of polling its keys
+        updates = progress_hub.events(session_id, timeout=settings.BATCH_URL_TIMEOUT)
+        async with contextlib.aclosing(updates):
+            async for update in updates:
+                if update["event"] == progress.RECIPE and update.get("recipe_name"):
+                    events.put_nowait({**event, "status": HTML_PROCESSED, "recipe_name": update["recipe_name"]})
+                elif update["event"] == progress.COMPLETED:
+                    return {"status": COMPLETED, "elapsed_ms": round((time.monotonic() - started_at) * 1000, 1)}
+                elif update["event"] == progress.FAILED:
+                    return {"status": FAILED, "error": update.get("error")}
+
+        return {"status": FAILED, "error": f"no result after {settings.BATCH_URL_TIMEOUT}s"}
+
+    def stats(self):
+        """
+        Return batch counters.
+
+        :return: A dictionary of counters.
+        """
+        return {
+            "batches": self.batches,
+            "urls": self.urls,
+            "duplicates": self.duplicates,
+            "completed": self.completed,
+            "failed": self.failed,
+            "active": self.active,
+        }
+
+
+# Process-wide importer used by url_validation's /start-batch
+batch_importer = BatchImporter()
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import logging
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from cachetools import TTLCache
+from core.configs import settings
+from core.services.data_service import RedisManager
+
+# Configure logging to track recipe cache activity
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Query parameters that only carry campaign/click tracking and never change the page content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "ref", "ref_src", "s_cid", "cmpid", "soc_src", "soc_trk",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url):
+    """
+    Normalize a recipe URL so every user's submission of the same page maps to the same cache key:
+    lowercase scheme and host, drop default ports, fragments and tracking parameters, and sort the query.
+
+    :param url: The submitted URL.
+    :return: The canonical URL string.
+    """
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+class RecipeCache:
+    """
+    A cross-user cache of extracted recipe fields keyed by canonical URL.
+    Entries live in a small in-process LRU/TTL tier backed by Redis (with a TTL), and carry the page's
+    ETag/Last-Modified validators so stale entries can be revalidated with a conditional GET.
+    """
+
+    def __init__(self, redis_manager: RedisManager):
+        """
+        :param redis_manager: RedisManager that stores the shared cache entries (encoded with the Redis codec).
+        """
+        self.redis_manager = redis_manager
+        self.local = TTLCache(maxsize=settings.RECIPE_CACHE_LOCAL_SIZE, ttl=settings.RECIPE_CACHE_FRESH_SECONDS)
+
+        # Hit/miss counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+
+    @staticmethod
+    def cache_key(canonical_url):
+        """Return the Redis key for a canonical URL."""
+        return f"recipe_cache:{hashlib.sha256(canonical_url.encode()).hexdigest()}"
+
+    @staticmethod
+    def is_fresh(entry):
+        """
+        Check whether a cache entry can be served without revalidating it against the origin.
+
+        :param entry: A cache entry as returned by get().
+        :return: True if the entry is younger than RECIPE_CACHE_FRESH_SECONDS.
+        """
+        return time.time() - entry["stored_at"] < settings.RECIPE_CACHE_FRESH_SECONDS
+
+    async def get(self, canonical_url):
+        """
+        Look up the cached recipe fields for a canonical URL.
+
+        :param canonical_url: The URL returned by canonicalize_url.
+        :return: The cache entry (fresh or stale), or None on a miss.
+        """
+        entry = self.local.get(canonical_url)
+        if entry is None:
+            entry = await self.redis_manager.get_value(self.cache_key(canonical_url))
+            if entry is not None and self.is_fresh(entry):
+                self.local[canonical_url] = entry
+
+        if entry is None:
+            self.misses += 1
+            logging.info(f"Recipe cache miss for URL: {canonical_url}")
+        elif self.is_fresh(entry):
+            self.hits += 1
+            logging.info(f"Recipe cache hit for URL: {canonical_url}")
+        else:
+            self.stale_hits += 1
+            logging.info(f"Recipe cache entry is stale, revalidating URL: {canonical_url}")
+        return entry
+
+    async def put(self, canonical_url, fields, etag=None, last_modified=None):
+        """
+        Store the extracted recipe fields for a canonical URL.
+
+        :param canonical_url: The URL returned by canonicalize_url.
+        :param fields: The extracted recipe fields (name, image, video, raw ingredients and nutrition).
+        :param etag: The page's ETag header, if any.
+        :param last_modified: The page's Last-Modified header, if any.
+        :return: The stored cache entry.
+        """
+        entry = {
+            "url": canonical_url,
+            "fields": fields,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+        }
+        await self.redis_manager.set_value(self.cache_key(canonical_url), entry, ex=settings.RECIPE_CACHE_TTL)
+        self.local[canonical_url] = entry
+        self.stores += 1
+        return entry
+
+    async def touch(self, entry):
+        """
+        Mark a stale entry as fresh again after the origin answered a conditional GET with 304 Not Modified.
+
+        :param entry: The stale cache entry.
+        :return: The refreshed entry.
+        """
+        self.revalidated += 1
+        return await self.put(entry["url"], entry["fields"], entry.get("etag"), entry.get("last_modified"))
+
+    def stats(self):
+        """
+        Return hit/miss counters for the cache.
+
+        :return: A dictionary of counters and the fresh hit ratio.
+        """
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "stores": self.stores,
+            "local_entries": len(self.local),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def stable_hash(*parts):
+    """
+    Hash JSON-serializable parts into a stable hex digest (key order and whitespace independent).
+
+    :param parts: The values to hash.
+    :return: A SHA-256 hex digest.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+def normalize_ingredient_line(line):
+    """Normalize an ingredient line for the per-line cache: collapse whitespace and ignore case."""
+    return " ".join(str(line).split()).casefold()
+
+
+class GptCache:
+    """
+    A content-addressed memo of GPT standardization results stored in Redis with a TTL.
+    Keys hash the model, the prompt version (a digest of the prompt text, so editing a prompt
+    invalidates its entries) and the normalized input. Ingredients are also memoized per line,
+    so only lines that were never standardized before are sent to the model.
+    """
+
+    def __init__(self, redis_manager: RedisManager):
+        """
+        :param redis_manager: RedisManager whose client stores the memoized results.
+        """
+        self.redis_client = redis_manager.redis_client
+
+        # Hit/miss counters
+        self.hits = 0
+        self.misses = 0
+        self.line_hits = 0
+        self.line_misses = 0
+
+    @staticmethod
+    def prompt_version(prompt):
+        """Return a short digest identifying a prompt's text."""
+        return hashlib.sha256(prompt.encode()).hexdigest()[:12]
+
+    def result_key(self, kind, model, prompt, payload):
+        """Return the Redis key for a whole-input result."""
+        return f"gpt_cache:{kind}:{stable_hash(model, self.prompt_version(prompt), payload)}"
+
+    def line_key(self, model, prompt, line):
+        """Return the Redis key for a single standardized ingredient line."""
+        return f"gpt_cache:ingredient_line:{stable_hash(model, self.prompt_version(prompt), normalize_ingredient_line(line))}"
+
+    async def get(self, kind, model, prompt, payload):
+        """
+        Look up a memoized result for a whole input.
+
+        :param kind: The kind of standardization ("ingredients" or "nutrition").
+        :param model: The model name.
+        :param prompt: The system prompt text.
+        :param payload: The input sent to the model.
+        :return: The memoized result, or None on a miss.
+        """
+        data = await self.redis_client.get(self.result_key(kind, model, prompt, payload))
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logging.info(f"GPT cache hit for {kind}")
+        return json.loads(data)
+
+    async def put(self, kind, model, prompt, payload, result):
+        """Memoize the result for a whole input."""
+        await self.redis_client.set(self.result_key(kind, model, prompt, payload), json.dumps(result), ex=settings.GPT_CACHE_TTL)
+
+    async def get_lines(self, model, prompt, lines):
+        """
+        Look up memoized results for individual ingredient lines in one round-trip.
+
+        :param model: The model name.
+        :param prompt: The system prompt text.
+        :param lines: The raw ingredient lines.
+        :return: A list aligned with lines holding the memoized result or None for each line.
+        """
+        if not lines:
+            return []
+        values = await self.redis_client.mget([self.line_key(model, prompt, line) for line in lines])
+        results = [json.loads(value) if value is not None else None for value in values]
+        hits = sum(result is not None for result in results)
+        self.line_hits += hits
+        self.line_misses += len(results) - hits
+        return results
+
+    async def put_lines(self, model, prompt, line_results):
+        """
+        Memoize results for individual ingredient lines in one pipeline.
+
+        :param model: The model name.
+        :param prompt: The system prompt text.
+        :param line_results: Iterable of (line, result) pairs.
+        """
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for line, result in line_results:
+                pipe.set(self.line_key(model, prompt, line), json.dumps(result), ex=settings.GPT_CACHE_TTL)
+            await pipe.execute()
+
+    def stats(self):
+        """
+        Return hit/miss counters for whole inputs and individual ingredient lines.
+
+        :return: A dictionary of counters.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "line_hits": self.line_hits,
+            "line_misses": self.line_misses,
+        }
@@ -0,0 +1,207 @@
+import json
+import logging
+import time
+import zlib
+from core.configs import settings
+
+# Configure logging to track the Redis value codec
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Encoded values start with a 4-byte header: MAGIC, the format version, the serializer id and the compression id.
+# JSON text never starts with a NUL byte, so a value without the header is a legacy json.dumps string.
+MAGIC = b"\x00"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4
+
+# Wire ids of the serializers and compressions; never renumber them, stored values carry these ids
+SERIALIZERS = {"json": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+def _json_serializer(level):
+    """Return (dumps, loads) for JSON: orjson when it is installed, the standard library otherwise."""
+    try:
+        import orjson
+    except ImportError:
+        return (lambda value: json.dumps(value, separators=(",", ":")).encode()), json.loads
+    return (lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)), orjson.loads
+
+
+def _msgpack_serializer(level):
+    """Return (dumps, loads) for msgpack."""
+    import msgpack
+
+    return (
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False),
+    )
+
+
+def _zlib_compression(level):
+    """Return (compress, decompress) for zlib."""
+    return (lambda data: zlib.compress(data, level)), zlib.decompress
+
+
+def _zstd_compression(level):
+    """Return (compress, decompress) for zstd (requires the zstandard package)."""
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=level).compress, zstandard.ZstdDecompressor().decompress
+
+
+SERIALIZER_FACTORIES = {SERIALIZERS["json"]: _json_serializer, SERIALIZERS["msgpack"]: _msgpack_serializer}
+COMPRESSION_FACTORIES = {COMPRESSIONS["zlib"]: _zlib_compression, COMPRESSIONS["zstd"]: _zstd_compression}
+
+
+class ValueCodec:
+    """
+    Encodes the values RedisManager stores. Values are serialized with JSON (orjson) or msgpack, compressed
+    when they reach a size threshold, and prefixed with a versioned header naming both, so any instance can
+    decode what any other wrote whatever its own settings. Values without the header (written with
+    json.dumps before the codec existed, or by instances running REDIS_CODEC=legacy) are decoded as JSON.
+    """
+
+    def __init__(self, serializer=None, compression=None, threshold=None, level=None):
+        """
+        :param serializer: "legacy" (plain json.dumps strings, no header), "json" or "msgpack" (default REDIS_CODEC).
+        :param compression: "none", "zlib" or "zstd" (default REDIS_COMPRESSION).
+        :param threshold: Serialized values of at least this many bytes are compressed (default REDIS_COMPRESSION_THRESHOLD).
+        :param level: The compression level (default REDIS_COMPRESSION_LEVEL).
+        """
+        serializer = serializer or settings.REDIS_CODEC
+        compression = compression or settings.REDIS_COMPRESSION
+        if serializer != "legacy" and serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown Redis codec: {serializer}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown Redis compression: {compression}")
+        self.threshold = settings.REDIS_COMPRESSION_THRESHOLD if threshold is None else threshold
+        self.level = settings.REDIS_COMPRESSION_LEVEL if level is None else level
+        self._serializers = {}  # serializer id -> (dumps, loads), loaded on first use
+        self._compressions = {}  # compression id -> (compress, decompress), loaded on first use
+
+        # Writers fall back to what this instance can produce; decoding another instance's format still needs it
+        if serializer == "msgpack" and not self._available(self._serializer, SERIALIZERS[serializer]):
+            logging.warning("REDIS_CODEC=msgpack but msgpack is not installed, writing json")
+            serializer = "json"
+        if compression == "zstd" and not self._available(self._compression, COMPRESSIONS[compression]):
+            logging.warning("REDIS_COMPRESSION=zstd but zstandard is not installed, compressing with zlib")
+            compression = "zlib"
+        self.serializer = serializer
+        self.compression = compression
+
+        # Codec counters
+        self.encoded = 0
+        self.decoded = 0
+        self.legacy_decoded = 0
+        self.compressed = 0
+        self.serialized_bytes = 0
+        self.stored_bytes = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    @staticmethod
+    def _available(loader, wire_id):
+        """Check whether the serializer or compression with wire_id can be loaded."""
+        try:
+            loader(wire_id)
+        except ImportError:
+            return False
+        return True
+
+    def _serializer(self, serializer_id):
+        """Return (dumps, loads) for a serializer id."""
+        functions = self._serializers.get(serializer_id)
+        if functions is None:
+            if serializer_id not in SERIALIZER_FACTORIES:
+                raise ValueError(f"Unknown serializer id {serializer_id} in Redis value header")
+            functions = self._serializers[serializer_id] = SERIALIZER_FACTORIES[serializer_id](self.level)
+        return functions
+
+    def _compression(self, compression_id):
+        """Return (compress, decompress) for a compression id."""
+        functions = self._compressions.get(compression_id)
+        if functions is None:
+            if compression_id not in COMPRESSION_FACTORIES:
+                raise ValueError(f"Unknown compression id {compression_id} in Redis value header")
+            functions = self._compressions[compression_id] = COMPRESSION_FACTORIES[compression_id](self.level)
+        return functions
+
+    def encode(self, value, plain=False):
+        """
+        Encode a value for Redis.
+
+        :param value: A JSON-compatible value (dict, list, str, number, bool or None).
+        :param plain: Write a plain JSON string whatever the codec, for values read by clients outside this code.
+        :return: The header and payload as bytes, or a plain JSON string with REDIS_CODEC=legacy or plain=True.
+        """
+        started_at = time.perf_counter()
+        if plain or self.serializer == "legacy":
+            data = json.dumps(value)
+            size = serialized_size = len(data)
+        else:
+            serializer_id, compression_id = SERIALIZERS[self.serializer], COMPRESSIONS["none"]
+            payload = self._serializer(serializer_id)[0](value)
+            serialized_size = len(payload)
+            if self.compression != "none" and serialized_size >= self.threshold:
+                compressed = self._compression(COMPRESSIONS[self.compression])[0](payload)
+                # Keep the serialized bytes when compression does not pay for itself
+                if len(compressed) < serialized_size:
+                    payload, compression_id = compressed, COMPRESSIONS[self.compression]
+                    self.compressed += 1
+            data = MAGIC + bytes((FORMAT_VERSION, serializer_id, compression_id)) + payload
+            size = len(data)
+
+        self.encoded += 1
+        self.serialized_bytes += serialized_size
+        self.stored_bytes += size
+        self.encode_seconds += time.perf_counter() - started_at
+        return data
+
+    def decode(self, data):
+        """
+        Decode a value read from Redis.
+
+        :param data: The stored bytes (or str, from a client with decode_responses=True).
+        :return: The value.
+        :raises ValueError: If the header names a format version, serializer or compression this codec does not know.
+        """
+        started_at = time.perf_counter()
+        if isinstance(data, str) or not data.startswith(MAGIC):
+            value = json.loads(data)
+            self.legacy_decoded += 1
+        else:
+            if len(data) < HEADER_SIZE or data[1] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported Redis value header: {bytes(data[:HEADER_SIZE])!r}")
+            serializer_id, compression_id = data[2], data[3]
+            payload = data[HEADER_SIZE:]
+            if compression_id != COMPRESSIONS["none"]:
+                payload = self._compression(compression_id)[1](payload)
+            value = self._serializer(serializer_id)[1](payload)
+
+        self.decoded += 1
+        self.decode_seconds += time.perf_counter() - started_at
+        return value
+
+    def stats(self):
+        """
+        Return codec settings and counters.
+
+        :return: A dictionary with the active codec, value counts, bytes before and after compression, and timings.
+        """
+        return {
+            "codec": self.serializer,
+            "compression": self.compression,
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "legacy_decoded": self.legacy_decoded,
+            "compressed": self.compressed,
+            "serialized_bytes": self.serialized_bytes,
+            "stored_bytes": self.stored_bytes,
+            "avg_stored_bytes": round(self.stored_bytes / self.encoded, 1) if self.encoded else 0.0,
+            "avg_encode_us": round(self.encode_seconds / self.encoded * 1e6, 1) if self.encoded else 0.0,
+            "avg_decode_us": round(self.decode_seconds / self.decoded * 1e6, 1) if self.decoded else 0.0,
+        }
+
+
+# Process-wide codec used by RedisManager and the recipe cache
+redis_codec = ValueCodec()
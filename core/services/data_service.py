@@ -1,12 +1,152 @@
 import redis.asyncio as redis
-import json
+from redis.client import NEVER_DECODE
+from redis.exceptions import ResponseError
+import re
+import time
 from core.configs import settings
+from core.services import metrics_service as metrics
+from core.services.codec_service import redis_codec
+from core.services.resilience_service import parse_retry_after, resilience
 import logging
-import aiohttp
+from core.services.http_service import http_client
 
 # Configure logging to track important events in Redis and Pub/Sub interactions
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """
+    A blocking Redis connection pool that records how long callers wait for a free connection.
+    When all max_connections are in use, callers wait up to REDIS_POOL_TIMEOUT seconds instead of
+    opening more connections.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        started_at = time.monotonic()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        finally:
+            wait = time.monotonic() - started_at
+            self.acquired += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def stats(self):
+        """
+        Return connection pool statistics.
+
+        :return: A dictionary with in-use and idle connection counts and connection wait times.
+        """
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            "acquired": self.acquired,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+# Process-wide connection pool shared by every RedisManager in this instance
+_redis_pool = None
+
+
+def get_redis_pool():
+    """
+    Return the process-wide Redis connection pool, creating it on first use.
+
+    :return: The shared InstrumentedConnectionPool.
+    """
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = InstrumentedConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD,
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=True,
+        )
+        logging.info(f"Redis connection pool created: max_connections={settings.REDIS_MAX_CONNECTIONS}")
+    return _redis_pool
+
+
+async def close_redis_pool():
+    """Disconnect every connection in the shared pool. Called from each FastAPI app's shutdown handler."""
+    if _redis_pool is not None:
+        await _redis_pool.disconnect()
+        logging.info("Redis connection pool closed")
+
+
+def redis_pool_stats():
+    """
+    Return statistics for the shared Redis connection pool.
+
+    :return: A dictionary of pool statistics (empty if the pool has not been created).
+    """
+    return _redis_pool.stats() if _redis_pool is not None else {}
+
+
+# Session key types that only carry data from one phase to the next, deleted once a session's clean data is stored.
+# The "record" hash holds processed_html (and *_result fields from earlier versions); recipe_info and ingredients
+# are no longer written but may remain from earlier versions.
+INTERMEDIATE_KEYS = ("submission", "event_data", "record", "recipe_info", "ingredients")
+
+# Session keys read by clients straight from Redis: always stored as plain JSON strings, whatever REDIS_CODEC is
+CLIENT_KEYS = ("clean_processed_data",)
+
+# TTL policy by session key type
+SESSION_KEY_TTLS = {
+    **{key: settings.SESSION_TTL_INTERMEDIATE for key in INTERMEDIATE_KEYS},
+    "clean_processed_data": settings.SESSION_TTL_RESULT,
+}
+
+# Key prefixes memory_report may be restricted to
+MEMORY_REPORT_PREFIXES = (
+    "temp", "prefix", "session", "progress", "pipeline", "singleflight", "recipe_cache", "gpt_cache", "fetch_host",
+)
+
+# Patterns grouping Redis keys into the key types reported by memory_report (first match wins)
+KEY_TYPE_PATTERNS = (
+    (re.compile(r"^(temp|prefix|session):[^:]+:(.+)$"), r"\1:*:\2"),
+    (re.compile(r"^progress:[^:]+:events$"), "progress:*:events"),
+    (re.compile(r"^singleflight:([^:]+):.+:(lock|result)$"), r"singleflight:\1:*:\2"),
+    (re.compile(r"^gpt_cache:([^:]+):.+$"), r"gpt_cache:\1:*"),
+    (re.compile(r"^([^:]+):.+$"), r"\1:*"),
+)
+
+
+def session_key_ttl(key: str):
+    """
+    Return the TTL policy for a session key type.
+
+    :param key: The key type, e.g. "submission" or "clean_processed_data".
+    :return: The TTL in seconds.
+    """
+    return SESSION_KEY_TTLS.get(key, settings.SESSION_TTL_DEFAULT)
+
+
+def key_type(redis_key: str):
+    """
+    Return the key type a Redis key is reported under, e.g. "temp:*:submission" or "recipe_cache:*".
+
+    :param redis_key: The full Redis key.
+    """
+    for pattern, replacement in KEY_TYPE_PATTERNS:
+        if pattern.match(redis_key):
+            return pattern.sub(replacement, redis_key)
+    return redis_key
+
+
 class RedisManager:
     """
     A class to manage asynchronous interactions with Redis. This class provides methods
@@ -15,21 +155,43 @@ class RedisManager:
 
     def __init__(self):
         """
-        Initialize the RedisManager with the necessary Redis configuration.
-        Establish a connection to the Redis server using host, port, and password.
+        Initialize the RedisManager on top of the process-wide connection pool.
+        Creating a RedisManager is cheap: every instance shares the same pooled connections.
         """
-        self.redis_client = redis.Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        password=settings.REDIS_PASSWORD,
-        decode_responses=True
-        )
-        # self.redis_client = redis.from_url(
-        #     f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
-        #     password=settings.REDIS_PASSWORD,
-        #     decode_responses=True
-        # )
+        self.redis_client = redis.Redis(connection_pool=get_redis_pool())
+
+    async def read_raw(self, *command):
+        """
+        Run a read command and return its reply undecoded. The shared pool decodes replies to str, which would
+        fail on binary codec values; codec values are always read through here.
+
+        :param command: The command and its arguments, e.g. ("GET", key).
+        :return: The raw reply (bytes, a list of bytes/None, or None).
+        """
+        return await self.redis_client.execute_command(*command, **{NEVER_DECODE: True})
+
+    async def set_value(self, redis_key: str, data, ex: int, plain: bool = False):
+        """
+        Encode data with the Redis codec and store it under redis_key.
+
+        :param redis_key: The full Redis key.
+        :param data: The data to store.
+        :param ex: Expiry in seconds.
+        :param plain: Store a plain JSON string whatever the codec (for keys clients read).
+        """
+        await self.redis_client.set(redis_key, redis_codec.encode(data, plain=plain), ex=ex)
+
+    async def get_value(self, redis_key: str):
+        """
+        Read and decode a value stored with set_value (or a legacy JSON string).
+
+        :param redis_key: The full Redis key.
+        :return: The decoded data, or None if the key does not exist.
+        """
+        data = await self.read_raw("GET", redis_key)
+        return redis_codec.decode(data) if data is not None else None
 
+    @metrics.timer(metrics.REDIS_SECONDS, operation="save_to_redis")
     async def save_to_redis(self, session_id: str, key: str, data: dict, prefix: str = "prefix"):
         """
         Save data to Redis under a key prefixed with the provided prefix and session ID.
@@ -40,9 +202,10 @@ class RedisManager:
         :param prefix: Optional prefix to group keys (default is 'prefix').
         """
         redis_key = f"{prefix}:{session_id}:{key}"
-        await self.redis_client.set(redis_key, json.dumps(data), ex=3600)
+        await self.set_value(redis_key, data, ex=session_key_ttl(key), plain=key in CLIENT_KEYS)
         logging.info(f"Data saved to Redis with key: {redis_key}")
 
+    @metrics.timer(metrics.REDIS_SECONDS, operation="get_from_redis")
     async def get_from_redis(self, session_id: str, key: str, prefix: str = "prefix"):
         """
         Retrieve data from Redis based on the prefix, session ID, and key.
@@ -53,51 +216,218 @@ class RedisManager:
         :return: The retrieved data, or None if not found.
         """
         redis_key = f"{prefix}:{session_id}:{key}"
-        data = await self.redis_client.get(redis_key)  # Fetch the data from Redis
-        if data:
+        data = await self.get_value(redis_key)  # Fetch and decode the data from Redis
+        if data is not None:
             logging.info(f"Data retrieved from Redis with key: {redis_key}")
-            return json.loads(data)  # Return the data after converting it from JSON format
+            return data
         else:
             logging.warning(f"No data found in Redis for key: {redis_key}")
             return None
 
-    async def delete_from_redis(self, session_id: str, key: str):
+    @metrics.timer(metrics.REDIS_SECONDS, operation="save_session_fields")
+    async def save_session_fields(self, session_id: str, fields: dict, prefix: str = "prefix"):
         """
-        Delete specific data from Redis based on the session ID and key.
+        Save several fields of a session record in one round-trip. All fields of a session live in a single
+        Redis hash ({prefix}:{session_id}:record); the HSET and the TTL refresh are sent as one pipeline.
+
+        :param session_id: Unique identifier for the session.
+        :param fields: Mapping of field name to data; each value is encoded with the Redis codec.
+        :param prefix: Optional prefix to group keys (default is 'prefix').
+        """
+        redis_key = f"{prefix}:{session_id}:record"
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(redis_key, mapping={field: redis_codec.encode(value) for field, value in fields.items()})
+            pipe.expire(redis_key, session_key_ttl("record"))
+            await pipe.execute()
+        logging.info(f"Fields {list(fields)} saved to Redis session record: {redis_key}")
+
+    @metrics.timer(metrics.REDIS_SECONDS, operation="get_session_fields")
+    async def get_session_fields(self, session_id: str, fields: list, prefix: str = "prefix"):
+        """
+        Retrieve several fields of a session record in one round-trip.
+
+        :param session_id: Unique identifier for the session.
+        :param fields: The field names to fetch.
+        :param prefix: Optional prefix to group keys (default is 'prefix').
+        :return: A dictionary of the fields that exist in the record.
+        """
+        redis_key = f"{prefix}:{session_id}:record"
+        values = await self.read_raw("HMGET", redis_key, *fields)
+        return {field: redis_codec.decode(value) for field, value in zip(fields, values) if value is not None}
+
+    async def get_session_field(self, session_id: str, field: str, prefix: str = "prefix"):
+        """
+        Retrieve a single field of a session record.
+
+        :param session_id: Unique identifier for the session.
+        :param field: The field name to fetch.
+        :param prefix: Optional prefix to group keys (default is 'prefix').
+        :return: The field data, or None if not found.
+        """
+        data = await self.get_session_fields(session_id, [field], prefix=prefix)
+        if field not in data:
+            logging.warning(f"No field {field} found in Redis session record: {prefix}:{session_id}:record")
+        return data.get(field)
+
+    @metrics.timer(metrics.REDIS_SECONDS, operation="delete_from_redis")
+    async def delete_from_redis(self, session_id: str, key: str, prefix: str = "prefix"):
+        """
+        Delete specific data from Redis based on the prefix, session ID, and key.
         
         :param session_id: Unique identifier for the session.
         :param key: Specific key under the session to delete data.
+        :param prefix: Optional prefix to group keys (default is 'prefix').
         """
-        redis_key = f"{session_id}:{key}"
+        redis_key = f"{prefix}:{session_id}:{key}"
         await self.redis_client.delete(redis_key)  # Delete the specified key from Redis
         logging.info(f"Data deleted from Redis for key: {redis_key}")
 
+    @metrics.timer(metrics.REDIS_SECONDS, operation="cleanup_session")
+    async def cleanup_session(self, session_id: str, prefix: str = "prefix"):
+        """
+        Delete a session's intermediate keys (INTERMEDIATE_KEYS) in one round-trip, once its final data is stored.
+
+        :param session_id: Unique identifier for the session.
+        :param prefix: Optional prefix to group keys (default is 'prefix').
+        :return: The number of keys deleted.
+        """
+        deleted = await self.redis_client.delete(*(f"{prefix}:{session_id}:{key}" for key in INTERMEDIATE_KEYS))
+        logging.info(f"Deleted {deleted} intermediate keys for session: {session_id}")
+        return deleted
+
+    @metrics.timer(metrics.REDIS_SECONDS, operation="memory_report")
+    async def memory_report(self, sample: int = None, prefix: str = None):
+        """
+        Estimate Redis memory by key type: SCAN a sample of keys, measure each with MEMORY USAGE and scale the
+        sample up to DBSIZE. Servers that reject MEMORY USAGE are measured with the length of DUMP instead,
+        which leaves out Redis' per-key overhead.
+
+        :param sample: The number of keys to sample, at most REDIS_MEMORY_SAMPLE (the default).
+        :param prefix: Optional key prefix from MEMORY_REPORT_PREFIXES restricting the keys sampled.
+        :return: A dictionary with the key counts, the measurement used and, per key type, the keys sampled,
+                 their bytes, the average per key and the estimated total, largest first.
+        :raises ValueError: If prefix is not one of MEMORY_REPORT_PREFIXES.
+        """
+        if prefix is not None and prefix not in MEMORY_REPORT_PREFIXES:
+            raise ValueError(f"Unknown key prefix: {prefix}")
+        sample = max(1, min(sample or settings.REDIS_MEMORY_SAMPLE, settings.REDIS_MEMORY_SAMPLE))
+        keys = []
+        async for key in self.redis_client.scan_iter(match=f"{prefix}:*" if prefix else "*", count=500):
+            keys.append(key)
+            if len(keys) >= sample:
+                break
+
+        # Probe with one key: a server without MEMORY USAGE would fail the whole pipeline
+        measurement = "memory_usage"
+        try:
+            if keys:
+                await self.redis_client.memory_usage(keys[0], samples=0)
+        except ResponseError:
+            measurement = "dump_length"
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                if measurement == "memory_usage":
+                    pipe.memory_usage(key, samples=0)
+                else:
+                    pipe.dump(key)
+            sizes = await pipe.execute()
+        if measurement == "dump_length":
+            sizes = [len(data) if data is not None else None for data in sizes]
+
+        total_keys = await self.redis_client.dbsize()
+        scale = total_keys / len(keys) if keys else 0
+        types = {}
+        for key, size in zip(keys, sizes):
+            if size is None:  # Expired between SCAN and the measurement
+                continue
+            entry = types.setdefault(key_type(key), {"keys": 0, "bytes": 0})
+            entry["keys"] += 1
+            entry["bytes"] += size
+        for entry in types.values():
+            entry["avg_bytes"] = round(entry["bytes"] / entry["keys"], 1)
+            entry["estimated_total_bytes"] = round(entry["bytes"] * scale)
+
+        return {
+            "total_keys": total_keys,
+            "sampled_keys": len(keys),
+            "measurement": measurement,
+            "types": dict(sorted(types.items(), key=lambda item: item[1]["bytes"], reverse=True)),
+        }
+
+
+# Statuses a service answers before starting the phase (rate limited, overloaded). Unlike RETRYABLE_STATUSES,
+# no 408, 502 or 504: a proxy can send those after the phase has started, and a retry would run it twice
+SERVICE_RETRYABLE_STATUSES = {429, 503}
+
+
+class ServiceCallError(Exception):
+    """Raised when a downstream service answers with a status other than 200."""
+
+    def __init__(self, service_name, status, error_msg, retry_after=None):
+        super().__init__(f"Failed to call {service_name} API: {status}, {error_msg}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def is_retryable_service_error(error):
+    """
+    Tell transient service call failures from permanent ones. Only failures where the phase cannot have started
+    are retried: a rate limit or overload status (429, 503), a refused connection, or a pooled connection the
+    server had already closed. Timeouts and gateway statuses are not retried, since the phase may still be running.
+
+    :param error: The exception raised by the call.
+    :return: True if the call should be retried.
+    """
+    import aiohttp
+
+    if isinstance(error, ServiceCallError):
+        return error.status in SERVICE_RETRYABLE_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError))
+
+
 # Asynchronous function to send data to an external service (facilitate-request)
 async def send_to_service(service_url, data, session_id, service_name):
     """
     Asynchronous function to send data to an external service (HTML process or URL parsing).
+    Transient failures are retried with backoff, through the service's circuit breaker (resilience_service).
     
     :param service_url: The URL of the external service.
     :param data: The data payload to be sent.
     :param session_id: The session ID for tracking.
     :param user_id: The user ID for tracking.
     :param service_name: The name of the service for logging.
+    :return: The service's JSON response.
     """
+    import aiohttp
+
     logging.info(f"Sending data to {service_name} API for session: {session_id}")
-    redis_manager = RedisManager()
-
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(service_url, json=data) as response:
-                if response.status == 200:
-                    logging.info(f"{service_name} API call successful for session: {session_id}")
-                    result = await response.json()
-                    await redis_manager.save_to_redis(session_id, f"{service_name.lower()}_result", result, prefix="temp")
-                else:
-                    error_msg = await response.text()
-                    logging.error(f"Failed to call {service_name} API: {response.status}, {error_msg}")
-                    raise Exception(f"Failed to call {service_name} API: {response.status}, {error_msg}")
-    
-    except Exception as e:
-        logging.error(f"Error occurred while calling {service_name} API for session: {session_id} - {str(e)}")
-        raise e
\ No newline at end of file
+    # The shared session's HTTP_TIMEOUT is sized for page fetches; a hop waits for the whole downstream phase
+    timeout = aiohttp.ClientTimeout(total=settings.HTTP_SERVICE_TIMEOUT)
+
+    async def post():
+        # Reuse the pooled, keep-alive session instead of opening a new connection per hop
+        session = await http_client.get_session()
+        async with session.post(service_url, json=data, timeout=timeout) as response:
+            if response.status == 200:
+                return await response.json()
+            error_msg = await response.text()
+            logging.error(f"Failed to call {service_name} API: {response.status}, {error_msg}")
+            raise ServiceCallError(service_name, response.status, error_msg, parse_retry_after(response.headers.get("Retry-After")))
+
+    # Time each hop per target service, retries included
+    async with metrics.timer(metrics.SERVICE_CALL_SECONDS, target=service_name):
+        try:
+            result = await resilience.call(
+                service_name, post, is_retryable_service_error,
+                retry_after=lambda error: getattr(error, "retry_after", None),
+                hedge_after=settings.SERVICE_HEDGE_AFTER_MS / 1000,
+            )
+            logging.info(f"{service_name} API call successful for session: {session_id}")
+            # Not written to the session record: the call returns after the GPT phase has cleaned the session up,
+            # and nothing reads the response back
+            return result
+
+        except Exception as e:
+            logging.error(f"Error occurred while calling {service_name} API for session: {session_id} - {str(e)}")
+            raise e
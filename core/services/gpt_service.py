@@ -1,30 +1,354 @@
+import asyncio
 import logging
 import json
 from core.configs import settings
 from core.configs import prompts
+from core.services import cache_service as cache
+from core.services import data_service as ds
+from core.services import ingredient_service as ingredients
+from core.services import metrics_service as metrics
+from core.services import nutrition_service as nutrition
+from core.services.resilience_service import RETRYABLE_STATUSES, parse_retry_after, resilience
+from core.services.singleflight_service import SingleFlight
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+GPT_MODEL = "gpt-4o"
 
+# Memo of standardization results shared by every gpt-processing instance through Redis
+gpt_cache = cache.GptCache(ds.RedisManager())
+
+# Caps the number of OpenAI requests in flight from this instance
+openai_slots = asyncio.Semaphore(settings.OPENAI_MAX_INFLIGHT)
+
+# Coalesces concurrent standardizations of the same input, within this instance and across instances
+gpt_flight = SingleFlight(ds.RedisManager(), "gpt")
+
+
+class BatchMismatch(Exception):
+    """Raised to the callers of a micro-batch whose reply could not be split back into one result per line."""
+
+
+class IngredientLineBatcher:
+    """
+    Micro-batches ingredient lines from concurrent standardizations (e.g. a bulk import) into one model call.
+    Lines arriving within GPT_BATCH_WINDOW_MS are sent together (duplicates once), and each caller gets the
+    results for its own lines. If the model does not return exactly one result per line, the callers fall
+    back to their own calls.
+    """
+
+    def __init__(self):
+        self.pending = {}  # normalized line -> (line, future)
+        self.flush_task = None
+        self.tasks = set()  # Running flush/send tasks; the event loop only keeps weak references to tasks
+
+        # Batching counters
+        self.batches = 0
+        self.lines = 0
+        self.requests = 0
+        self.mismatches = 0
+
+    async def standardize(self, lines):
+        """
+        Standardize lines as part of the next micro-batch.
+
+        :param lines: The raw ingredient lines.
+        :return: One standardized result per line, in order.
+        :raises BatchMismatch: If the batch reply could not be split per line.
+        """
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        futures = []
+        for line in lines:
+            key = cache.normalize_ingredient_line(line)
+            if key not in self.pending:
+                self.pending[key] = (line, loop.create_future())
+            futures.append(self.pending[key][1])
+
+        if len(self.pending) >= settings.GPT_BATCH_MAX_LINES:
+            self._flush_now()
+        elif self.flush_task is None:
+            self.flush_task = self._spawn(self._flush_later())
+
+        # Futures are shared with the other callers of the batch: shield them so a cancelled caller cancels only itself
+        return list(await asyncio.gather(*(asyncio.shield(future) for future in futures)))
+
+    def _spawn(self, coroutine):
+        """Run a coroutine as a task, holding a reference to it until it finishes."""
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _flush_later(self):
+        """Send the batch once the collection window closes."""
+        await asyncio.sleep(settings.GPT_BATCH_WINDOW_MS / 1000)
+        self.flush_task = None
+        await self._send(self._take())
+
+    def _flush_now(self):
+        """Send the batch immediately because it reached GPT_BATCH_MAX_LINES."""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        self._spawn(self._send(self._take()))
+
+    def _take(self):
+        """Detach the pending lines as one batch."""
+        batch, self.pending = list(self.pending.values()), {}
+        return batch
+
+    async def _send(self, batch):
+        """Standardize a batch with one model call and resolve every line's future."""
+        if not batch:
+            return
+        lines = [line for line, _ in batch]
+        self.batches += 1
+        self.lines += len(lines)
+        try:
+            summary = await _complete(prompts.prompt_ingredients, f"Here's the ingredients: {lines}")
+            # Log the parsed summary for debugging
+            logging.info(f"Parsed summary: {summary}")
+            parsed = parse_summary(summary)
+            if not isinstance(parsed, list) or len(parsed) != len(lines):
+                self.mismatches += 1
+                raise BatchMismatch(f"Batch of {len(lines)} lines returned {len(parsed) if isinstance(parsed, list) else 'no'} results")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark it retrieved: every caller waiting on it may have been cancelled
+                    future.exception()
+            return
+
+        for (_, future), result in zip(batch, parsed):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        """
+        Return batching counters.
+
+        :return: A dictionary with batches sent, lines per batch and requests merged per batch.
+        """
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "lines": self.lines,
+            "mismatches": self.mismatches,
+            "avg_lines_per_batch": round(self.lines / self.batches, 2) if self.batches else 0.0,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# Micro-batches ingredient lines that miss the cache across concurrent standardizations
+ingredient_batcher = IngredientLineBatcher()
+
+
+def warm_openai_client():
+    """
+    Start creating the OpenAI client in a worker thread. Called at startup by the services that call the model,
+    so the import happens while the instance starts serving rather than during its first request.
+
+    :return: The future of the thread's work.
+    """
+    return asyncio.get_running_loop().run_in_executor(None, getattr, settings, "OPENAI_CLIENT")
+
+
+async def close_openai_client():
+    """Close the OpenAI client if this instance created it. Called at application shutdown."""
+    client = vars(settings).get("OPENAI_CLIENT")
+    if client is not None:
+        await client.close()
+
+
+def _is_retryable_openai_error(error):
+    """Retry rate limits, server errors, timeouts and connection failures; not invalid requests or auth errors."""
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):  # Includes APITimeoutError
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code in RETRYABLE_STATUSES or error.status_code >= 500)
+
+
+def _openai_retry_after(error):
+    """Return the Retry-After of a failed OpenAI request, in seconds, if it had one."""
+    response = getattr(error, "response", None)
+    return parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+
+
+@metrics.timer(metrics.GPT_SECONDS, operation="completion")
+async def _complete(system_prompt, user_content):
+    """
+    Send one chat completion request and return the message content. Transient failures are retried with
+    backoff through the OpenAI circuit breaker, and slow requests are hedged after OPENAI_HEDGE_AFTER_MS.
+
+    :param system_prompt: The system prompt describing the expected output.
+    :param user_content: The user message carrying the data to standardize.
+    :return: The raw content of the model's reply.
+    """
+    async def create():
+        async with openai_slots:
+            return await settings.OPENAI_CLIENT.chat.completions.create(
+                model=GPT_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content},
+                ],
+                timeout=settings.OPENAI_TIMEOUT,
+            )
+
+    response = await resilience.call(
+        "openai", create, _is_retryable_openai_error,
+        retry_after=_openai_retry_after, hedge_after=settings.OPENAI_HEDGE_AFTER_MS / 1000,
+    )
+    # Ensure the response has content before parsing
+    if not response.choices or not response.choices[0].message.content:
+        raise ValueError("Empty response from OpenAI API")
+    return response.choices[0].message.content
+
+
+def parse_summary(summary):
+    """
+    Decode the JSON list returned by the model, tolerating a surrounding markdown code fence.
+
+    :param summary: The raw model reply.
+    :return: The decoded value, or None if the reply is not valid JSON.
+    """
+    text = summary.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def _stitch(results, new_results):
+    """
+    Fill the gaps (None) in results with new_results, in order. If the model merged or split lines the
+    counts differ, so the new results are kept together where the first gap was.
+
+    :param results: Results aligned with the original lines, None where a line still needs a result.
+    :param new_results: The results for the missing lines.
+    :return: The combined list.
+    """
+    if sum(result is None for result in results) == len(new_results):
+        new_iter = iter(new_results)
+        return [result if result is not None else next(new_iter) for result in results]
+
+    stitched, inserted = [], False
+    for result in results:
+        if result is not None:
+            stitched.append(result)
+        elif not inserted:
+            stitched.extend(new_results)
+            inserted = True
+    return stitched
+
+
+async def _complete_lines(lines):
+    """
+    Standardize ingredient lines with the model, as part of a micro-batch when GPT_BATCH_ENABLED.
+
+    :param lines: The raw ingredient lines.
+    :return: The decoded list of results, or the raw model reply if it could not be decoded.
+    """
+    if settings.GPT_BATCH_ENABLED:
+        try:
+            return await ingredient_batcher.standardize(lines)
+        except BatchMismatch as e:
+            logging.warning(f"Falling back to a separate call: {e}")
+
+    summary = await _complete(prompts.prompt_ingredients, f"Here's the ingredients: {lines}")
+    # Log the parsed summary for debugging
+    logging.info(f"Parsed summary: {summary}")
+    parsed = parse_summary(summary)
+    return parsed if isinstance(parsed, list) else summary
+
+
+async def _standardize_ingredient_lines(recipe_ingredients):
+    """
+    Standardize ingredient lines with GPT. With the GPT cache enabled, only the lines that are not in the
+    per-line cache are sent to the model and the results are stitched back together in the original order.
+
+    :param recipe_ingredients: The raw ingredient lines.
+    :return: The standardized ingredient list, or the raw model reply if it could not be decoded.
+    """
+    if not settings.GPT_CACHE_ENABLED:
+        return await _complete_lines(recipe_ingredients)
+
+    line_results = await gpt_cache.get_lines(GPT_MODEL, prompts.prompt_ingredients, recipe_ingredients)
+    missing = [line for line, result in zip(recipe_ingredients, line_results) if result is None]
+    logging.info(f"{len(recipe_ingredients) - len(missing)} of {len(recipe_ingredients)} ingredient lines served from the GPT cache")
+
+    if not missing:
+        return line_results
+
+    parsed = await _complete_lines(missing)
+    if not isinstance(parsed, list):
+        return parsed
+
+    if len(parsed) == len(missing):
+        # One result per line: remember each line on its own for future recipes
+        await gpt_cache.put_lines(GPT_MODEL, prompts.prompt_ingredients, zip(missing, parsed))
+    return _stitch(line_results, parsed)
+
+
+def _flight_key(kind, prompt, payload):
+    """Return the single-flight key of a standardization: a hash of the kind, model, prompt version and input."""
+    return cache.stable_hash(kind, GPT_MODEL, cache.GptCache.prompt_version(prompt), payload)
+
+
+@metrics.timer(metrics.GPT_SECONDS, operation="standardize_ingredients")
 async def standardize_ingredients(recipe_name, recipe_ingredients):
+    # Sessions standardizing the same ingredient list at the same time share one model call
+    return await gpt_flight.do(
+        _flight_key("ingredients", prompts.prompt_ingredients, recipe_ingredients),
+        lambda: _standardize_ingredients(recipe_name, recipe_ingredients),
+    )
+
+
+async def _standardize_ingredients(recipe_name, recipe_ingredients):
     try:
-        response = settings.OPENAI_CLIENT.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {f"role": "system", "content": prompts.prompt_ingredients},
-                {"role": "user", "content": f"Here's the ingredients: {recipe_ingredients}"},
-            ]
-        )
-        # Ensure the response has content before parsing
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Empty response from OpenAI API")
-
-        # Log the raw response for debugging
-        summary = response.choices[0].message.content
-        # Log the parsed summary for debugging
-        logging.info(f"Parsed summary: {summary}")
+        is_line_list = isinstance(recipe_ingredients, list) and all(isinstance(line, str) for line in recipe_ingredients)
+
+        # Fast path: lines the local parser understands never reach GPT
+        if settings.INGREDIENT_PARSER_ENABLED and is_line_list:
+            local_results, escalate = ingredients.parse_ingredients(recipe_ingredients, settings.INGREDIENT_PARSER_THRESHOLD)
+            logging.info(f"{len(recipe_ingredients) - len(escalate)} of {len(recipe_ingredients)} ingredient lines parsed locally")
+            if not escalate:
+                return local_results
+
+            summary = await _standardize_ingredient_lines(escalate)
+            return _stitch(local_results, summary) if isinstance(summary, list) else summary
+
+        if not settings.GPT_CACHE_ENABLED:
+            if is_line_list:
+                return await _standardize_ingredient_lines(recipe_ingredients)
+            summary = await _complete(prompts.prompt_ingredients, f"Here's the ingredients: {recipe_ingredients}")
+            # Log the parsed summary for debugging
+            logging.info(f"Parsed summary: {summary}")
+            return summary
+
+        # The same ingredient list standardized before (e.g. a popular recipe) is served from the memo
+        payload = [cache.normalize_ingredient_line(line) for line in recipe_ingredients] if is_line_list else recipe_ingredients
+        cached = await gpt_cache.get("ingredients", GPT_MODEL, prompts.prompt_ingredients, payload)
+        if cached is not None:
+            return cached
 
-         # send gpt metadata to pub/sub
+        if is_line_list:
+            summary = await _standardize_ingredient_lines(recipe_ingredients)
+        else:
+            summary = await _complete(prompts.prompt_ingredients, f"Here's the ingredients: {recipe_ingredients}")
+            # Log the parsed summary for debugging
+            logging.info(f"Parsed summary: {summary}")
+            summary = parse_summary(summary) or summary
+
+        # send gpt metadata to pub/sub
+
+        if not isinstance(summary, str):
+            await gpt_cache.put("ingredients", GPT_MODEL, prompts.prompt_ingredients, payload, summary)
 
     except json.JSONDecodeError as e:
         logging.error(f"JSON decode error while summarizing transcription: {e}, response: {summary}")
@@ -38,26 +362,36 @@ async def standardize_ingredients(recipe_name, recipe_ingredients):
 
     return summary
 
+@metrics.timer(metrics.GPT_SECONDS, operation="standardize_nutrition")
 async def standardize_nutrition(recipe_name, recipe_nutrition):
+    # Splitting "315 kcal" into a quantity and unit is deterministic, so no model round-trip is needed
+    if settings.NUTRITION_NORMALIZER == "local" and isinstance(recipe_nutrition, dict):
+        return nutrition.normalize_nutrition(recipe_nutrition)
+
+    # Sessions standardizing the same nutrition facts at the same time share one model call
+    return await gpt_flight.do(
+        _flight_key("nutrition", prompts.prompt_nutrition, recipe_nutrition),
+        lambda: _standardize_nutrition(recipe_name, recipe_nutrition),
+    )
+
+
+async def _standardize_nutrition(recipe_name, recipe_nutrition):
     try:
-        response = settings.OPENAI_CLIENT.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {f"role": "system", "content": prompts.prompt_nutrition},
-                {"role": "user", "content": f"Here's the nutrition: {recipe_nutrition}"},
-            ]
-        )
-        # Ensure the response has content before parsing
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError("Empty response from OpenAI API")
-
-        # Log the raw response for debugging
-        summary = response.choices[0].message.content
+        if settings.GPT_CACHE_ENABLED:
+            cached = await gpt_cache.get("nutrition", GPT_MODEL, prompts.prompt_nutrition, recipe_nutrition)
+            if cached is not None:
+                return cached
+
+        summary = await _complete(prompts.prompt_nutrition, f"Here's the nutrition: {recipe_nutrition}")
         # Log the parsed summary for debugging
         logging.info(f"Parsed summary: {summary}")
 
         # send gpt metadata to pub/sub
 
+        parsed = parse_summary(summary)
+        if settings.GPT_CACHE_ENABLED and parsed is not None:
+            await gpt_cache.put("nutrition", GPT_MODEL, prompts.prompt_nutrition, recipe_nutrition, parsed)
+
     except json.JSONDecodeError as e:
         logging.error(f"JSON decode error while summarizing transcription: {e}, response: {summary}")
         raise RuntimeError(f"JSON decode error while summarizing transcription: {e}")
@@ -68,4 +402,4 @@ async def standardize_nutrition(recipe_name, recipe_nutrition):
         logging.error(f"Error summarizing transcription: {e}")
         raise RuntimeError(f"Error summarizing transcription: {e}")
 
-    return summary
\ No newline at end of file
+    return summary
@@ -0,0 +1,70 @@
+import logging
+from core.configs import settings
+
+# Configure logging to track the lifecycle of the shared HTTP client
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Only advertise brotli when aiohttp can actually decode it
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+class HttpClient:
+    """
+    An application-scoped aiohttp ClientSession shared by page fetches and service-to-service calls.
+    One pooled connector keeps connections alive and caches DNS lookups, so each request reuses an
+    open TCP/TLS connection instead of paying for a new handshake.
+    """
+
+    def __init__(self):
+        self.session = None
+
+    async def start(self):
+        """Create the shared session. Called from each FastAPI app's startup handler."""
+        if self.session is not None and not self.session.closed:
+            return
+
+        # Imported here so services that never make an outbound call do not load aiohttp at start-up
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_LIMIT,
+            limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+            timeout=aiohttp.ClientTimeout(total=settings.HTTP_TIMEOUT),
+        )
+        logging.info(
+            f"HTTP client started: limit={settings.HTTP_POOL_LIMIT}, limit_per_host={settings.HTTP_POOL_LIMIT_PER_HOST}, "
+            f"accept-encoding={ACCEPT_ENCODING}"
+        )
+
+    async def get_session(self):
+        """
+        Return the shared session, creating it on first use if the app did not start it.
+
+        :return: The pooled aiohttp.ClientSession.
+        """
+        if self.session is None or self.session.closed:
+            await self.start()
+        return self.session
+
+    async def close(self):
+        """Close the shared session and its connector. Called from each FastAPI app's shutdown handler."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            logging.info("HTTP client closed")
+        self.session = None
+
+
+# Process-wide HTTP client shared by every service call and page fetch in this instance
+http_client = HttpClient()
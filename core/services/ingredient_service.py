@@ -0,0 +1,319 @@
+import html
+import re
+
+# Deterministic parser for schema.org recipeIngredient lines. It produces the same
+# {ingredient, quantity, unit, category} structure that prompts.prompt_ingredients asks GPT for,
+# plus a confidence score so only the lines it cannot handle are sent to the model.
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅕': '1/5', '⅖': '2/5', '⅗': '3/5',
+    '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅐': '1/7', '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8', '⅑': '1/9', '⅒': '1/10',
+}
+
+# Canonical unit for every spelling we accept. Keys are lowercase and have no trailing period.
+UNIT_SYNONYMS = {
+    'cup': 'cup', 'cups': 'cup', 'c': 'cup',
+    'tablespoon': 'tablespoon', 'tablespoons': 'tablespoon', 'tbsp': 'tablespoon', 'tbsps': 'tablespoon',
+    'tbs': 'tablespoon', 'tbl': 'tablespoon', 'tbl.': 'tablespoon',
+    'teaspoon': 'teaspoon', 'teaspoons': 'teaspoon', 'tsp': 'teaspoon', 'tsps': 'teaspoon',
+    'ounce': 'ounce', 'ounces': 'ounce', 'oz': 'ounce',
+    'fluid ounce': 'fluid ounce', 'fluid ounces': 'fluid ounce', 'fl oz': 'fluid ounce', 'fl. oz': 'fluid ounce',
+    'pound': 'pound', 'pounds': 'pound', 'lb': 'pound', 'lbs': 'pound',
+    'gram': 'g', 'grams': 'g', 'g': 'g', 'gr': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg', 'kg': 'kg', 'kgs': 'kg',
+    'milligram': 'mg', 'milligrams': 'mg', 'mg': 'mg',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml', 'ml': 'ml',
+    'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l', 'l': 'l',
+    'pint': 'pint', 'pints': 'pint', 'pt': 'pint',
+    'quart': 'quart', 'quarts': 'quart', 'qt': 'quart',
+    'gallon': 'gallon', 'gallons': 'gallon', 'gal': 'gallon',
+    'pinch': 'pinch', 'pinches': 'pinch', 'dash': 'dash', 'dashes': 'dash',
+    'clove': 'clove', 'cloves': 'clove',
+    'slice': 'slice', 'slices': 'slice',
+    'stick': 'stick', 'sticks': 'stick',
+    'sprig': 'sprig', 'sprigs': 'sprig',
+    'bunch': 'bunch', 'bunches': 'bunch',
+    'head': 'head', 'heads': 'head',
+    'can': 'can', 'cans': 'can', 'jar': 'jar', 'jars': 'jar',
+    'package': 'package', 'packages': 'package', 'pkg': 'package', 'packet': 'package', 'packets': 'package',
+    'bag': 'bag', 'bags': 'bag', 'box': 'box', 'boxes': 'box', 'bottle': 'bottle', 'bottles': 'bottle',
+    'container': 'container', 'containers': 'container', 'carton': 'carton', 'cartons': 'carton',
+}
+
+# Case-sensitive cookbook shorthand: "T" is a tablespoon and "t" a teaspoon
+CASE_SENSITIVE_UNITS = {'T': 'tablespoon', 'Tbsp': 'tablespoon', 't': 'teaspoon'}
+
+CONTAINER_UNITS = {'can', 'jar', 'package', 'bag', 'box', 'bottle', 'container', 'carton'}
+
+# Words describing preparation, size or state rather than the ingredient itself
+PREPARATION_WORDS = {
+    'chopped', 'diced', 'minced', 'sliced', 'peeled', 'cored', 'seeded', 'grated', 'shredded', 'crushed',
+    'cubed', 'halved', 'quartered', 'trimmed', 'rinsed', 'drained', 'melted', 'softened', 'beaten', 'sifted',
+    'divided', 'packed', 'finely', 'roughly', 'coarsely', 'thinly', 'freshly', 'lightly', 'firmly', 'well',
+    'large', 'medium', 'small', 'heaping', 'level', 'scant', 'about', 'approximately', 'optional', 'plus', 'more',
+    'cooked', 'uncooked', 'thawed', 'frozen', 'julienned', 'torn', 'pitted', 'stemmed', 'deveined', 'toasted',
+}
+
+# Quantity-free lines that are fully understood: the amount is left to the cook
+DISCRETION_PHRASES = ('to taste', 'as needed', 'for garnish', 'for serving', 'for frying', 'as desired')
+
+# Category keywords; multi-word entries win over single words ("garlic powder" vs "garlic")
+CATEGORY_KEYWORDS = {
+    'meat': (
+        'beef', 'steak', 'chicken', 'pork', 'sausage', 'bacon', 'ham', 'turkey', 'lamb', 'veal', 'prosciutto',
+        'pancetta', 'chorizo', 'salami', 'pepperoni', 'brisket', 'thigh', 'thighs', 'breast', 'breasts',
+        'drumsticks', 'wings', 'ground beef', 'ground turkey', 'ground pork', 'meatballs', 'ribs', 'duck',
+    ),
+    'seafood': (
+        'salmon', 'tuna', 'shrimp', 'prawns', 'cod', 'tilapia', 'halibut', 'crab', 'lobster', 'scallops',
+        'clams', 'mussels', 'anchovies', 'anchovy', 'fish', 'sardines', 'trout', 'squid', 'oysters',
+    ),
+    'veggie': (
+        'onion', 'onions', 'garlic', 'shallot', 'shallots', 'scallions', 'scallion', 'green onions', 'leek', 'leeks',
+        'tomato', 'tomatoes', 'carrot', 'carrots', 'celery', 'potato', 'potatoes', 'sweet potato', 'sweet potatoes',
+        'bell pepper', 'bell peppers', 'red pepper', 'green pepper', 'jalapeno', 'jalapeño', 'jalapenos', 'chile',
+        'chiles', 'spinach', 'kale', 'lettuce', 'cabbage', 'broccoli', 'cauliflower', 'zucchini', 'squash',
+        'eggplant', 'cucumber', 'cucumbers', 'mushroom', 'mushrooms', 'corn', 'peas', 'green beans', 'asparagus',
+        'beet', 'beets', 'radish', 'radishes', 'arugula', 'avocado', 'avocados', 'pumpkin', 'okra', 'artichoke',
+        'brussels sprouts', 'bok choy', 'fennel', 'parsnip', 'turnip', 'ginger', 'tomato paste', 'diced tomatoes',
+    ),
+    'fruit': (
+        'apple', 'apples', 'banana', 'bananas', 'lemon', 'lemons', 'lime', 'limes', 'orange', 'oranges',
+        'strawberries', 'blueberries', 'raspberries', 'blackberries', 'berries', 'cherries', 'grapes', 'peach',
+        'peaches', 'pear', 'pears', 'pineapple', 'mango', 'mangoes', 'raisins', 'cranberries', 'dates', 'coconut',
+        'lemon juice', 'lime juice', 'orange juice', 'lemon zest', 'lime zest', 'orange zest', 'apricots', 'figs',
+    ),
+    'dairy': (
+        'milk', 'butter', 'cheese', 'cream', 'heavy cream', 'sour cream', 'cream cheese', 'yogurt', 'buttermilk',
+        'parmesan', 'mozzarella', 'cheddar', 'ricotta', 'feta', 'half-and-half', 'egg', 'eggs', 'egg yolks',
+        'egg whites', 'yolks', 'whipping cream', 'ghee', 'mascarpone', 'gruyere', 'provolone',
+    ),
+    'spice': (
+        'salt', 'pepper', 'black pepper', 'kosher salt', 'sea salt', 'cumin', 'paprika', 'smoked paprika',
+        'chili powder', 'cayenne', 'cayenne pepper', 'cinnamon', 'nutmeg', 'cloves', 'oregano', 'thyme',
+        'rosemary', 'basil', 'parsley', 'cilantro', 'dill', 'sage', 'bay leaf', 'bay leaves', 'turmeric',
+        'coriander', 'garlic powder', 'onion powder', 'red pepper flakes', 'italian seasoning', 'curry powder',
+        'allspice', 'cardamom', 'mint', 'chives', 'seasoning', 'vanilla', 'vanilla extract', 'fennel seed',
+        'mustard powder', 'ground ginger', 'garam masala', 'saffron', 'peppercorns',
+    ),
+    'baking': (
+        'flour', 'all-purpose flour', 'sugar', 'brown sugar', 'powdered sugar', 'baking soda', 'baking powder',
+        'yeast', 'cornstarch', 'cocoa', 'cocoa powder', 'chocolate', 'chocolate chips', 'honey', 'maple syrup',
+        'molasses', 'gelatin', 'cornmeal', 'breadcrumbs', 'bread crumbs', 'panko',
+    ),
+    'grain': (
+        'rice', 'pasta', 'spaghetti', 'noodles', 'lasagna noodles', 'penne', 'macaroni', 'quinoa', 'oats',
+        'couscous', 'bread', 'tortillas', 'tortilla', 'buns', 'rolls', 'barley', 'farro', 'orzo', 'fettuccine',
+    ),
+    'legume': (
+        'beans', 'black beans', 'kidney beans', 'chickpeas', 'lentils', 'pinto beans', 'cannellini beans', 'tofu',
+        'garbanzo beans', 'edamame',
+    ),
+    'nut': (
+        'almonds', 'walnuts', 'pecans', 'peanuts', 'cashews', 'pistachios', 'pine nuts', 'hazelnuts', 'nuts',
+        'sesame seeds', 'peanut butter', 'almond butter', 'seeds', 'chia seeds', 'flaxseed',
+    ),
+    'oil': (
+        'oil', 'olive oil', 'vegetable oil', 'canola oil', 'coconut oil', 'sesame oil', 'cooking spray',
+        'extra-virgin olive oil', 'shortening', 'lard',
+    ),
+    'condiment': (
+        'soy sauce', 'vinegar', 'balsamic vinegar', 'mustard', 'dijon mustard', 'ketchup', 'mayonnaise', 'mayo',
+        'hot sauce', 'worcestershire sauce', 'sriracha', 'salsa', 'fish sauce', 'tomato sauce', 'marinara sauce',
+        'pasta sauce', 'barbecue sauce', 'bbq sauce', 'teriyaki sauce', 'hoisin sauce', 'pesto', 'sauce',
+    ),
+    'broth': ('broth', 'stock', 'chicken broth', 'beef broth', 'vegetable broth', 'chicken stock', 'bouillon'),
+    'beverage': ('water', 'wine', 'white wine', 'red wine', 'beer', 'coffee', 'tea', 'juice'),
+}
+
+_CATEGORY_LOOKUP = {keyword: category for category, keywords in CATEGORY_KEYWORDS.items() for keyword in keywords}
+
+_AMOUNT = r'\d+/\d+|\d+(?:\.\d+)?(?:\s+\d+/\d+)?'
+_QUANTITY_RE = re.compile(rf'^(?P<q1>{_AMOUNT})(?:\s*(?:-|–|—|to|or)\s*(?P<q2>{_AMOUNT}))?\s*')
+_PARENTHETICAL_SIZE_RE = re.compile(rf'^\(\s*(?P<size>{_AMOUNT})\s*-?\s*(?P<unit>[a-zA-Z. ]+?)\s*\)\s*')
+_PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+_WORD_RE = re.compile(r"[a-zA-Zà-ÿ][a-zA-Zà-ÿ'\-]*")
+
+# Confidence at or above which a line is accepted without asking GPT
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+
+
+def parse_amount(text):
+    """
+    Convert "1", "1.5", "1/2" or "1 1/2" into a float.
+
+    :param text: The amount text.
+    :return: The numeric value, or None if it cannot be parsed.
+    """
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/', 1)
+            if float(denominator) == 0:
+                return None
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def _normalize_line(line):
+    """Unescape HTML, spell out unicode fractions ("1½" -> "1 1/2") and collapse whitespace."""
+    text = html.unescape(str(line)).replace('⁄', '/')
+    for char, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(char, f' {fraction}')
+    return ' '.join(text.split())
+
+
+def _match_unit(text):
+    """
+    Match a unit at the start of text.
+
+    :param text: The remaining text after the quantity.
+    :return: A tuple (canonical unit or None, remaining text).
+    """
+    words = text.split(' ', 2)
+    # Try two-word units ("fluid ounces", "fl oz") before single words
+    if len(words) >= 2:
+        pair = f"{words[0]} {words[1]}".lower().rstrip('.')
+        if pair in UNIT_SYNONYMS:
+            return UNIT_SYNONYMS[pair], ' '.join(words[2:])
+    if words and words[0]:
+        word = words[0].rstrip('.')
+        if word in CASE_SENSITIVE_UNITS:
+            return CASE_SENSITIVE_UNITS[word], ' '.join(words[1:])
+        if word.lower() in UNIT_SYNONYMS:
+            return UNIT_SYNONYMS[word.lower()], ' '.join(words[1:])
+    return None, text
+
+
+def categorize(name):
+    """
+    Assign a category from the ingredient name, preferring its last (head) words.
+
+    :param name: The cleaned ingredient name.
+    :return: The category, or None if no keyword matches.
+    """
+    words = name.lower().split()
+    # Longest phrases first, scanning from the end of the name where the head noun usually is
+    for size in (3, 2, 1):
+        for start in range(len(words) - size, -1, -1):
+            phrase = ' '.join(words[start:start + size])
+            category = _CATEGORY_LOOKUP.get(phrase)
+            if category is None and size == 1 and phrase.endswith('s'):
+                category = _CATEGORY_LOOKUP.get(phrase[:-1])
+            if category:
+                return category
+    return None
+
+
+def _clean_name(text):
+    """Drop notes in parentheses, "to taste"-style phrases, a leading "of", and preparation/size words from a name."""
+    text = _PARENTHETICAL_RE.sub(' ', text).lower()
+    for phrase in DISCRETION_PHRASES:
+        text = text.replace(phrase, ' ')
+    words = [word for word in _WORD_RE.findall(text) if word not in PREPARATION_WORDS]
+    if words and words[0] == 'of':
+        words = words[1:]
+    return ' '.join(words)
+
+
+def _as_number(value):
+    """Return ints for whole quantities (1 rather than 1.0), like the examples in the GPT prompt."""
+    value = round(value, 3)
+    return int(value) if value == int(value) else value
+
+
+def parse_ingredient(line):
+    """
+    Parse one recipeIngredient line into the structure prompts.prompt_ingredients describes.
+
+    Handles mixed and unicode fractions ("1 1/2", "1½"), ranges ("2-3", "2 to 3"; the upper bound is used so
+    the grocery list buys enough), parenthetical can sizes ("2 (14.5 ounce) cans" -> 29 ounce), a unit
+    synonym table, and strips preparation words ("chopped", ", drained").
+
+    :param line: The raw ingredient line.
+    :return: A tuple (ingredient dict, confidence between 0 and 1).
+    """
+    text = _normalize_line(line)
+    confidence = 1.0
+
+    # Everything after the first comma is preparation ("..., finely chopped")
+    main, _, _ = text.partition(',')
+    lowered = text.lower()
+
+    quantity, unit = None, None
+    match = _QUANTITY_RE.match(main)
+    if match:
+        quantity = parse_amount(match.group('q2') or match.group('q1'))
+        main = main[match.end():]
+
+    # "2 (14.5 ounce) cans tomatoes": use the total ounces, as the GPT prompt asks
+    size_match = _PARENTHETICAL_SIZE_RE.match(main)
+    if size_match:
+        size_unit, _ = _match_unit(size_match.group('unit'))
+        container, rest = _match_unit(main[size_match.end():])
+        if size_unit:
+            size = parse_amount(size_match.group('size'))
+            quantity = (quantity or 1) * size
+            unit = size_unit
+            main = rest if container in CONTAINER_UNITS else main[size_match.end():]
+        else:
+            confidence -= 0.3
+
+    if unit is None and quantity is not None:
+        unit, main = _match_unit(main)
+        if unit in CONTAINER_UNITS:
+            # A container without a stated size: the amount is ambiguous
+            confidence -= 0.3
+
+    name = _clean_name(main)
+    category = categorize(name)
+
+    if quantity is None:
+        quantity, unit = 0, 'user discretion'
+        # "salt, to taste" is fully understood; any other line without an amount needs GPT
+        if not any(phrase in lowered for phrase in DISCRETION_PHRASES):
+            confidence -= 0.5
+    elif unit is None:
+        # Whole items such as eggs, onions or lemons
+        unit = 'units'
+        if category not in ('veggie', 'fruit', 'dairy', 'meat', 'seafood'):
+            confidence -= 0.15
+
+    if not name:
+        confidence = 0.0
+    if category is None:
+        category = 'other'
+        confidence -= 0.25
+    if re.search(r'\b(or|and/or)\b', name):
+        # Alternatives ("butter or margarine") need judgement
+        confidence -= 0.3
+
+    ingredient = {
+        "ingredient": name,
+        "quantity": _as_number(quantity),
+        "unit": unit,
+        "category": category,
+    }
+    return ingredient, max(0.0, round(confidence, 2))
+
+
+def parse_ingredients(lines, threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+    """
+    Parse a recipeIngredient list and split it into confidently parsed lines and lines to escalate.
+
+    :param lines: The raw ingredient lines.
+    :param threshold: Minimum confidence to accept a local parse.
+    :return: A tuple (results, escalate): results is aligned with lines and holds the parsed dict or None,
+             escalate lists the lines that should be standardized by GPT.
+    """
+    results, escalate = [], []
+    for line in lines:
+        ingredient, confidence = parse_ingredient(line)
+        if confidence >= threshold:
+            results.append(ingredient)
+        else:
+            results.append(None)
+            escalate.append(line)
+    return results, escalate
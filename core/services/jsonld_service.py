@@ -0,0 +1,355 @@
+import html
+import json
+import logging
+import re
+
+
+# Configure logging settings to track important events and errors during execution
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def load_ld_json(script_content):
+    """
+    Decode the text of a single <script type="application/ld+json"> block.
+
+    :param script_content: The raw text inside the script tag.
+    :return: The decoded JSON value, or None if the block is empty or not valid JSON.
+    """
+    if not script_content:
+        return None
+
+    script_content = script_content.strip()
+    # Remove any trailing semicolons or non-JSON characters
+    if script_content.endswith(';'):
+        script_content = script_content[:-1]
+
+    try:
+        # strict=False tolerates raw newlines/tabs inside strings, which many CMSs emit
+        return json.loads(script_content, strict=False)
+    except json.JSONDecodeError as e:
+        logging.error(f"Error parsing JSON-LD block: {e}")
+        return None
+
+
+def _node_types(node):
+    """Return the '@type' of a JSON-LD node as a tuple of strings."""
+    node_type = node.get('@type')
+    if isinstance(node_type, str):
+        return (node_type,)
+    if isinstance(node_type, list):
+        return tuple(t for t in node_type if isinstance(t, str))
+    return ()
+
+
+class JsonLdIndex:
+    """
+    An index over every JSON-LD block on a page, built with a single iterative walk.
+    The walk records each Recipe, VideoObject and NutritionInformation node (together with the
+    Recipe that contains it, if any) so the recipe extractors never need to rescan or re-decode the page.
+    """
+
+    def __init__(self):
+        self.recipes = []    # Recipe nodes (or any node carrying a recipeIngredient list), in document order
+        self.videos = []     # (VideoObject node, owning Recipe node or None)
+        self.nutrition = []  # (NutritionInformation node, owning Recipe node or None)
+        self.ids = {}        # '@id' -> node, used to resolve references inside an @graph
+
+    @classmethod
+    def from_scripts(cls, script_contents):
+        """
+        Build the index from the raw text of the page's ld+json script blocks.
+
+        :param script_contents: Iterable of script tag contents, in document order.
+        :return: A populated JsonLdIndex.
+        """
+        index = cls()
+        for script_content in script_contents:
+            json_data = load_ld_json(script_content)
+            if json_data is not None:
+                index.add(json_data)
+        return index
+
+    def add(self, json_data):
+        """
+        Walk a decoded JSON-LD block iteratively and record the nodes the extractors care about.
+
+        :param json_data: A decoded JSON-LD value (object, list or @graph container).
+        """
+        # Each stack entry is (value, owning recipe); children are pushed in reverse to keep document order
+        stack = [(json_data, None)]
+        while stack:
+            value, owner = stack.pop()
+
+            if isinstance(value, list):
+                stack.extend((item, owner) for item in reversed(value) if isinstance(item, (dict, list)))
+                continue
+
+            if not isinstance(value, dict):
+                continue
+
+            node_types = _node_types(value)
+            node_id = value.get('@id')
+            if isinstance(node_id, str) and len(value) > 1:
+                self.ids.setdefault(node_id, value)
+
+            if 'Recipe' in node_types or 'recipeIngredient' in value:
+                self.recipes.append(value)
+                owner = value
+            elif 'VideoObject' in node_types:
+                self.videos.append((value, owner))
+            elif 'NutritionInformation' in node_types:
+                self.nutrition.append((value, owner))
+
+            stack.extend(
+                (child, owner) for child in reversed(list(value.values())) if isinstance(child, (dict, list))
+            )
+
+    def resolve(self, value):
+        """
+        Follow a {"@id": ...} reference to the full node recorded in the index.
+
+        :param value: A JSON-LD value that may be a bare reference.
+        :return: The referenced node if known, otherwise the value unchanged.
+        """
+        if isinstance(value, dict) and len(value) == 1 and '@id' in value:
+            return self.ids.get(value['@id'], value)
+        return value
+
+    def video_url(self, recipe=None):
+        """
+        Find the contentUrl of the VideoObject that belongs to the given recipe,
+        falling back to the first VideoObject on the page.
+
+        :param recipe: The Recipe node to prefer videos from.
+        :return: The video contentUrl, or None if the page has no video.
+        """
+        fallback = None
+        for video, owner in self.videos:
+            content_url = video.get('contentUrl')
+            if not content_url:
+                continue
+            if owner is recipe:
+                return content_url
+            if fallback is None:
+                fallback = content_url
+        return fallback
+
+    def recipe_image_name_video(self):
+        """
+        Return the (image, name, video_url) of the first recipe that has both a name and an image.
+
+        :return: A tuple (recipe_image, recipe_name, recipe_video_url), or (None, None, None) if not found.
+        """
+        for recipe in self.recipes:
+            recipe_name = recipe.get('name')
+            recipe_image = self.resolve(recipe.get('image'))
+
+            if isinstance(recipe_image, list) and recipe_image:
+                recipe_image = self.resolve(recipe_image[-1])
+
+            if isinstance(recipe_image, dict):
+                recipe_image = recipe_image.get('url') or recipe_image.get('contentUrl')
+
+            if recipe_image and recipe_name:
+                return recipe_image, recipe_name, self.video_url(recipe)
+
+        return None, None, None
+
+    def recipe_ingredients(self):
+        """
+        Return the 'recipeIngredient' list of the first recipe that has one.
+
+        :return: The list of raw ingredient strings, or None if not found.
+        """
+        for recipe in self.recipes:
+            if 'recipeIngredient' in recipe:
+                return recipe['recipeIngredient']
+        return None
+
+    def recipe_nutrition(self):
+        """
+        Return the recipe's nutrition facts with recipeCategory, recipeYield, recipeName and author merged in.
+
+        :return: A new nutrition dictionary, or None if the page has no nutrition data.
+        """
+        nutrition_data, recipe = None, None
+        for candidate in self.recipes:
+            nutrition = self.resolve(candidate.get('nutrition'))
+            if isinstance(nutrition, dict) and nutrition:
+                nutrition_data, recipe = nutrition, candidate
+                break
+
+        # Some pages publish NutritionInformation as a standalone @graph node
+        if nutrition_data is None and self.nutrition:
+            nutrition_data, recipe = self.nutrition[0]
+
+        if nutrition_data is None:
+            return None
+
+        # Copy so the indexed node is never mutated; drop the '@type' marker
+        nutrition_data = {k: v for k, v in nutrition_data.items() if k != '@type'}
+
+        if recipe is not None:
+            if recipe.get('recipeCategory'):
+                nutrition_data['recipeCategory'] = recipe['recipeCategory']
+            if recipe.get('recipeYield'):
+                nutrition_data['recipeYield'] = recipe['recipeYield']
+            if recipe.get('name'):
+                nutrition_data['recipeName'] = html.unescape(recipe['name'])  # Unescape HTML entities
+            author = self.author_name(recipe.get('author'))
+            if author:
+                nutrition_data['author'] = author
+
+        return nutrition_data
+
+    def compact(self):
+        """
+        Return a small copy of the index that keeps only what the extractors read: the recipe fields used by
+        recipe_image_name_video, recipe_ingredients and recipe_nutrition, and the video contentUrls.
+        References are resolved up front, so the copy is cheap to pickle back from a parse worker.
+
+        :return: A new, self-contained JsonLdIndex.
+        """
+        compacted = JsonLdIndex()
+        recipe_copies = {}
+
+        for recipe in self.recipes:
+            image = self.resolve(recipe.get('image'))
+            if isinstance(image, list):
+                image = [self.resolve(item) for item in image]
+
+            copy = {'image': image, 'author': self.author_name(recipe.get('author'))}
+            for key in ('name', 'recipeIngredient', 'recipeCategory', 'recipeYield'):
+                if key in recipe:
+                    copy[key] = recipe[key]
+            if 'nutrition' in recipe:
+                copy['nutrition'] = self.resolve(recipe['nutrition'])
+
+            compacted.recipes.append(copy)
+            recipe_copies[id(recipe)] = copy
+
+        for video, owner in self.videos:
+            if video.get('contentUrl'):
+                compacted.videos.append(({'contentUrl': video['contentUrl']}, recipe_copies.get(id(owner))))
+
+        compacted.nutrition = [(nutrition, recipe_copies.get(id(owner))) for nutrition, owner in self.nutrition[:1]]
+        return compacted
+
+    def author_name(self, author):
+        """
+        Return the name of a recipe author given as a string, a Person node, a reference or a list of those.
+
+        :param author: The 'author' value of a Recipe node.
+        :return: The first author's name, or None.
+        """
+        if isinstance(author, list):
+            author = author[0] if author else None
+        author = self.resolve(author)
+        if isinstance(author, dict):
+            return author.get('name')
+        if isinstance(author, str):
+            return author
+        return None
+
+
+class LdJsonScanner:
+    """
+    An incremental scanner that picks the <script type="application/ld+json"> blocks out of an HTML
+    stream without building a DOM. Feed it decoded text chunks as they arrive; once it reports done,
+    the rest of the page can be skipped.
+
+    Scanning stops early when a block describing a Recipe has been captured and either the closing
+    </head> has been seen (so every ld+json block in the head is collected) or the Recipe block itself
+    was found in the body.
+    """
+
+    _SCRIPT_OPEN = re.compile(r'<script\b[^>]*?\btype\s*=\s*["\']?application/ld\+json\b[^>]*>', re.IGNORECASE)
+    _SCRIPT_CLOSE = re.compile(r'</script\s*>', re.IGNORECASE)
+    _HEAD_CLOSE = re.compile(r'</head\s*>', re.IGNORECASE)
+
+    # A partially received tag is kept at the end of the buffer only up to this many characters
+    _MAX_PENDING_TAG = 2048
+
+    def __init__(self):
+        self.blocks = []           # Raw ld+json script contents, in document order
+        self.head_closed = False
+        self.has_recipe = False
+        self.done = False
+        self._buffer = ''
+        self._in_block = False
+        self._resume = 0
+
+    def feed(self, text):
+        """
+        Scan the next chunk of decoded HTML.
+
+        :param text: The next piece of the document.
+        :return: True once all relevant blocks have been seen and the rest of the page can be skipped.
+        """
+        if self.done:
+            return True
+
+        self._buffer += text
+        pos = 0
+
+        while True:
+            if self._in_block:
+                match = self._SCRIPT_CLOSE.search(self._buffer, max(pos, self._resume))
+                if not match:
+                    # Keep the whole unfinished block buffered until its closing tag arrives,
+                    # and only rescan the part of it that could hold a partial </script> tag
+                    self._buffer = self._buffer[pos:]
+                    self._resume = max(0, len(self._buffer) - 16)
+                    return False
+
+                self._resume = 0
+
+                block = self._buffer[pos:match.start()]
+                self.blocks.append(block)
+                self._in_block = False
+                pos = match.end()
+
+                # '"Recipe"' matches both "@type": "Recipe" and "@type": ["Recipe", ...]
+                if '"Recipe"' in block or 'recipeIngredient' in block:
+                    self.has_recipe = True
+                    if not self.head_closed:
+                        continue
+                    self.done = True
+                    self._buffer = ''
+                    return True
+                continue
+
+            open_match = self._SCRIPT_OPEN.search(self._buffer, pos)
+            head_match = None if self.head_closed else self._HEAD_CLOSE.search(self._buffer, pos)
+
+            if head_match and (not open_match or head_match.start() < open_match.start()):
+                self.head_closed = True
+                pos = head_match.end()
+                if self.has_recipe:
+                    self.done = True
+                    self._buffer = ''
+                    return True
+                continue
+
+            if open_match:
+                self._in_block = True
+                pos = open_match.end()
+                continue
+
+            # Nothing more to match: retain only a possible partial tag at the end of the buffer
+            tail = self._buffer.rfind('<', pos)
+            if tail == -1 or len(self._buffer) - tail > self._MAX_PENDING_TAG:
+                self._buffer = ''
+            else:
+                self._buffer = self._buffer[tail:]
+            return False
+
+    def close(self):
+        """
+        Signal the end of the document.
+
+        :return: The captured ld+json script contents.
+        """
+        self.done = True
+        self._buffer = ''
+        return self.blocks
@@ -0,0 +1,196 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+import time
+
+# Configure logging to track metrics collection
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Latency buckets in seconds; the top ones cover slow pages and model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The pipeline phase the current task is working for; every timing is labelled with it
+current_phase = contextvars.ContextVar("current_phase", default="request")
+
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    """Render label pairs in Prometheus text format, e.g. {outcome="ok",phase="html_processing"}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    """Render a sample value the way Prometheus expects (+Inf, integers without a decimal point)."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """A Prometheus-style histogram: cumulative bucket counts, sum and count per label set."""
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        """
+        :param name: The metric name, e.g. "recipe_fetch_page_seconds".
+        :param documentation: The HELP text.
+        :param buckets: Upper bounds of the buckets, in ascending order (+Inf is added).
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.series = {}  # sorted label tuple -> [count per bucket..., sum, count]
+
+    def observe(self, value, **labels):
+        """
+        Record one observation.
+
+        :param value: The observed value (seconds for latency histograms).
+        :param labels: The label values of the series.
+        """
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 2)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[position] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        """Return the metric in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """
+    Holds this instance's metrics and renders them for a /metrics endpoint. Components that already keep counters
+    in a stats() method are registered as collectors: their numeric values are exported as gauges at scrape time.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = {}  # metric prefix -> zero-argument callable returning a stats dictionary
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram."""
+        metric = Histogram(name, documentation, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix, stats):
+        """
+        Export a component's stats() as gauges named "{prefix}_{key}".
+
+        :param prefix: The metric name prefix, e.g. "redis_pool".
+        :param stats: A zero-argument callable returning a dictionary; nested dictionaries are flattened one level
+                      into a "key" label (e.g. per-phase or per-namespace counters), other values are skipped.
+        """
+        self.collectors[prefix] = stats
+
+    def _render_collector(self, prefix, stats):
+        """Render one collector's numeric values as gauges."""
+        lines = []
+        try:
+            values = stats()
+        except Exception as e:
+            logging.error(f"Error collecting {prefix} stats for /metrics: {e}")
+            return lines
+        for name, value in values.items():
+            metric = f"{prefix}_{name}"
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines += [f"# TYPE {metric} gauge", f"{metric} {_format_value(value)}"]
+            elif isinstance(value, dict):
+                samples = [(key, inner) for key, inner in value.items() if isinstance(inner, (int, float))]
+                if samples:
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines += [f"{metric}{_format_labels((('key', key),))} {_format_value(inner)}" for key, inner in samples]
+        return lines
+
+    def render(self):
+        """
+        Render every metric and collector.
+
+        :return: The body of a /metrics response (text/plain; version=0.0.4).
+        """
+        sections = [metric.render() for metric in self.metrics if metric.series]
+        for prefix, stats in self.collectors.items():
+            lines = self._render_collector(prefix, stats)
+            if lines:
+                sections.append("\n".join(lines))
+        return "\n".join(sections) + "\n"
+
+
+# Process-wide registry served by each service's /metrics route
+registry = MetricsRegistry()
+
+# Latency of the hot-path steps, labelled by phase and outcome (ok, error, cancelled)
+PHASE_SECONDS = registry.histogram("pipeline_phase_seconds", "Duration of a pipeline phase for one session")
+FETCH_SECONDS = registry.histogram("recipe_fetch_page_seconds", "Page fetch and JSON-LD indexing in RecipeScraper.fetch_page_content")
+EXTRACT_SECONDS = registry.histogram("recipe_extract_seconds", "RecipeScraper.extract_* calls, by field")
+GPT_SECONDS = registry.histogram("gpt_call_seconds", "gpt_service standardizations and model completions, by operation")
+SERVICE_CALL_SECONDS = registry.histogram("service_call_seconds", "send_to_service calls, by target service")
+REDIS_SECONDS = registry.histogram("redis_operation_seconds", "RedisManager operations, by operation")
+
+
+def _outcome(error):
+    """Return the outcome label of a timed block that raised error (None when it succeeded)."""
+    if error is None:
+        return "ok"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return "error"
+
+
+@contextlib.asynccontextmanager
+async def timer(histogram, **labels):
+    """
+    Time a block (or, used as a decorator, every call of a coroutine function) into histogram,
+    labelled with the current phase, the outcome and labels.
+
+    :param histogram: The Histogram to record into.
+    :param labels: Extra labels, e.g. operation="save_to_redis".
+    """
+    started_at = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started_at, phase=current_phase.get(), outcome=_outcome(error), **labels)
+
+
+@contextlib.asynccontextmanager
+async def phase(name):
+    """
+    Run a block as the named pipeline phase: timings recorded inside it carry phase=name,
+    and the phase's own duration is recorded in PHASE_SECONDS.
+
+    :param name: The phase name (e.g. "html_processing").
+    """
+    token = current_phase.set(name)
+    try:
+        async with timer(PHASE_SECONDS):
+            yield
+    finally:
+        current_phase.reset(token)
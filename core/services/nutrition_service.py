@@ -0,0 +1,186 @@
+import html
+import re
+from core.services.ingredient_service import UNICODE_FRACTIONS, UNIT_SYNONYMS, parse_amount
+
+# Deterministic normalizer for schema.org NutritionInformation. It produces the same
+# [{name, quantity, unit}, ...] structure that prompts.prompt_nutrition asks GPT for.
+
+# Canonical unit for every spelling we accept. Keys are lowercase and have no trailing period.
+NUTRITION_UNITS = {
+    'kcal': 'kcal', 'kcals': 'kcal', 'calorie': 'kcal', 'calories': 'kcal', 'cal': 'kcal', 'cals': 'kcal',
+    'kilocalorie': 'kcal', 'kilocalories': 'kcal',
+    'kj': 'kJ', 'kilojoule': 'kJ', 'kilojoules': 'kJ',
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g', 'gm': 'g', 'gms': 'g',
+    'mg': 'mg', 'milligram': 'mg', 'milligrams': 'mg',
+    'mcg': 'mcg', 'µg': 'mcg', 'μg': 'mcg', 'ug': 'mcg', 'microgram': 'mcg', 'micrograms': 'mcg',
+    'iu': 'IU', '%': '%', '% dv': '%', '%dv': '%',
+}
+
+# schema.org states the unit of these properties when a page publishes a bare number
+DEFAULT_UNITS = {
+    'calories': 'kcal',
+    'sodiumContent': 'mg',
+    'cholesterolContent': 'mg',
+}
+
+# Fields that describe the recipe rather than a nutrient (merged in by JsonLdIndex.recipe_nutrition)
+TEXT_FIELDS = {'recipeCategory', 'recipeName', 'author'}
+
+UNKNOWN_UNIT = 'user discretion'
+
+# Words like "about" or "approximately" are dropped; the first number in the value is the quantity. A comma is
+# a thousands separator before 3-digit groups ("1,040 mg") and a decimal comma otherwise ("1,5 g")
+_VALUE_RE = re.compile(r'(?P<amount>\d+/\d+|\d+(?:,\d+)+(?:\.\d+)?|\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\.\d+)\s*(?P<unit>%\s*dv|%|[^\W\d_]+\.?)?')
+_THOUSANDS_RE = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d+)?')
+_DECIMAL_COMMA_RE = re.compile(r'\d+,\d+')
+_UNIT_TOKEN_RE = re.compile(r'%\s*dv|%|[^\W\d_]+')
+
+# Marks a fact a recipe does not have in the columnar form (None is a fact published without a value)
+MISSING = object()
+
+
+def _default_unit(name):
+    """Return the schema.org unit of a nutrient published as a bare number ("...Content" values are grams)."""
+    if name in DEFAULT_UNITS:
+        return DEFAULT_UNITS[name]
+    if name.endswith('Content'):
+        return 'g'
+    return UNKNOWN_UNIT
+
+
+def parse_value(value):
+    """
+    Split a nutrition value such as "315 kcal", "1,040 mg", "1,5 g", "about 12g" or "8 servings" into a quantity
+    and unit.
+
+    :param value: The raw value (string or number).
+    :return: A tuple (quantity as float or None, canonical unit or None).
+    """
+    if isinstance(value, bool):
+        return None, None
+    if isinstance(value, (int, float)):
+        return float(value), None
+
+    text = html.unescape(str(value))
+    for char, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(char, f' {fraction}')
+
+    match = _VALUE_RE.search(text)
+    if not match:
+        return None, None
+
+    amount = match.group('amount')
+    if _DECIMAL_COMMA_RE.fullmatch(amount) and not _THOUSANDS_RE.fullmatch(amount):
+        amount = amount.replace(',', '.')
+    else:
+        amount = amount.replace(',', '')
+    quantity = parse_amount('0' + amount if amount.startswith('.') else amount)
+
+    unit = match.group('unit')
+    if not unit:
+        # A unit the pattern could not attach to the number ("12 (g)") still beats the schema.org default
+        tokens = (' '.join(token.lower().split()) for token in _UNIT_TOKEN_RE.findall(text))
+        unit = next((token for token in tokens if token in NUTRITION_UNITS), None)
+    if unit:
+        unit = ' '.join(unit.lower().rstrip('.').split())
+        # Serving sizes and yields use kitchen units ("1 1/2 cups"), canonicalized like ingredient units
+        unit = NUTRITION_UNITS.get(unit) or UNIT_SYNONYMS.get(unit, unit)
+    return quantity, unit
+
+
+def normalize_fact(name, value, _parsed=None):
+    """
+    Normalize one nutrition fact.
+
+    :param name: The schema.org property name (e.g. "calories", "recipeYield").
+    :param value: The raw value.
+    :param _parsed: Optional memo of parse_value results shared across a batch.
+    :return: A dictionary {name, quantity, unit}.
+    """
+    # recipeYield is often published as ["8", "8 servings"]; the most descriptive entry is the last one
+    if isinstance(value, list):
+        value = value[-1] if value else None
+
+    if name in TEXT_FIELDS or value is None:
+        return {"name": name, "quantity": 0.0, "unit": UNKNOWN_UNIT}
+
+    if _parsed is None:
+        quantity, unit = parse_value(value)
+    else:
+        key = value if isinstance(value, str) else repr(value)
+        if key not in _parsed:
+            _parsed[key] = parse_value(value)
+        quantity, unit = _parsed[key]
+
+    if quantity is None:
+        return {"name": name, "quantity": 0.0, "unit": UNKNOWN_UNIT}
+    return {"name": name, "quantity": round(quantity, 3), "unit": unit or _default_unit(name)}
+
+
+def normalize_nutrition(nutrition):
+    """
+    Convert a nutrition dictionary (as built by JsonLdIndex.recipe_nutrition) into the structured list
+    prompts.prompt_nutrition describes.
+
+    :param nutrition: The raw nutrition dictionary.
+    :return: A list of {name, quantity, unit} dictionaries, in the dictionary's order.
+    """
+    return [normalize_fact(name, value) for name, value in nutrition.items() if not name.startswith('@')]
+
+
+class NutritionColumns(dict):
+    """
+    Many recipes' nutrition as columns: {name: [value per recipe]}, with MISSING where a recipe lacks the fact.
+    orders keeps each recipe's own fact order, so normalize_nutrition_columns returns what normalize_nutrition would.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: The number of recipes.
+        """
+        super().__init__()
+        self.size = size
+        self.orders = [[] for _ in range(size)]
+
+
+def nutrition_columns(records):
+    """
+    Pivot many recipes' nutrition dictionaries into columns.
+
+    :param records: A list of raw nutrition dictionaries.
+    :return: The NutritionColumns accepted by normalize_nutrition_columns.
+    """
+    columns = NutritionColumns(len(records))
+    for position, record in enumerate(records):
+        for name, value in record.items():
+            if name.startswith('@'):
+                continue
+            if name not in columns:
+                columns[name] = [MISSING] * len(records)
+            columns[name][position] = value
+            columns.orders[position].append(name)
+    return columns
+
+
+def normalize_nutrition_columns(columns):
+    """
+    Normalize many recipes' nutrition at once from columnar arrays. Each column is processed in one pass,
+    and repeated values (e.g. "0 g", "1 g") are parsed only once for the whole batch. Every fact goes through
+    normalize_fact like in normalize_nutrition, so both give the same result for the same recipe.
+
+    :param columns: NutritionColumns, or a plain dictionary {name: [value per recipe]} with every column the same
+                    length and MISSING marking a fact a recipe does not have (facts then follow column order).
+    :return: A list with one normalized nutrition list per recipe.
+    """
+    size = getattr(columns, 'size', max((len(values) for values in columns.values()), default=0))
+    facts = [{} for _ in range(size)]
+    parsed = {}
+    for name, values in columns.items():
+        if name.startswith('@'):
+            continue
+        for position, value in enumerate(values):
+            if value is not MISSING:
+                facts[position][name] = normalize_fact(name, value, parsed)
+
+    orders = getattr(columns, 'orders', None) or [list(record) for record in facts]
+    return [[record[name] for name in order] for record, order in zip(facts, orders)]
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from core.configs import settings
+
+# Configure logging to track important events in the parse pool
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ParsePool:
+    """
+    A pool that runs CPU-bound parse/extract steps (BeautifulSoup, json.loads, the JSON-LD walk)
+    off the event loop, so one slow page no longer stalls every other request on the instance.
+    """
+
+    def __init__(self, workers: int = None, executor: str = None):
+        """
+        :param workers: Number of worker processes/threads. 0 runs jobs inline on the event loop.
+        :param executor: "process" for a ProcessPoolExecutor, "thread" for a ThreadPoolExecutor.
+        """
+        self.workers = settings.HTML_PARSE_WORKERS if workers is None else workers
+        self.executor_type = executor or settings.HTML_PARSE_EXECUTOR
+        self.executor = None
+
+        # Queue-depth and latency counters
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.total_service = 0.0
+
+    def start(self):
+        """Create the executor. Called at application startup; run() also starts it lazily."""
+        if self.executor is not None or self.workers <= 0:
+            return
+        if self.executor_type == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse")
+        else:
+            # spawn avoids forking a process that already runs an event loop and client threads
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            # Spawn the workers and import the parsers now rather than on the first scrape
+            for _ in range(self.workers):
+                self.executor.submit(_warm_up)
+        logging.info(f"Parse pool started: {self.workers} {self.executor_type} workers")
+
+    def shutdown(self):
+        """Stop the executor. Called at application shutdown."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            logging.info("Parse pool stopped")
+
+    async def run(self, fn, *args):
+        """
+        Run fn(*args) in the pool and return its result. fn and its arguments must be picklable
+        in process mode, so pass module-level functions and plain data, and keep the result compact.
+
+        :param fn: The CPU-bound function to run.
+        :param args: Positional arguments for fn.
+        :return: The result of fn(*args).
+        """
+        self.submitted += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        submitted_at = time.monotonic()
+        try:
+            if self.workers <= 0:
+                started_at, result = submitted_at, fn(*args)
+            else:
+                self.start()
+                started_at, result = await asyncio.get_running_loop().run_in_executor(self.executor, _run_job, fn, args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        finished_at = time.monotonic()
+        self.completed += 1
+        self.total_wait += max(0.0, started_at - submitted_at)
+        self.total_service += finished_at - max(started_at, submitted_at)
+        return result
+
+    def stats(self):
+        """
+        Return queue-depth and latency statistics for the pool.
+
+        :return: A dictionary of counters; queue_depth counts jobs waiting for a free worker.
+        """
+        return {
+            "executor": self.executor_type if self.workers > 0 else "inline",
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - max(self.workers, 1)),
+            "max_in_flight": self.max_in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+            "avg_service_ms": round(self.total_service / self.completed * 1000, 3) if self.completed else 0.0,
+        }
+
+
+def _warm_up():
+    """Import the parse functions (JSON-LD index and scanner) in a freshly spawned worker."""
+    import core.services.recipe_service  # noqa: F401
+
+
+def _run_job(fn, args):
+    """Worker-side wrapper: returns (start timestamp, result). time.monotonic is system-wide on Linux."""
+    started_at = time.monotonic()
+    return started_at, fn(*args)
+
+
+# Process-wide parse pool shared by every RecipeScraper in this instance
+parse_pool = ParsePool()
@@ -0,0 +1,398 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from core.configs import settings
+from core.services import data_service as ds
+from core.services import progress_service as progress
+from core.services.progress_service import progress_hub
+
+# Configure logging to track phase dispatching
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Phase names carried in the "phase" field of every pipeline message
+VALIDATION_COMPLETE = "validation_complete"
+CHAT_GPT_INGEST = "chat_gpt_ingest"
+
+
+def stream_key(phase):
+    """Return the Redis stream that queues the messages of a phase."""
+    return f"pipeline:{phase}"
+
+
+def dead_letter_key(phase):
+    """Return the Redis stream that keeps the messages of a phase that exhausted their retries."""
+    return f"pipeline:{phase}:dead"
+
+
+class StreamConsumerGroup:
+    """
+    Consumes one phase's Redis stream through a consumer group, so any number of instances can share the work.
+
+    Each of the PIPELINE_STREAM_CONCURRENCY consumer tasks reads one message at a time (XREADGROUP), runs the
+    phase handler and acknowledges the message (XACK) only when the handler succeeds. A failed message stays
+    pending; a reclaim task periodically takes over messages that have been pending for longer than
+    PIPELINE_STREAM_CLAIM_IDLE_MS (XAUTOCLAIM), whether their handler failed or their consumer died, and runs
+    them again. After PIPELINE_STREAM_MAX_DELIVERIES attempts a message is moved to the phase's dead-letter stream.
+    """
+
+    def __init__(self, phase, handler, redis_manager):
+        """
+        :param phase: The phase name; its stream is pipeline:{phase}.
+        :param handler: A coroutine function called with the message dict.
+        :param redis_manager: RedisManager whose client reads and acknowledges the stream.
+        """
+        self.phase = phase
+        self.handler = handler
+        self.redis_client = redis_manager.redis_client
+        self.stream = stream_key(phase)
+        self.group = settings.PIPELINE_STREAM_GROUP
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self.tasks = []
+        self.waiting = set()  # Tasks blocked on XREADGROUP or between reclaim passes, safe to cancel at once
+        self.stopping = False
+
+        # Consumer counters
+        self.processed = 0
+        self.failed = 0
+        self.reclaimed = 0
+        self.dead_lettered = 0
+        self.in_flight = 0
+
+    async def start(self):
+        """Create the consumer group if needed and start the consumer and reclaim tasks."""
+        self.stopping = False
+        try:
+            await self.redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            # BUSYGROUP: another instance created the group first
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        for number in range(settings.PIPELINE_STREAM_CONCURRENCY):
+            self.tasks.append(asyncio.create_task(self._consume(f"{self.consumer_prefix}-{number}")))
+        self.tasks.append(asyncio.create_task(self._reclaim(f"{self.consumer_prefix}-reclaim")))
+        logging.info(f"Stream consumers started for {self.stream}: {settings.PIPELINE_STREAM_CONCURRENCY} consumers")
+
+    async def stop(self, timeout: float = None):
+        """
+        Stop reading new messages and wait for the handlers that are running. Called at application shutdown.
+        Messages whose handler is cancelled at the timeout stay pending and are reclaimed by another instance.
+
+        :param timeout: Seconds to wait for running handlers before cancelling them; defaults to PIPELINE_DRAIN_TIMEOUT.
+        """
+        if not self.tasks:
+            return
+        self.stopping = True
+        # Tasks waiting for work stop at once; tasks running a handler stop after it, at their next loop check
+        for task in self.waiting:
+            task.cancel()
+        timeout = settings.PIPELINE_DRAIN_TIMEOUT if timeout is None else timeout
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        logging.info(f"Stream consumers stopped for {self.stream}: {len(pending)} running handlers cancelled")
+
+    async def _consume(self, consumer):
+        """Read and handle new messages until stopped."""
+        task = asyncio.current_task()
+        while not self.stopping:
+            self.waiting.add(task)
+            try:
+                response = await self.redis_client.xreadgroup(
+                    self.group, consumer, {self.stream: ">"}, count=1, block=settings.PIPELINE_STREAM_BLOCK_MS
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error reading {self.stream} for consumer {consumer}: {e}")
+                await asyncio.sleep(1)
+                continue
+            finally:
+                self.waiting.discard(task)
+
+            for _, entries in response or []:
+                for message_id, fields in entries:
+                    await self._handle(message_id, fields)
+
+    async def _reclaim(self, consumer):
+        """Periodically take over messages left pending by a failed handler or a dead consumer, and retry them."""
+        task = asyncio.current_task()
+        while not self.stopping:
+            self.waiting.add(task)
+            try:
+                await asyncio.sleep(settings.PIPELINE_STREAM_CLAIM_INTERVAL)
+            finally:
+                self.waiting.discard(task)
+            try:
+                start_id = "0-0"
+                while True:
+                    # Redis 7 replies [next id, entries, deleted ids], Redis 6.2 only [next id, entries]
+                    reply = await self.redis_client.xautoclaim(
+                        self.stream, self.group, consumer,
+                        min_idle_time=settings.PIPELINE_STREAM_CLAIM_IDLE_MS, start_id=start_id, count=10,
+                    )
+                    start_id, entries = reply[0], reply[1]
+                    for message_id, fields in entries:
+                        # Redis 6.2 returns entries deleted from the stream as nil, without their id
+                        if message_id is None:
+                            continue
+                        if self.stopping:
+                            break
+                        self.reclaimed += 1
+                        await self._handle(message_id, fields)
+                    if start_id == "0-0" or not entries or self.stopping:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error reclaiming pending messages of {self.stream}: {e}")
+
+    async def _handle(self, message_id, fields):
+        """Run the handler for one message; acknowledge it on success, dead-letter it once its retries are exhausted."""
+        # Entries deleted from the stream while pending are returned without fields
+        if not fields or "message" not in fields:
+            await self.redis_client.xack(self.stream, self.group, message_id)
+            return
+
+        message = json.loads(fields["message"])
+        self.in_flight += 1
+        try:
+            await self.handler(message)
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error processing phase {self.phase} for session: {message.get('session_id')} - {str(e)}")
+            await self._retry_or_dead_letter(message_id, fields, e)
+        else:
+            self.processed += 1
+            await self.redis_client.xack(self.stream, self.group, message_id)
+        finally:
+            self.in_flight -= 1
+
+    async def _retry_or_dead_letter(self, message_id, fields, error):
+        """Leave a failed message pending for a retry, or move it to the dead-letter stream after the last attempt."""
+        pending = await self.redis_client.xpending_range(self.stream, self.group, min=message_id, max=message_id, count=1)
+        deliveries = pending[0]["times_delivered"] if pending else 1
+        if deliveries < settings.PIPELINE_STREAM_MAX_DELIVERIES:
+            logging.warning(f"Message {message_id} of {self.stream} will be retried (attempt {deliveries})")
+            return
+
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                dead_letter_key(self.phase),
+                {"message": fields["message"], "error": str(error), "deliveries": deliveries, "source_id": message_id},
+                maxlen=settings.PIPELINE_STREAM_MAXLEN, approximate=True,
+            )
+            pipe.xack(self.stream, self.group, message_id)
+            await pipe.execute()
+        self.dead_lettered += 1
+        logging.error(f"Message {message_id} of {self.stream} moved to {dead_letter_key(self.phase)} after {deliveries} attempts")
+
+    def stats(self):
+        """
+        Return consumer counters.
+
+        :return: A dictionary of processed, failed, reclaimed and dead-lettered message counts.
+        """
+        return {
+            "stream": self.stream,
+            "consumers": settings.PIPELINE_STREAM_CONCURRENCY if self.tasks else 0,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+class PipelineDispatcher:
+    """
+    Routes pipeline messages to the next phase.
+
+    In "http" mode (the default) a message is posted to facilitate-requests, which calls the service that owns
+    the phase. In "inprocess" mode the phase handlers run in this process: a message is handed to its handler
+    as an asyncio task, with no HTTP hop or re-serialization in between. In "stream" mode a
+    message is appended to the phase's Redis stream and the publisher returns at once; the services that own
+    the phase consume it through a consumer group (see StreamConsumerGroup).
+    """
+
+    def __init__(self, mode: str = None):
+        """
+        :param mode: "http", "inprocess" or "stream"; defaults to PIPELINE_MODE.
+        """
+        self.mode = mode or settings.PIPELINE_MODE
+        self.handlers = {}  # phase -> coroutine function taking the message dict
+        self.tasks = set()  # Running in-process phase tasks (kept referenced until they finish)
+        self.consumers = {}  # phase -> StreamConsumerGroup, in stream mode
+        self.redis_manager = ds.RedisManager()
+
+        # Dispatch counters
+        self.dispatched = {}
+        self.failed = 0
+
+    def register(self, phase, handler):
+        """
+        Register the coroutine function that handles a phase in-process.
+
+        :param phase: The phase name.
+        :param handler: A coroutine function called with the message dict.
+        """
+        self.handlers[phase] = handler
+
+    def start(self):
+        """Register the default phase handlers (HTML processing and GPT processing) if none are registered yet."""
+        if self.handlers:
+            return
+
+        # Imported here: the phase handlers themselves publish through this module
+        from core.configs import schemas
+        from core.services import background_service as bt
+
+        async def process_html(message):
+            await bt.background_process_html(schemas.SubmissionRequest(**message))
+
+        async def process_gpt(message):
+            await bt.background_process_gpt(schemas.ChatGptRequest(**message))
+
+        self.register(VALIDATION_COMPLETE, process_html)
+        self.register(CHAT_GPT_INGEST, process_gpt)
+        logging.info(f"In-process pipeline started with phases: {list(self.handlers)}")
+
+    async def publish(self, message):
+        """
+        Hand a message to the phase named in its "phase" field.
+
+        :param message: The pipeline message; must carry session_id and phase.
+        """
+        if self.mode == "stream":
+            await self.enqueue(message)
+            return
+
+        if self.mode != "inprocess":
+            await ds.send_to_service(settings.FACILITATE_REQUEST, message, message.get("session_id"), "Facilitate Request")
+            return
+
+        self.start()
+        phase = message.get("phase")
+        handler = self.handlers.get(phase)
+        if handler is None:
+            logging.error(f"Unknown phase: {phase} for session: {message.get('session_id')}")
+            raise ValueError(f"Unknown phase: {phase}")
+
+        # Keep the event trail facilitate-requests records for each phase
+        await self.redis_manager.save_to_redis(message.get("session_id"), "event_data", message, prefix="temp")
+
+        self.dispatched[phase] = self.dispatched.get(phase, 0) + 1
+        task = asyncio.create_task(self._run(handler, message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def handoff(self, message):
+        """
+        Publish a message without waiting for the next phase. In "http" mode facilitate-requests answers only once
+        the next phase is done (for the HTML phase, the whole GPT phase), so the publish runs as a task, kept
+        referenced and drained at shutdown like the in-process phases; if it fails, the session's progress stream
+        reports it. In the other modes publish returns at once and is awaited, so a stream consumer still only
+        acknowledges a message whose next phase was queued.
+
+        :param message: The pipeline message; must carry session_id and phase.
+        """
+        if self.mode in ("stream", "inprocess"):
+            await self.publish(message)
+            return
+
+        task = asyncio.create_task(self._publish_in_background(message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _publish_in_background(self, message):
+        """Publish a handed-off message, reporting a failure on the session's progress stream."""
+        session_id = message.get("session_id")
+        try:
+            await self.publish(message)
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error handing off phase {message.get('phase')} for session: {session_id} - {str(e)}")
+            await progress_hub.publish(session_id, progress.FAILED, {"phase": message.get("phase"), "error": str(e) or type(e).__name__})
+
+    async def enqueue(self, message):
+        """
+        Append a message to its phase's Redis stream.
+
+        :param message: The pipeline message; must carry session_id and phase.
+        :return: The stream entry ID.
+        """
+        phase = message.get("phase")
+        if phase not in (VALIDATION_COMPLETE, CHAT_GPT_INGEST):
+            logging.error(f"Unknown phase: {phase} for session: {message.get('session_id')}")
+            raise ValueError(f"Unknown phase: {phase}")
+
+        message_id = await self.redis_manager.redis_client.xadd(
+            stream_key(phase), {"message": json.dumps(message)}, maxlen=settings.PIPELINE_STREAM_MAXLEN, approximate=True
+        )
+        self.dispatched[phase] = self.dispatched.get(phase, 0) + 1
+        logging.info(f"Queued phase {phase} for session: {message.get('session_id')} as {message_id}")
+        return message_id
+
+    async def start_consumers(self, phases):
+        """
+        Start consuming the streams of the given phases. Called at startup by the services that own them.
+
+        :param phases: The phases this instance processes.
+        """
+        self.start()
+        for phase in phases:
+            if phase not in self.consumers:
+                self.consumers[phase] = StreamConsumerGroup(phase, self.handlers[phase], self.redis_manager)
+                await self.consumers[phase].start()
+
+    async def stop_consumers(self):
+        """Stop every stream consumer of this instance. Called at application shutdown."""
+        for consumer in self.consumers.values():
+            await consumer.stop()
+        self.consumers = {}
+
+    async def _run(self, handler, message):
+        """Run one phase handler, logging failures the way a failed service call would be logged."""
+        session_id = message.get("session_id")
+        logging.info(f"Processing phase: {message.get('phase')} for session: {session_id}")
+        try:
+            await handler(message)
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error processing phase {message.get('phase')} for session: {session_id} - {str(e)}")
+
+    async def drain(self, timeout: float = None):
+        """
+        Wait for the running in-process phase tasks and handed-off publishes to finish. Called at application shutdown.
+
+        :param timeout: Seconds to wait before cancelling what is still running; defaults to PIPELINE_DRAIN_TIMEOUT.
+        """
+        if not self.tasks:
+            return
+        timeout = settings.PIPELINE_DRAIN_TIMEOUT if timeout is None else timeout
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        logging.info(f"In-process pipeline drained: {len(done)} finished, {len(pending)} cancelled")
+
+    def stats(self):
+        """
+        Return dispatch counters.
+
+        :return: A dictionary with the mode, per-phase dispatch counts, running tasks, failures and stream consumers.
+        """
+        return {
+            "mode": self.mode,
+            "dispatched": dict(self.dispatched),
+            "in_flight": len(self.tasks),
+            "failed": self.failed,
+            "consumers": {phase: consumer.stats() for phase, consumer in self.consumers.items()},
+        }
+
+
+# Process-wide dispatcher used by every phase to hand work to the next one
+pipeline = PipelineDispatcher()
@@ -0,0 +1,250 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from core.configs import settings
+from core.services.data_service import RedisManager
+
+# Configure logging to track progress events
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Events published for a session, roughly in the order they occur
+SUBMITTED = "submitted"
+PHASE_STARTED = "phase_started"
+PHASE_COMPLETED = "phase_completed"
+RECIPE = "recipe"            # recipe name, image and video URL, as soon as the page is scraped
+INGREDIENTS = "ingredients"  # standardized ingredients, as soon as they are ready
+NUTRITION = "nutrition"      # standardized nutrition, as soon as it is ready
+COMPLETED = "completed"
+FAILED = "failed"
+
+# A session's stream ends with one of these
+TERMINAL_EVENTS = {COMPLETED, FAILED}
+
+# Phase names used in phase_started / phase_completed / failed events
+HTML_PHASE = "html_processing"
+GPT_PHASE = "gpt_processing"
+
+
+class ProgressHub:
+    """
+    Pushes session progress to subscribers through Redis pub/sub instead of having clients poll for results.
+
+    Every event is appended to a short-lived per-session list and then published on the session's channel with its
+    position in that list (seq). A subscriber first replays the list, then follows the channel, skipping events it has
+    already seen; a late subscriber or one reconnecting with the last seq it received misses nothing.
+    All subscribers of an instance share one pub/sub connection.
+    """
+
+    def __init__(self, redis_manager: RedisManager):
+        """
+        :param redis_manager: RedisManager whose client carries the event lists and the pub/sub connection.
+        """
+        self.redis_client = redis_manager.redis_client
+        self.pubsub = None
+        self.reader = None
+        self.listeners = {}  # channel -> set of asyncio.Queue, one per local subscriber
+
+        # Progress counters
+        self.published = 0
+        self.publish_errors = 0
+        self.delivered = 0
+        self.streams = 0
+
+    @staticmethod
+    def channel(session_id):
+        """Return the pub/sub channel of a session's progress events."""
+        return f"progress:{session_id}"
+
+    @staticmethod
+    def events_key(session_id):
+        """Return the Redis list holding a session's progress events for replay."""
+        return f"progress:{session_id}:events"
+
+    async def publish(self, session_id, event, data=None):
+        """
+        Record a progress event and push it to the session's subscribers. Failures are logged, never raised:
+        progress reporting must not fail the phase that reports it.
+
+        :param session_id: The session the event belongs to.
+        :param event: The event name (e.g. RECIPE, COMPLETED).
+        :param data: Optional JSON-serializable fields for the event.
+        """
+        if not settings.PROGRESS_EVENTS_ENABLED:
+            return
+        message = {"event": event, "session_id": session_id, **(data or {}), "ts": round(time.time(), 3)}
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.rpush(self.events_key(session_id), json.dumps(message))
+                pipe.expire(self.events_key(session_id), settings.PROGRESS_TTL)
+                seq, _ = await pipe.execute()
+            await self.redis_client.publish(self.channel(session_id), json.dumps({**message, "seq": seq}))
+            self.published += 1
+        except Exception as e:
+            self.publish_errors += 1
+            logging.error(f"Error publishing {event} progress for session: {session_id} - {e}")
+
+    @contextlib.asynccontextmanager
+    async def phase(self, session_id, name):
+        """
+        Report a phase as started, then as completed, or as failed if the block raises.
+
+        :param session_id: The session being processed.
+        :param name: The phase name (HTML_PHASE, GPT_PHASE).
+        """
+        await self.publish(session_id, PHASE_STARTED, {"phase": name})
+        try:
+            yield
+        except Exception as e:
+            await self.publish(session_id, FAILED, {"phase": name, "error": str(e) or type(e).__name__})
+            raise
+        await self.publish(session_id, PHASE_COMPLETED, {"phase": name})
+
+    async def backlog(self, session_id, after=0):
+        """
+        Return the session's recorded events after the first `after` ones.
+
+        :param session_id: The session.
+        :param after: The seq of the last event already seen.
+        :return: A list of event dictionaries with their seq.
+        """
+        entries = await self.redis_client.lrange(self.events_key(session_id), after, -1)
+        return [{**json.loads(entry), "seq": after + position + 1} for position, entry in enumerate(entries)]
+
+    async def events(self, session_id, after=0, timeout=None, heartbeat=None):
+        """
+        Follow a session's progress: replay what was recorded, then yield events as they are published,
+        until a terminal event (completed / failed) or the timeout.
+
+        :param session_id: The session to follow.
+        :param after: The seq of the last event the caller already has (e.g. from Last-Event-ID).
+        :param timeout: Seconds to follow the session; defaults to PROGRESS_STREAM_TIMEOUT.
+        :param heartbeat: If set, None is yielded after this many idle seconds so streams can send keep-alives.
+        :return: An async generator of event dictionaries (and None heartbeats).
+        """
+        channel = self.channel(session_id)
+        queue = asyncio.Queue()
+        await self._listen(channel, queue)
+        self.streams += 1
+        deadline = time.monotonic() + (settings.PROGRESS_STREAM_TIMEOUT if timeout is None else timeout)
+        last_seq = after
+        resync = True
+        try:
+            while True:
+                if resync:
+                    # Replay what was recorded, also after a gap or a lost pub/sub connection
+                    resync = False
+                    for event in await self.backlog(session_id, last_seq):
+                        last_seq = event["seq"]
+                        yield event
+                        if event["event"] in TERMINAL_EVENTS:
+                            return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), min(remaining, heartbeat or remaining))
+                except asyncio.TimeoutError:
+                    if heartbeat and deadline - time.monotonic() > 0:
+                        yield None
+                    continue
+
+                if event is None or event["seq"] > last_seq + 1:
+                    resync = True
+                    continue
+                if event["seq"] <= last_seq:
+                    continue
+                last_seq = event["seq"]
+                yield event
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            await self._unlisten(channel, queue)
+
+    async def _listen(self, channel, queue):
+        """Register a local subscriber, subscribing the shared connection to the channel on first use."""
+        if channel in self.listeners:
+            self.listeners[channel].add(queue)
+            return
+        self.listeners[channel] = {queue}
+        if self.pubsub is None:
+            self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(channel)
+        if self.reader is None or self.reader.done():
+            self.reader = asyncio.create_task(self._read(), name="progress-reader")
+
+    async def _unlisten(self, channel, queue):
+        """Remove a local subscriber, unsubscribing the channel when it was the last one."""
+        queues = self.listeners.get(channel)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.listeners[channel]
+            with contextlib.suppress(Exception):
+                await self.pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        """Deliver messages from the shared pub/sub connection to the local subscribers of each channel."""
+        while self.listeners:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Progress subscription error, resynchronizing subscribers: {e}")
+                # Messages may have been lost: every subscriber replays the recorded events
+                for queues in self.listeners.values():
+                    for queue in queues:
+                        queue.put_nowait(None)
+                await asyncio.sleep(1)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            event = json.loads(message["data"])
+            for queue in self.listeners.get(message["channel"], ()):
+                queue.put_nowait(event)
+                self.delivered += 1
+
+    async def close(self):
+        """Stop the reader and release the pub/sub connection. Called at application shutdown."""
+        if self.reader is not None:
+            self.reader.cancel()
+            await asyncio.gather(self.reader, return_exceptions=True)
+            self.reader = None
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+            self.pubsub = None
+
+    def stats(self):
+        """
+        Return progress counters.
+
+        :return: A dictionary of counters.
+        """
+        return {
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "delivered": self.delivered,
+            "streams": self.streams,
+            "subscribed_sessions": len(self.listeners),
+            "subscribers": sum(len(queues) for queues in self.listeners.values()),
+        }
+
+
+def format_sse(event):
+    """
+    Encode a progress event as a Server-Sent Event whose id is its seq, or a keep-alive comment for None.
+
+    :param event: The event dictionary, or None.
+    :return: The encoded chunk.
+    """
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+# Process-wide hub used to publish and follow session progress
+progress_hub = ProgressHub(RedisManager())
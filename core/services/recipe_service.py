@@ -1,21 +1,140 @@
-import aiohttp
-from bs4 import BeautifulSoup
-import json
+import codecs
 import logging
-import html
+import re
 import ssl
+from core.configs import settings
 from core.services.data_service import RedisManager
+from core.services.http_service import http_client
+from core.services.jsonld_service import JsonLdIndex, LdJsonScanner
+from core.services import metrics_service as metrics
+from core.services.parse_service import parse_pool
+from core.services.scheduler_service import fetch_scheduler
 
 
 # Configure logging settings to track important events and errors during execution
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# SSL context configuration to bypass SSL certificate verification for recipe sites. Built once and shared,
+# so the pooled connector can reuse connections (its pool key includes the SSL context).
+UNVERIFIED_SSL_CONTEXT = ssl.create_default_context()
+UNVERIFIED_SSL_CONTEXT.check_hostname = False
+UNVERIFIED_SSL_CONTEXT.verify_mode = ssl.CERT_NONE  # Ignore SSL cert validation (use with caution)
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="text/html; charset=...">, looked for in the first chunk
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_\-:.]+)', re.IGNORECASE)
+
+
+class FetchStats:
+    """Counters for page downloads: bytes read, reads stopped early, and bytes that were never downloaded."""
+
+    def __init__(self):
+        self.pages = 0
+        self.bytes_read = 0
+        self.bytes_saved = 0     # Known from Content-Length on uncompressed responses that were cut short
+        self.early_stops = 0     # The recipe block was complete before the end of the page
+        self.capped = 0          # HTML_MAX_BYTES was reached
+        self.unknown_saved = 0   # Reads cut short where the remaining size is unknown (chunked or compressed)
+
+    def record(self, response, bytes_read, early_stop=False, capped=False):
+        """
+        Record one page download.
+
+        :param response: The aiohttp response.
+        :param bytes_read: Decompressed body bytes read.
+        :param early_stop: Whether reading stopped because the recipe block was complete.
+        :param capped: Whether reading stopped at HTML_MAX_BYTES.
+        """
+        self.pages += 1
+        self.bytes_read += bytes_read
+        self.early_stops += early_stop
+        self.capped += capped
+        if early_stop or capped:
+            encoded = response.headers.get("Content-Encoding", "identity").lower() != "identity"
+            if response.content_length is not None and not encoded:
+                self.bytes_saved += max(0, response.content_length - bytes_read)
+            else:
+                self.unknown_saved += 1
+
+    def stats(self):
+        """
+        Return download counters.
+
+        :return: A dictionary of counters and the average bytes read per page.
+        """
+        return {
+            "pages": self.pages,
+            "bytes_read": self.bytes_read,
+            "bytes_saved": self.bytes_saved,
+            "early_stops": self.early_stops,
+            "capped": self.capped,
+            "stops_with_unknown_savings": self.unknown_saved,
+            "avg_bytes_per_page": round(self.bytes_read / self.pages) if self.pages else 0,
+        }
+
+
+# Process-wide download counters, reported by html_processing
+fetch_stats = FetchStats()
+
+
+def page_decoder(response, first_chunk):
+    """
+    Create an incremental decoder for a page body using its declared charset: the Content-Type header,
+    then a <meta charset> in the first chunk, then UTF-8.
+
+    :param response: The aiohttp response.
+    :param first_chunk: The first bytes of the body.
+    :return: An incremental decoder that replaces undecodable bytes.
+    """
+    charset = response.charset
+    if not charset:
+        match = META_CHARSET_RE.search(first_chunk)
+        charset = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        logging.warning(f"Unknown charset {charset!r} declared, decoding as UTF-8")
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+async def release_early(response):
+    """
+    Give up on the rest of a response body without leaving its connection unusable.
+    Once aiohttp has received the whole body it returns the connection to the pool, possibly with reading
+    paused for flow control; the buffered remainder is then drained (no network I/O) so the next request on
+    that connection is not stuck. A connection still receiving the body is closed instead.
+
+    :param response: The aiohttp response that was only partly read.
+    """
+    if response.connection is None:
+        while await response.content.readany():
+            pass
+    else:
+        response.close()
+
+
+def build_recipe_index(script_contents=None, content=None):
+    """
+    Build the compact JSON-LD index for a page. This is the CPU-bound step of a scrape and runs in the
+    parse pool, so it must stay a module-level function that only takes and returns plain data.
+
+    :param script_contents: The ld+json blocks picked out by the streaming scanner, if any.
+    :param content: The full HTML document, parsed with BeautifulSoup when no blocks are given.
+    :return: A compact JsonLdIndex.
+    """
+    if script_contents is None:
+        # Only the fallback needs bs4; import it on first use to keep it out of start-up
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content or '', 'html.parser')
+        script_contents = [script_tag.string for script_tag in soup.find_all('script', type='application/ld+json')]
+    return JsonLdIndex.from_scripts(script_contents).compact()
+
 
 class RecipeScraper:
     """
     A class to scrape recipe data from a given URL. The data is fetched asynchronously,
-    parsed with BeautifulSoup, and extracted from JSON-LD structured data on the page. Results are stored in Redis
-    and published via Pub/Sub. Server-Sent Events (SSE) is used for real-time feedback to the client.
+    parsed with BeautifulSoup, and extracted from JSON-LD structured data on the page. The caller stores the
+    results in the session's Redis record. Server-Sent Events (SSE) is used for real-time feedback to the client.
     """
     
     def __init__(self, url, session_id, user_id, redis_manager: RedisManager):
@@ -37,296 +156,186 @@ class RecipeScraper:
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        self.soup = None  # Placeholder for the BeautifulSoup object
+        self.index = None  # Placeholder for the JSON-LD index shared by all extractors
 
-    async def fetch_page_content(self):
+        # Cache validators from the last response, and whether a conditional GET came back 304 Not Modified
+        self.etag = None
+        self.last_modified = None
+        self.not_modified = False
+
+    @metrics.timer(metrics.FETCH_SECONDS)
+    async def fetch_page_content(self, validators: dict = None):
         """
-        Fetch the content of the URL page asynchronously and parse it using BeautifulSoup.
+        Fetch the content of the URL page asynchronously and build the JSON-LD index used by the extract_* methods.
+        In "stream" mode only the ld+json blocks are picked out of the response as it arrives; BeautifulSoup
+        is used when the scanner finds no recipe block or when HTML_PARSER_MODE is "soup".
+        Decoding and indexing run in the parse pool so they never block the event loop.
         The content is also sent to the client via SSE for real-time feedback.
+
+        :param validators: Optional cache entry with 'etag'/'last_modified' to revalidate with a conditional GET.
+                           If the page is unchanged, not_modified is set and no index is built.
         """
         logging.info(f"Fetching page content for URL: {self.url}")
         try:
-            # SSL context configuration to bypass SSL certificate verification
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE  # Ignore SSL cert validation (use with caution)
-
-            # Open an asynchronous HTTP session to fetch the page content
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url, headers=self.headers, ssl=ssl_context) as response:
+            # Fetch through the shared, pooled session so repeat fetches reuse open connections
+            headers = dict(self.headers)
+            if validators:
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+
+            session = await http_client.get_session()
+            # Wait for the host's turn: per-host concurrency, the shared token bucket and fair global slots
+            async with fetch_scheduler.slot(self.url) as ticket:
+                async with session.get(self.url, headers=headers, ssl=UNVERIFIED_SSL_CONTEXT) as response:
+                    # Let the host's rate adapt to 429/Retry-After and to its latency
+                    await ticket.observe(response)
+
+                    if response.status == 304 and validators:
+                        logging.info(f"Page not modified since it was cached: {self.url}")
+                        self.not_modified = True
+                        return
+
                     if response.status != 200:
                         # Handle non-successful HTTP responses and notify the client
                         raise Exception(f"HTTP error occurred: {response.status}")
-                    
-                    # Read and parse the HTML content of the page
-                    content = await response.text()
-                    self.soup = BeautifulSoup(content, 'html.parser')
-                    logging.info(f"Successfully fetched and parsed content for URL: {self.url}")
-                    
-                    # Notify the client of the successful page fetch
+
+                    if settings.HTML_PARSER_MODE == "stream":
+                        script_contents, content = await self.scan_ld_json(response)
+                    else:
+                        script_contents, content = None, await self.read_page(response)
+
+                    self.etag = response.headers.get("ETag")
+                    self.last_modified = response.headers.get("Last-Modified")
+
+            # Decode every JSON-LD block exactly once, off the event loop; the extractors all read from this index.
+            # This runs after the host's fetch slot is released, so parsing never holds up the next fetch.
+            self.index = await parse_pool.run(build_recipe_index, script_contents, content)
+            logging.info(f"Successfully fetched and parsed content for URL: {self.url}")
+
+            # Notify the client of the successful page fetch
         except Exception as e:
             # Log and notify the client about any errors during the page fetch process
             logging.error(f"Error fetching page content for URL: {self.url} - {str(e)}")
             raise
 
-    async def extract_ingredients(self):
+    async def scan_ld_json(self, response):
         """
-        Extract the 'recipeIngredient' list from JSON-LD data embedded on the page.
-        This method searches through script tags and identifies structured data in JSON format.
-        The results are stored in Redis and published to Pub/Sub.
-        """
-        logging.info(f"Extracting ingredients from URL: {self.url}")
-        if not self.soup:
-            raise Exception("Soup object not initialized. Call fetch_page_content first.")
-
-        # Find all script tags containing JSON-LD structured data
-        script_tags = self.soup.find_all('script', type='application/ld+json')
-
-        for script_tag in script_tags:
-            try:
-                script_content = script_tag.string.strip()
-                if script_content.endswith(';'):
-                    script_content = script_content[:-1]
-
-                json_data = json.loads(script_content)
-
-                if 'recipeIngredient' in json_data:
-                    logging.info("Ingredients successfully extracted from JSON-LD.")
-                    await self.redis_manager.save_to_redis(self.session_id, "ingredients", json_data['recipeIngredient'], prefix="temp")
-                    # await self.pubsub_manager.publish_to_pubsub(settings.PUBSUB_TOPIC_HTML_PROCESS, {
-                    #     "session_id": self.session_id,
-                    #     "user_id": self.user_id,
-                    #     "ingredients": json_data['recipeIngredient']
-                    # })
-                    return json_data['recipeIngredient']
-
-                if isinstance(json_data, list):
-                    for item in json_data:
-                        if 'recipeIngredient' in item:
-                            logging.info("Ingredients successfully extracted from JSON-LD list.")
-                            await self.redis_manager.save_to_redis(self.session_id, "ingredients", item['recipeIngredient'], prefix="temp")
-                            # await self.pubsub_manager.publish_to_pubsub(settings.PUBSUB_TOPIC_HTML_PROCESS, {
-                            #     "session_id": self.session_id,
-                            #     "user_id": self.user_id,
-                            #     "ingredients": item['recipeIngredient']
-                            # })
-                            return item['recipeIngredient']
-
-                if '@graph' in json_data:
-                    for graph_item in json_data['@graph']:
-                        if 'recipeIngredient' in graph_item:
-                            logging.info("Ingredients successfully extracted from JSON-LD graph.")
-                            await self.redis_manager.save_to_redis(self.session_id, "ingredients", graph_item['recipeIngredient'], prefix="temp")
-                            # await self.pubsub_manager.publish_to_pubsub(settings.PUBSUB_TOPIC_HTML_PROCESS, {
-                            #     "session_id": self.session_id,
-                            #     "user_id": self.user_id,
-                            #     "ingredients": graph_item['recipeIngredient']
-                            # })
-                            return graph_item['recipeIngredient']
-
-            except json.JSONDecodeError as e:
-                logging.error(f"Error parsing JSON-LD block: {e}")
-                continue
-
-        raise Exception("No recipeIngredient found in JSON-LD data.")
-    
-    async def extract_nutrition_data(self):
-        """Extract the nutrition, recipeCategory, recipeYield, recipeName, and author from JSON-LD structured data on the page."""
-        logging.info(f"Extracting nutrition data from URL: {self.url}")
-        if not self.soup:
-            raise Exception("Soup object not initialized. Call fetch_page_content first.")
-
-        # Find all <script> tags with type="application/ld+json"
-        script_tags = self.soup.find_all('script', type='application/ld+json')
-
-        # Iterate over each JSON-LD <script> tag
-        for script_tag in script_tags:
-            try:
-                script_content = script_tag.string.strip()
-
-                # Remove any trailing semicolons or non-JSON characters
-                if script_content.endswith(';'):
-                    script_content = script_content[:-1]
-
-                # Attempt to parse the cleaned JSON
-                json_data = json.loads(script_content)
-
-                # Check if the JSON is a list
-                if isinstance(json_data, list):
-                    json_data = json_data[0]  # Access the first item in the list
-
-                # Extract fields
-                nutrition_data = json_data.get('nutrition', None)
-                recipe_category = json_data.get('recipeCategory', None)
-                recipe_yield = json_data.get('recipeYield', None)
-                recipe_name = json_data.get('name', None)
-                author = json_data.get('author', [{}])[0].get('name', None)
-
-                # If no nutrition data found, check deeper within possible nested structures
-                if not nutrition_data and '@graph' in json_data:
-                    for graph_item in json_data['@graph']:
-                        if 'nutrition' in graph_item:
-                            nutrition_data = graph_item['nutrition']
-                            break  # Found nutrition data, break the loop
-
-                # If nutrition data is found, append additional data
-                if nutrition_data:
-                    # Remove '@type' from nutrition data
-                    nutrition_data.pop('@type', None)
-
-                    # Add recipe category and recipe yield
-                    if recipe_category:
-                        nutrition_data['recipeCategory'] = recipe_category
-                    if recipe_yield:
-                        nutrition_data['recipeYield'] = recipe_yield
-
-                    # Add recipe name and author
-                    if recipe_name:
-                        nutrition_data['recipeName'] = html.unescape(recipe_name)  # Unescape HTML entities
-                    if author:
-                        nutrition_data['author'] = author
-
-                    # await self.pubsub_manager.publish_to_pubsub(settings.PUBSUB_TOPIC_HTML_PROCESS, {
-                    #             "session_id": self.session_id,
-                    #             "user_id": self.user_id,
-                    #             "nutrition_data": nutrition_data
-                    #         })
-
-                    return nutrition_data
-
-            except json.JSONDecodeError as e:
-                logging.error(f"Error parsing JSON-LD block: {e}")
-                continue  # Skip to the next block if this one can't be parsed
-
-        # If no nutrition data is found
-        raise Exception("No nutrition data found in JSON-LD data.")
+        Stream the response body through an LdJsonScanner and stop reading as soon as the recipe block is complete,
+        or once HTML_MAX_BYTES have been read. Falls back to BeautifulSoup over the document read so far when the
+        scanner finds no recipe block.
 
-    async def extract_recipe_image_name_video(self):
+        :param response: The aiohttp response whose body has not been read yet.
+        :return: A tuple (script_contents, content): the ld+json blocks found by the scanner, or the
+                 document to be parsed with BeautifulSoup when the scanner found no recipe block.
         """
-        Extract the main recipe image, recipe name, and video content URL from the JSON-LD structured data on the page.
-        The data is stored in Redis and published to Pub/Sub for further processing.
+        scanner = LdJsonScanner()
+        decoder = None
+        chunks = []
+        bytes_read = 0
+        capped = False
+
+        async for chunk in response.content.iter_chunked(settings.HTML_STREAM_CHUNK_SIZE):
+            if decoder is None:
+                decoder = page_decoder(response, chunk)
+            bytes_read += len(chunk)
+            text = decoder.decode(chunk)
+            chunks.append(text)
+            if scanner.feed(text):
+                logging.info(f"Found recipe JSON-LD after {bytes_read} bytes, skipping the rest of the page")
+                fetch_stats.record(response, bytes_read, early_stop=True)
+                await release_early(response)
+                return scanner.close(), None
+            if bytes_read >= settings.HTML_MAX_BYTES:
+                logging.warning(f"Stopped reading {self.url} at the {settings.HTML_MAX_BYTES} byte cap")
+                capped = True
+                await release_early(response)
+                break
+
+        if decoder is not None:
+            text = decoder.decode(b'', final=True)
+            chunks.append(text)
+            scanner.feed(text)
+        scanner.close()
+        fetch_stats.record(response, bytes_read, capped=capped)
+
+        if scanner.has_recipe:
+            return scanner.blocks, None
+
+        logging.info(f"No recipe block found by the streaming scanner, falling back to BeautifulSoup for URL: {self.url}")
+        return None, ''.join(chunks)
+
+    async def read_page(self, response):
         """
-        logging.info(f"Extracting recipe name, image, and video from URL: {self.url}")
-        if not self.soup:
-            raise Exception("Soup object not initialized. Call fetch_page_content first.")
-
-        script_tags = self.soup.find_all('script', type='application/ld+json')
-
-        for script_tag in script_tags:
-            try:
-                script_content = script_tag.string.strip()
-                if script_content.endswith(';'):
-                    script_content = script_content[:-1]
-
-                json_data = json.loads(script_content)
-
-                if isinstance(json_data, list):
-                    for item in json_data:
-                        recipe_image, recipe_name, recipe_video_url = self.process_recipe_data(item)
-                        if recipe_image and recipe_name:
-                            logging.info(f"Successfully extracted recipe name: {recipe_name}, image, and video URL.")
-                            await self.redis_manager.save_to_redis(
-                                self.session_id, 
-                                "recipe_info", {
-                                    "name": recipe_name,
-                                    "image": recipe_image,
-                                    "video_url": recipe_video_url
-                                }, 
-                                prefix="temp"
-                            )
-                            # await self.pubsub_manager.publish_to_pubsub(settings.PUBSUB_TOPIC_HTML_PROCESS, {
-                            #     "session_id": self.session_id,
-                            #     "user_id": self.user_id,
-                            #     "recipe_name": recipe_name,
-                            #     "recipe_image": recipe_image,
-                            #     "recipe_video_url": recipe_video_url
-                            # })
-                            return recipe_image, recipe_name, recipe_video_url
-
-                else:
-                    recipe_image, recipe_name, recipe_video_url = self.process_recipe_data(json_data)
-                    if recipe_image and recipe_name:
-                        logging.info(f"Successfully extracted recipe name: {recipe_name}, image, and video URL.")
-                        await self.redis_manager.save_to_redis(
-                            self.session_id, 
-                                "recipe_info", {
-                                "name": recipe_name,
-                                "image": recipe_image,
-                                "video_url": recipe_video_url
-                            },
-                            prefix="temp"
-                        )
-                        # await self.pubsub_manager.publish_to_pubsub(settings.PUBSUB_TOPIC_HTML_PROCESS, {
-                        #     "session_id": self.session_id,
-                        #     "user_id": self.user_id,
-                        #     "recipe_name": recipe_name,
-                        #     "recipe_image": recipe_image,
-                        #     "recipe_video_url": recipe_video_url
-                        # })
-                        return recipe_image, recipe_name, recipe_video_url
-
-            except json.JSONDecodeError as e:
-                logging.error(f"Error parsing JSON-LD: {e}")
-                continue
-
-        raise Exception("No recipe name, image, or video URL found in JSON-LD data.")
-
-    def find_video_content_url(self, json_data):
+        Read and decode the response body, stopping at HTML_MAX_BYTES.
+
+        :param response: The aiohttp response whose body has not been read yet.
+        :return: The decoded (possibly truncated) document.
         """
-        Recursively search for the contentUrl within objects of type 'VideoObject'.
-        
-        :param json_data: The JSON data to search through.
-        :return: The contentUrl for the video if found, otherwise None.
+        decoder = None
+        chunks = []
+        bytes_read = 0
+        capped = False
+
+        async for chunk in response.content.iter_chunked(settings.HTML_STREAM_CHUNK_SIZE):
+            if decoder is None:
+                decoder = page_decoder(response, chunk)
+            bytes_read += len(chunk)
+            chunks.append(decoder.decode(chunk))
+            if bytes_read >= settings.HTML_MAX_BYTES:
+                logging.warning(f"Stopped reading {self.url} at the {settings.HTML_MAX_BYTES} byte cap")
+                capped = True
+                await release_early(response)
+                break
+
+        if decoder is not None:
+            chunks.append(decoder.decode(b'', final=True))
+        fetch_stats.record(response, bytes_read, capped=capped)
+        return ''.join(chunks)
+
+    @metrics.timer(metrics.EXTRACT_SECONDS, field="ingredients")
+    async def extract_ingredients(self):
         """
-        if isinstance(json_data, dict):
-            # Check if this dictionary is a VideoObject
-            if json_data.get('@type') == 'VideoObject':
-                return json_data.get('contentUrl', None)
-            
-            # If not, keep searching within the values
-            for key, value in json_data.items():
-                if isinstance(value, (dict, list)):
-                    result = self.find_video_content_url(value)
-                    if result:
-                        return result
-
-        elif isinstance(json_data, list):
-            for item in json_data:
-                result = self.find_video_content_url(item)
-                if result:
-                    return result
-
-        return None
-
-    def process_recipe_data(self, json_data):
+        Extract the 'recipeIngredient' list from the JSON-LD index built by fetch_page_content.
         """
-        Process a single JSON-LD object and extract the recipe name, image, and video content URL from it.
+        logging.info(f"Extracting ingredients from URL: {self.url}")
+        if not self.index:
+            raise Exception("JSON-LD index not initialized. Call fetch_page_content first.")
 
-        :param json_data: The JSON-LD data object containing recipe information.
-        :return: A tuple (recipe_image, recipe_name, recipe_video_url) if available, else (None, None, None).
-        """
-        recipe_name = json_data.get('name')  # Extract recipe name
-        recipe_image = json_data.get('image')  # Extract recipe image
-        
-        # Use the specific function to find the video contentUrl
-        recipe_video_url = self.find_video_content_url(json_data)
+        recipe_ingredients = self.index.recipe_ingredients()
+        if recipe_ingredients is None:
+            raise Exception("No recipeIngredient found in JSON-LD data.")
+
+        logging.info("Ingredients successfully extracted from JSON-LD.")
+        return recipe_ingredients
 
-        if '@graph' in json_data:
-            for graph_item in json_data['@graph']:
-                graph_type = graph_item.get('@type')
+    @metrics.timer(metrics.EXTRACT_SECONDS, field="nutrition")
+    async def extract_nutrition_data(self):
+        """Extract the nutrition, recipeCategory, recipeYield, recipeName, and author from the JSON-LD index."""
+        logging.info(f"Extracting nutrition data from URL: {self.url}")
+        if not self.index:
+            raise Exception("JSON-LD index not initialized. Call fetch_page_content first.")
 
-                if isinstance(graph_type, list):
-                    if "Recipe" in graph_type:
-                        recipe_name = graph_item.get('name', recipe_name)
-                        recipe_image = graph_item.get('image', recipe_image)
-                elif graph_type == "Recipe":
-                    recipe_name = graph_item.get('name', recipe_name)
-                    recipe_image = graph_item.get('image', recipe_image)
+        nutrition_data = self.index.recipe_nutrition()
+        if not nutrition_data:
+            # If no nutrition data is found
+            raise Exception("No nutrition data found in JSON-LD data.")
 
-        if isinstance(recipe_image, list):
-            recipe_image = recipe_image[-1]
+        return nutrition_data
+
+    @metrics.timer(metrics.EXTRACT_SECONDS, field="image_name_video")
+    async def extract_recipe_image_name_video(self):
+        """
+        Extract the main recipe image, recipe name, and video content URL from the JSON-LD index.
+        """
+        logging.info(f"Extracting recipe name, image, and video from URL: {self.url}")
+        if not self.index:
+            raise Exception("JSON-LD index not initialized. Call fetch_page_content first.")
 
-        if isinstance(recipe_image, dict) and 'url' in recipe_image:
-            recipe_image = recipe_image['url']
+        recipe_image, recipe_name, recipe_video_url = self.index.recipe_image_name_video()
+        if not (recipe_image and recipe_name):
+            raise Exception("No recipe name, image, or video URL found in JSON-LD data.")
 
-        return recipe_image, recipe_name, recipe_video_url
\ No newline at end of file
+        logging.info(f"Successfully extracted recipe name: {recipe_name}, image, and video URL.")
+        return recipe_image, recipe_name, recipe_video_url
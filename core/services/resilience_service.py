@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from core.configs import settings
+
+# Configure logging to track retries, hedges and circuit breaker transitions
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Statuses that mean "try again later" rather than "this request is wrong"
+RETRYABLE_STATUSES = {408, 429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the target while its circuit breaker is open."""
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given in seconds or as an HTTP date.
+
+    :param value: The header value.
+    :return: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(retry_number, retry_after=None):
+    """
+    Return how long to wait before a retry: exponential backoff with full jitter, so callers that failed
+    together do not retry together, and never less than the target's Retry-After.
+
+    :param retry_number: 0 for the first retry, 1 for the second...
+    :param retry_after: Seconds the target asked to wait, if it said.
+    :return: The delay in seconds.
+    """
+    delay = random.uniform(0, min(settings.RETRY_MAX_DELAY, settings.RETRY_BASE_DELAY * 2 ** retry_number))
+    return max(delay, retry_after or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a target after BREAKER_FAILURE_THRESHOLD consecutive transient failures. While open, calls fail
+    at once; after BREAKER_RESET_TIMEOUT seconds one probe call is let through (half-open), and its outcome closes
+    or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        """
+        :param name: The target the breaker protects, for logs.
+        :param failure_threshold: Consecutive transient failures that open the breaker.
+        :param reset_timeout: Seconds the breaker stays open before a probe (also the longest a probe may take).
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self.opened = 0
+
+    def allow(self):
+        """
+        Check whether a call may go to the target now.
+
+        :return: True if the breaker is closed, or if this call is the half-open probe.
+        """
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probe_started_at = None
+        # One probe at a time; a probe that never reported back (cancelled) is replaced after reset_timeout
+        if self.state == self.HALF_OPEN and (self.probe_started_at is None or now - self.probe_started_at >= self.reset_timeout):
+            self.probe_started_at = now
+            return True
+        return False
+
+    def record_success(self):
+        """Record an answer from the target (including a permanent error: the target itself is healthy)."""
+        if self.state != self.CLOSED:
+            logging.info(f"Circuit breaker for {self.name} closed: the probe call succeeded")
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        """Record a transient failure; opens the breaker at the threshold, or when the half-open probe fails."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.opened += 1
+            logging.warning(f"Circuit breaker for {self.name} opened after {self.failures} consecutive failures")
+
+
+class Target:
+    """
+    Resilience state of one dependency: its circuit breaker, its retry budget and its counters.
+
+    The retry budget keeps retries and hedges to about RETRY_BUDGET_RATIO of the target's calls: every call adds
+    RETRY_BUDGET_RATIO tokens (up to RETRY_BUDGET_MAX), every retry or hedge spends one. When the target fails
+    for everyone, the tokens run out and callers stop multiplying its load.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: The target name used in logs and stats, e.g. "openai" or "HTML Processing".
+        """
+        self.name = name
+        self.breaker = CircuitBreaker(name, settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_TIMEOUT)
+        self.tokens = float(settings.RETRY_BUDGET_MAX)
+
+        # Call counters
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+        self.short_circuited = 0
+
+    def deposit(self):
+        """Add a call's share of retry budget."""
+        self.tokens = min(float(settings.RETRY_BUDGET_MAX), self.tokens + settings.RETRY_BUDGET_RATIO)
+
+    def withdraw(self):
+        """
+        Spend one token on a retry or a hedge.
+
+        :return: False (and nothing is spent) when the budget is exhausted.
+        """
+        if self.tokens < 1:
+            self.budget_exhausted += 1
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Resilience:
+    """
+    Calls dependencies (downstream services, the OpenAI API) with retries on transient failures, per-target
+    circuit breakers and optional hedged requests:
+
+    - Retries use exponential backoff with full jitter, honour Retry-After, stop after RETRY_MAX_ATTEMPTS attempts
+      or when the next one would start after RETRY_DEADLINE seconds, and draw from the target's retry budget.
+    - A hedge is a second, concurrent attempt sent when the first has not answered after hedge_after seconds;
+      the first answer wins and the other attempt is cancelled. Hedges also draw from the retry budget, and
+      are only sent while the target's breaker is closed. Only hedge idempotent calls.
+    """
+
+    def __init__(self):
+        self.targets = {}  # target name -> Target
+
+    def target(self, name):
+        """Return the Target for a name, creating it on first use."""
+        target = self.targets.get(name)
+        if target is None:
+            target = self.targets[name] = Target(name)
+        return target
+
+    async def call(self, name, attempt, is_retryable, retry_after=None, hedge_after=0.0):
+        """
+        Call a dependency with retries, its circuit breaker and optional hedging.
+
+        :param name: The target name.
+        :param attempt: Zero-argument coroutine function making one request; it raises on failure.
+        :param is_retryable: Callable(error) -> bool telling transient failures from permanent ones.
+        :param retry_after: Optional callable(error) -> seconds the target asked to wait, or None.
+        :param hedge_after: Seconds after which a hedged attempt is sent (0 disables hedging).
+        :return: The result of the first successful attempt.
+        :raises CircuitOpenError: If the target's breaker is open.
+        """
+        target = self.target(name)
+        target.calls += 1
+        target.deposit()
+        started_at = time.monotonic()
+
+        if not target.breaker.allow():
+            target.short_circuited += 1
+            raise CircuitOpenError(f"Circuit breaker open for {name}, not calling it")
+
+        for retry_number in range(settings.RETRY_MAX_ATTEMPTS):
+            try:
+                result = await self._attempt(target, attempt, hedge_after)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The target answered; the request itself is at fault and would fail again
+                    target.breaker.record_success()
+                    raise
+                target.failures += 1
+                target.breaker.record_failure()
+
+                # Give up with the target's own error: out of attempts or time, breaker opened, or budget spent
+                delay = backoff_delay(retry_number, retry_after(e) if retry_after else None)
+                if (retry_number + 1 >= settings.RETRY_MAX_ATTEMPTS
+                        or time.monotonic() - started_at + delay > settings.RETRY_DEADLINE
+                        or not target.breaker.allow()
+                        or not target.withdraw()):
+                    raise
+                target.retries += 1
+                logging.warning(f"{name} call failed ({e}), retry {retry_number + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            else:
+                target.breaker.record_success()
+                return result
+
+    async def _attempt(self, target, attempt, hedge_after):
+        """Run one attempt, plus a hedged one if it has not answered after hedge_after seconds."""
+        target.attempts += 1
+        if hedge_after <= 0:
+            return await attempt()
+
+        first = asyncio.ensure_future(attempt())
+        try:
+            done, _ = await asyncio.wait({first}, timeout=hedge_after)
+            if done or target.breaker.state != CircuitBreaker.CLOSED or not target.withdraw():
+                return await first
+        except BaseException:
+            first.cancel()
+            raise
+
+        target.hedges += 1
+        target.attempts += 1
+        second = asyncio.ensure_future(attempt())
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            target.hedge_wins += 1
+                        return task.result()
+            # Both attempts failed: report the first one's error
+            raise first.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """
+        Return per-target counters.
+
+        :return: A dictionary of counter name -> {target name: value}, plus each breaker's state.
+        """
+        counters = ("calls", "attempts", "failures", "retries", "hedges", "hedge_wins", "budget_exhausted", "short_circuited")
+        stats = {counter: {name: getattr(target, counter) for name, target in self.targets.items()} for counter in counters}
+        stats["breaker_open"] = {name: int(target.breaker.state != CircuitBreaker.CLOSED) for name, target in self.targets.items()}
+        stats["breaker_opened"] = {name: target.breaker.opened for name, target in self.targets.items()}
+        stats["breaker_state"] = {name: target.breaker.state for name, target in self.targets.items()}
+        stats["retry_budget"] = {name: round(target.tokens, 2) for name, target in self.targets.items()}
+        return stats
+
+
+# Process-wide resilience state shared by send_to_service and the OpenAI calls
+resilience = Resilience()
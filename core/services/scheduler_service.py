@@ -0,0 +1,317 @@
+import asyncio
+import collections
+import contextlib
+import logging
+import time
+from urllib.parse import urlsplit
+from cachetools import LRUCache
+from redis.exceptions import WatchError
+from core.configs import settings
+from core.services.data_service import RedisManager
+from core.services.resilience_service import parse_retry_after
+
+# Configure logging to track fetch scheduling and throttling
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class HostBusy(Exception):
+    """Raised when a fetch would have to wait longer than FETCH_MAX_QUEUE_WAIT for its host."""
+
+
+class HostState:
+    """Per-instance view of one host: its concurrency limit, latency estimate and counters."""
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(settings.FETCH_HOST_CONCURRENCY)
+        self.active = 0  # Fetches inside FetchScheduler.slot, waiting or running; the state is pinned while > 0
+        self.in_flight = 0
+        self.fetches = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.latency = None  # EWMA of the time to response headers, in seconds
+
+
+class FairSlots:
+    """
+    A global limit on concurrent fetches that hands free slots to waiting hosts in round-robin order,
+    so a burst on one popular host cannot starve fetches for every other host.
+    """
+
+    def __init__(self, slots: int):
+        """
+        :param slots: Number of fetches allowed at the same time.
+        """
+        self.free = slots
+        self.waiters = {}                 # host -> deque of futures waiting for a slot
+        self.order = collections.deque()  # hosts with waiters, in round-robin order
+
+    async def acquire(self, host):
+        """Wait for a global slot on behalf of host."""
+        if self.free > 0 and not self.order:
+            self.free -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if host not in self.waiters:
+            self.waiters[host] = collections.deque()
+            self.order.append(host)
+        self.waiters[host].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter was cancelled: pass it on
+                self.release()
+            else:
+                self._forget(host, future)
+            raise
+
+    def release(self):
+        """Give the slot to the next host in round-robin order, or return it to the pool."""
+        while self.order:
+            host = self.order.popleft()
+            queue = self.waiters[host]
+            future = queue.popleft()
+            if queue:
+                self.order.append(host)
+            else:
+                del self.waiters[host]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.free += 1
+
+    def waiting(self):
+        """Return the number of fetches waiting for a slot."""
+        return sum(len(queue) for queue in self.waiters.values())
+
+    def _forget(self, host, future):
+        """Remove a cancelled waiter."""
+        queue = self.waiters.get(host)
+        if queue is None:
+            return
+        with contextlib.suppress(ValueError):
+            queue.remove(future)
+        if not queue:
+            del self.waiters[host]
+            with contextlib.suppress(ValueError):
+                self.order.remove(host)
+
+
+class FetchScheduler:
+    """
+    Coordinates page fetches per host.
+
+    - Each instance runs at most FETCH_HOST_CONCURRENCY fetches per host and FETCH_MAX_CONCURRENCY in total;
+      free global slots go to waiting hosts in round-robin order.
+    - Every instance draws from one token bucket per host kept in Redis (GCRA: the hash stores the bucket's
+      theoretical arrival time), so the combined request rate to a host stays at its current rate.
+    - The rate adapts (AIMD): a 429/503 halves it and honours Retry-After for every instance; a response slower
+      than FETCH_LATENCY_TARGET reduces it; a fast success raises it by FETCH_RATE_INCREASE.
+    """
+
+    def __init__(self, redis_manager: RedisManager):
+        """
+        :param redis_manager: RedisManager whose client holds the shared per-host buckets.
+        """
+        self.redis_client = redis_manager.redis_client
+        self.hosts = LRUCache(maxsize=4096)
+        # Hosts with fetches in progress, never evicted: a fresh state would come with a fresh semaphore and let
+        # the host exceed FETCH_HOST_CONCURRENCY
+        self.busy = {}
+        self.slots = FairSlots(settings.FETCH_MAX_CONCURRENCY)
+
+        # Scheduler counters
+        self.total_wait = 0.0
+        self.scheduled = 0
+
+    @staticmethod
+    def bucket_key(host):
+        """Return the Redis hash holding a host's shared token bucket and rate."""
+        return f"fetch_host:{host}"
+
+    def host_state(self, host):
+        """Return this instance's state for a host, creating it on first use."""
+        state = self.busy.get(host) or self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState()
+        return state
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        """
+        Wait for permission to fetch url, then yield a FetchTicket to report the response on.
+
+        :param url: The page URL.
+        :raises HostBusy: If the host's bucket would make the fetch wait longer than FETCH_MAX_QUEUE_WAIT.
+        """
+        if not settings.FETCH_SCHEDULER_ENABLED:
+            yield FetchTicket(self, None, None)
+            return
+
+        host = (urlsplit(url).hostname or "").lower()
+        state = self.host_state(host)
+        queued_at = time.monotonic()
+
+        state.active += 1
+        self.busy[host] = state
+        try:
+            async with state.semaphore:
+                delay = await self._reserve(host)
+                if delay is None:
+                    state.rejected += 1
+                    raise HostBusy(f"Fetch queue for {host} is longer than {settings.FETCH_MAX_QUEUE_WAIT}s")
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                await self.slots.acquire(host)
+                self.scheduled += 1
+                self.total_wait += time.monotonic() - queued_at
+                state.in_flight += 1
+                state.fetches += 1
+                try:
+                    yield FetchTicket(self, host, state)
+                finally:
+                    state.in_flight -= 1
+                    self.slots.release()
+        finally:
+            state.active -= 1
+            if not state.active:
+                # Back to the LRU, which may evict it once it is idle
+                del self.busy[host]
+                self.hosts[host] = state
+
+    async def _reserve(self, host):
+        """
+        Take a token from the host's shared bucket, reserving a future one if it is empty.
+
+        :return: Seconds to wait before fetching, or None if the wait would exceed FETCH_MAX_QUEUE_WAIT.
+        """
+        key = self.bucket_key(host)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    tat, rate, blocked_until = await pipe.hmget(key, ["tat", "rate", "blocked_until"])
+                    now = time.time()
+                    rate = float(rate) if rate else settings.FETCH_HOST_RATE
+                    interval = 1.0 / rate
+                    burst = (settings.FETCH_HOST_BURST - 1) * interval
+
+                    # A bucket that drained during a Retry-After block starts after it
+                    start = max(float(tat) if tat else now, float(blocked_until) if blocked_until else now, now)
+                    delay = max(0.0, start - burst - now)
+                    if delay > settings.FETCH_MAX_QUEUE_WAIT:
+                        await pipe.reset()
+                        return None
+
+                    pipe.multi()
+                    pipe.hset(key, "tat", start + interval)
+                    pipe.expire(key, settings.FETCH_HOST_STATE_TTL)
+                    await pipe.execute()
+                    return delay
+                except WatchError:
+                    continue
+
+    async def observe(self, host, state, status, headers, latency):
+        """
+        Adapt the host's shared rate to a response.
+
+        :param host: The host name.
+        :param state: This instance's HostState for the host.
+        :param status: The HTTP status code.
+        :param headers: The response headers.
+        :param latency: Seconds from sending the request to receiving the response headers.
+        """
+        state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+
+        throttled = status in (429, 503)
+        retry_after = parse_retry_after(headers.get("Retry-After")) if throttled else None
+        if throttled:
+            state.throttled += 1
+
+        # Read-modify-write under WATCH, like _reserve: 429s seen by several instances at once each halve the rate
+        key = self.bucket_key(host)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    rate = await pipe.hget(key, "rate")
+                    rate = float(rate) if rate else settings.FETCH_HOST_RATE
+
+                    fields = {}
+                    if throttled:
+                        fields["rate"] = max(settings.FETCH_HOST_MIN_RATE, rate / 2)
+                        if retry_after:
+                            fields["blocked_until"] = time.time() + min(retry_after, settings.FETCH_MAX_RETRY_AFTER)
+                    elif latency > settings.FETCH_LATENCY_TARGET:
+                        fields["rate"] = max(settings.FETCH_HOST_MIN_RATE, rate * 0.8)
+                    elif status < 400 and rate < settings.FETCH_HOST_MAX_RATE:
+                        fields["rate"] = min(settings.FETCH_HOST_MAX_RATE, rate + settings.FETCH_RATE_INCREASE)
+
+                    if not fields:
+                        await pipe.reset()
+                        break
+                    pipe.multi()
+                    pipe.hset(key, mapping=fields)
+                    pipe.expire(key, settings.FETCH_HOST_STATE_TTL)
+                    await pipe.execute()
+                    break
+                except WatchError:
+                    continue
+
+        if throttled:
+            logging.warning(f"{host} answered {status}; rate lowered to {fields['rate']:.2f}/s, retry after {retry_after}")
+
+    def stats(self):
+        """
+        Return scheduler counters, with per-host details for the hosts this instance is busiest with.
+
+        :return: A dictionary of counters.
+        """
+        hosts = sorted({**dict(self.hosts.items()), **self.busy}.items(), key=lambda item: item[1].fetches, reverse=True)[:20]
+        return {
+            "scheduled": self.scheduled,
+            "free_slots": self.slots.free,
+            "waiting_for_slot": self.slots.waiting(),
+            "avg_wait_ms": round(self.total_wait / self.scheduled * 1000, 3) if self.scheduled else 0.0,
+            "hosts": {
+                host: {
+                    "in_flight": state.in_flight,
+                    "fetches": state.fetches,
+                    "throttled": state.throttled,
+                    "rejected": state.rejected,
+                    "latency_ms": round(state.latency * 1000, 1) if state.latency is not None else None,
+                }
+                for host, state in hosts
+            },
+        }
+
+
+class FetchTicket:
+    """Handed out by FetchScheduler.slot; report the response on it so the host's rate can adapt."""
+
+    def __init__(self, scheduler, host, state):
+        self.scheduler = scheduler
+        self.host = host
+        self.state = state
+        self.started_at = time.monotonic()
+
+    async def observe(self, response):
+        """
+        Feed a response's status, Retry-After and latency back to the scheduler.
+
+        :param response: The aiohttp response (headers received).
+        """
+        if self.host is None:
+            return
+        latency = time.monotonic() - self.started_at
+        try:
+            await self.scheduler.observe(self.host, self.state, response.status, response.headers, latency)
+        except Exception as e:
+            # Rate feedback is best effort and must never fail the fetch
+            logging.error(f"Error updating the fetch rate for {self.host}: {e}")
+
+
+# Process-wide scheduler used by every RecipeScraper in this instance
+fetch_scheduler = FetchScheduler(RedisManager())
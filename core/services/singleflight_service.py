@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from redis.exceptions import WatchError
+from core.configs import settings
+from core.services.data_service import RedisManager
+
+# Configure logging to track coalesced operations
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class LeaderCancelled(Exception):
+    """Set on the shared future when the caller running an operation is cancelled, so its waiters run it again."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight operation whose result every caller receives.
+
+    Within a process, callers for a key that is already running await the same shared future. Across instances,
+    the caller that wins a Redis lock (SET NX PX) runs the operation and publishes its JSON result under a short-lived
+    result key; callers on other instances poll for that result instead of repeating the work. If the leader fails
+    or does not answer within SINGLEFLIGHT_WAIT_TIMEOUT seconds, waiters fall back to running the operation themselves.
+    """
+
+    def __init__(self, redis_manager: RedisManager, namespace: str):
+        """
+        :param redis_manager: RedisManager whose client holds the locks and the fanned-out results.
+        :param namespace: Prefix separating the keys of different operations (e.g. "scrape", "gpt").
+        """
+        self.redis_client = redis_manager.redis_client
+        self.namespace = namespace
+        self.in_flight = {}  # key -> asyncio.Future shared by every local caller
+
+        # Dedup counters
+        self.calls = 0
+        self.executed = 0
+        self.local_shared = 0
+        self.remote_shared = 0
+        self.fallbacks = 0
+
+    def lock_key(self, key):
+        """Return the Redis key of the cross-instance lock for key."""
+        return f"singleflight:{self.namespace}:{key}:lock"
+
+    def result_key(self, key):
+        """Return the Redis key the leader publishes the result of key under."""
+        return f"singleflight:{self.namespace}:{key}:result"
+
+    async def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key and return its result.
+
+        :param key: Identifies the operation (e.g. a canonical URL or an input hash).
+        :param fn: A zero-argument coroutine function; its result must be JSON-serializable.
+        :return: The result of the single shared call.
+        """
+        self.calls += 1
+        if not settings.SINGLEFLIGHT_ENABLED:
+            self.executed += 1
+            return await fn()
+
+        while key in self.in_flight:
+            future = self.in_flight[key]
+            self.local_shared += 1
+            logging.info(f"Joining in-flight {self.namespace} operation for key: {key}")
+            try:
+                # shield: a cancelled waiter must not cancel the call the other waiters share
+                return await asyncio.shield(future)
+            except LeaderCancelled:
+                # The caller running it was cancelled: the first waiter to get here takes over, the others join it
+                self.local_shared -= 1
+                logging.info(f"In-flight {self.namespace} operation was cancelled, retrying for key: {key}")
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            result = await self._run_across_instances(key, fn)
+        except asyncio.CancelledError:
+            # Waiters get an error they can handle rather than a CancelledError that was not meant for them
+            future.set_exception(LeaderCancelled(f"{self.namespace} operation for key {key} was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self.in_flight[key]
+
+    async def _run_across_instances(self, key, fn):
+        """Take the Redis lock and run fn(), or wait for the instance that holds it to publish the result."""
+        if not settings.SINGLEFLIGHT_DISTRIBUTED:
+            self.executed += 1
+            return await fn()
+
+        lock_key = self.lock_key(key)
+        token = uuid.uuid4().hex
+        lock_ttl_ms = int(settings.SINGLEFLIGHT_LOCK_TTL * 1000)
+
+        while True:
+            if await self.redis_client.set(lock_key, token, nx=True, px=lock_ttl_ms):
+                return await self._lead(key, fn, token)
+
+            outcome, result = await self._wait_for_leader(key)
+            if outcome == "result":
+                self.remote_shared += 1
+                logging.info(f"Received {self.namespace} result from another instance for key: {key}")
+                return result
+            if outcome == "timeout":
+                self.fallbacks += 1
+                logging.warning(f"Timed out waiting for the {self.namespace} leader, running locally for key: {key}")
+                self.executed += 1
+                return await fn()
+            # The leader released the lock without a result (it failed): try to take over
+
+    async def _lead(self, key, fn, token):
+        """Run fn() while holding the lock, fan the result out through Redis, then release the lock."""
+        self.executed += 1
+        try:
+            result = await fn()
+        except BaseException:
+            await self._release(self.lock_key(key), token)
+            raise
+
+        try:
+            await self.redis_client.set(self.result_key(key), json.dumps(result), ex=settings.SINGLEFLIGHT_RESULT_TTL)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"{self.namespace} result for key {key} is not JSON-serializable, not shared: {e}")
+        await self._release(self.lock_key(key), token)
+        return result
+
+    async def _wait_for_leader(self, key):
+        """
+        Poll for the leader's result with exponential backoff.
+
+        :return: ("result", value) when published, ("released", None) if the lock was dropped without a result,
+                 or ("timeout", None) after SINGLEFLIGHT_WAIT_TIMEOUT seconds.
+        """
+        deadline = time.monotonic() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+        delay = 0.025
+        while True:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(self.result_key(key))
+                pipe.exists(self.lock_key(key))
+                data, locked = await pipe.execute()
+
+            if data is not None:
+                return "result", json.loads(data)
+            if not locked:
+                return "released", None
+            if time.monotonic() >= deadline:
+                return "timeout", None
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def _release(self, lock_key, token):
+        """Delete the lock only if this caller still owns it (it may have expired and been taken by another instance)."""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(lock_key)
+                if await pipe.get(lock_key) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    await pipe.execute()
+            except WatchError:
+                pass
+
+    def stats(self):
+        """
+        Return dedup counters.
+
+        :return: A dictionary of counters; dedup_ratio is the share of calls served by another caller's operation.
+        """
+        shared = self.local_shared + self.remote_shared
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "local_shared": self.local_shared,
+            "remote_shared": self.remote_shared,
+            "fallbacks": self.fallbacks,
+            "in_flight": len(self.in_flight),
+            "dedup_ratio": round(shared / self.calls, 4) if self.calls else 0.0,
+        }
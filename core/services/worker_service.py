@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import math
+import time
+from core.configs import settings
+
+# Configure logging to track worker pool activity
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class PoolFull(Exception):
+    """Raised by WorkerPool.submit when the queue is full or the pool is not accepting work."""
+
+    def __init__(self, status_code, retry_after):
+        """
+        :param status_code: 429 when the queue is full, 503 when the pool is not running.
+        :param retry_after: Seconds the caller should wait before retrying.
+        """
+        super().__init__(f"Worker pool unavailable ({status_code}), retry after {retry_after}s")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """
+    A fixed number of asyncio workers fed by a bounded queue. Work beyond the queue length is rejected up front
+    (PoolFull) instead of piling up in memory, so latency stays predictable under a burst.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int):
+        """
+        :param name: Name used in logs and worker task names.
+        :param concurrency: Number of jobs run at the same time.
+        :param queue_size: Number of jobs that may wait for a free worker.
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue = None
+        self.workers = []
+        self.accepting = False
+
+        # Queue-depth and latency counters
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.total_service = 0.0
+
+    def start(self):
+        """Create the queue and the workers. Called at application startup."""
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.workers = [
+            asyncio.create_task(self._work(), name=f"{self.name}-worker-{number}") for number in range(self.concurrency)
+        ]
+        self.accepting = True
+        logging.info(f"{self.name} worker pool started: {self.concurrency} workers, queue of {self.queue_size}")
+
+    async def stop(self, timeout: float = None):
+        """
+        Stop accepting work and let the queued jobs finish. Called at application shutdown.
+
+        :param timeout: Seconds to wait for queued and running jobs before cancelling them; defaults to WORKER_DRAIN_TIMEOUT.
+        """
+        if not self.workers:
+            return
+        self.accepting = False
+        timeout = settings.WORKER_DRAIN_TIMEOUT if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{self.name} worker pool stopped with {self.queue.qsize()} queued jobs")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logging.info(f"{self.name} worker pool stopped")
+
+    def retry_after(self):
+        """Estimate how many seconds it takes to work through the current queue."""
+        avg_service = self.total_service / self.completed if self.completed else 1.0
+        depth = self.queue.qsize() if self.queue is not None else 0
+        return max(1, math.ceil((depth + 1) * avg_service / max(self.concurrency, 1)))
+
+    def check_capacity(self):
+        """
+        Raise PoolFull if a job submitted now would be rejected. Lets an endpoint fail fast before doing any work.
+        """
+        if not self.accepting:
+            self.rejected += 1
+            raise PoolFull(503, self.retry_after())
+        if self.queue.full():
+            self.rejected += 1
+            raise PoolFull(429, self.retry_after())
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(*args) for a worker.
+
+        :param fn: A coroutine function.
+        :param args: Positional arguments for fn.
+        :raises PoolFull: If the pool is not running (503) or the queue is full (429).
+        """
+        self.check_capacity()
+        self.queue.put_nowait((fn, args, time.monotonic()))
+        self.accepted += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    async def _work(self):
+        """Run queued jobs one after another until cancelled."""
+        while True:
+            fn, args, queued_at = await self.queue.get()
+            started_at = time.monotonic()
+            self.total_wait += started_at - queued_at
+            self.in_flight += 1
+            try:
+                await fn(*args)
+                self.completed += 1
+            except asyncio.CancelledError:
+                # Only stop() cancelling this worker ends it; a CancelledError raised out of the job (e.g. from a
+                # future it awaited being cancelled) fails that job like any other error
+                if asyncio.current_task().cancelling():
+                    raise
+                self.failed += 1
+                logging.error(f"{self.name} worker job was cancelled")
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"{self.name} worker job failed: {e}")
+            finally:
+                self.in_flight -= 1
+                self.total_service += time.monotonic() - started_at
+                self.queue.task_done()
+
+    def stats(self):
+        """
+        Return queue-depth and latency statistics for the pool.
+
+        :return: A dictionary of counters, with average queue wait and service times.
+        """
+        finished = self.completed + self.failed
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / finished * 1000, 3) if finished else 0.0,
+            "avg_service_ms": round(self.total_service / finished * 1000, 3) if finished else 0.0,
+        }
+
+
+# Bounded pool that runs background_process_html in html_processing
+html_workers = WorkerPool("html", settings.HTML_WORKER_CONCURRENCY, settings.HTML_WORKER_QUEUE_SIZE)
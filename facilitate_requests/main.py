@@ -1,8 +1,14 @@
 import logging
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from core.configs import settings
 from core.services import data_service as ds
+from core.services.codec_service import redis_codec
+from core.services.resilience_service import resilience
+from core.services import metrics_service as metrics
+from core.services.http_service import http_client
+from core.services.pipeline_service import pipeline
 
 # Initialize RedisManager and PubSubManager
 redis_manager = ds.RedisManager()
@@ -12,6 +18,48 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Initialize FastAPI application
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup():
+    # Open the shared, pooled HTTP client once per instance; in stream mode phases are only queued in Redis
+    if settings.PIPELINE_MODE != "stream":
+        await http_client.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await http_client.close()
+    await ds.close_redis_pool()
+
+# Export the counters this service keeps as gauges on /metrics
+metrics.registry.register_collector("pipeline", pipeline.stats)
+metrics.registry.register_collector("redis_pool", ds.redis_pool_stats)
+metrics.registry.register_collector("redis_codec", redis_codec.stats)
+metrics.registry.register_collector("resilience", resilience.stats)
+
+# Route to expose latency histograms and component counters in Prometheus text format
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Route to report pipeline dispatch counters
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    return pipeline.stats()
+
+# Route to report shared Redis connection pool statistics
+@app.get("/redis-pool/stats")
+async def redis_pool_stats():
+    return ds.redis_pool_stats()
+
+# Route to report how Redis values are encoded: codec, compression, bytes stored and encode/decode time
+@app.get("/redis-codec/stats")
+async def redis_codec_stats():
+    return redis_codec.stats()
+
+# Route to report retries, hedges and circuit breaker states per dependency
+@app.get("/resilience/stats")
+async def resilience_stats():
+    return resilience.stats()
+
 @app.post("/pubsub/events")
 async def process_url_events(message_json: dict):
     """
@@ -32,7 +80,11 @@ async def process_url_events(message_json: dict):
 
     # Handle the different phases
     try:
-        if phase == "validation_complete":
+        if settings.PIPELINE_MODE == "stream":
+            # Queue the phase and return at once; the owning service's consumers pick it up
+            await pipeline.enqueue(message_json)
+
+        elif phase == "validation_complete":
             # Call HTML processing service
             await ds.send_to_service(settings.PROCESS_HTML_REQUEST, message_json, session_id, "HTML Processing")
 
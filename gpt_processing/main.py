@@ -1,10 +1,16 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 import logging
-import json
 from core.configs import settings
 from core.configs import schemas
 from core.services import data_service as ds
+from core.services.codec_service import redis_codec
+from core.services.resilience_service import resilience
 from core.services import gpt_service as gpt
+from core.services import background_service as bt
+from core.services import metrics_service as metrics
+from core.services.http_service import http_client
+from core.services.pipeline_service import pipeline, CHAT_GPT_INGEST
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -14,59 +20,74 @@ redis_manager = ds.RedisManager()
 # Initialize FastAPI application
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup():
+    # The shared HTTP client is not opened here: this service makes no aiohttp calls (OpenAI has its own client)
+    gpt.warm_openai_client()
+    # In stream mode this service pulls its phase from the Redis stream instead of being called over HTTP
+    if settings.PIPELINE_MODE == "stream":
+        await pipeline.start_consumers([CHAT_GPT_INGEST])
+
+@app.on_event("shutdown")
+async def shutdown():
+    await pipeline.stop_consumers()
+    await http_client.close()
+    await gpt.close_openai_client()
+    await ds.close_redis_pool()
+
+# Export the counters this service keeps as gauges on /metrics
+metrics.registry.register_collector("gpt_cache", gpt.gpt_cache.stats)
+metrics.registry.register_collector("gpt_batch", gpt.ingredient_batcher.stats)
+metrics.registry.register_collector("singleflight_gpt", gpt.gpt_flight.stats)
+metrics.registry.register_collector("pipeline", pipeline.stats)
+metrics.registry.register_collector("redis_pool", ds.redis_pool_stats)
+metrics.registry.register_collector("redis_codec", redis_codec.stats)
+metrics.registry.register_collector("resilience", resilience.stats)
+
+# Route to expose latency histograms and component counters in Prometheus text format
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Route to report GPT memoization hit/miss counters
+@app.get("/gpt-cache/stats")
+async def gpt_cache_stats():
+    return gpt.gpt_cache.stats()
+
+# Route to report how ingredient lines from concurrent standardizations were micro-batched
+@app.get("/gpt-batch/stats")
+async def gpt_batch_stats():
+    return gpt.ingredient_batcher.stats()
+
+# Route to report how many standardizations were coalesced into another in-flight call
+@app.get("/singleflight/stats")
+async def singleflight_stats():
+    return gpt.gpt_flight.stats()
+
+# Route to report pipeline dispatch and stream consumer counters
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    return pipeline.stats()
+
+# Route to report shared Redis connection pool statistics
+@app.get("/redis-pool/stats")
+async def redis_pool_stats():
+    return ds.redis_pool_stats()
+
+# Route to report how Redis values are encoded: codec, compression, bytes stored and encode/decode time
+@app.get("/redis-codec/stats")
+async def redis_codec_stats():
+    return redis_codec.stats()
+
+# Route to report retries, hedges and circuit breaker states per dependency
+@app.get("/resilience/stats")
+async def resilience_stats():
+    return resilience.stats()
+
 @app.post("/process-gpt")
 async def process_gpt(gpt_request: schemas.ChatGptRequest):
-
-    session_id = gpt_request.session_id
-    redis_key = gpt_request.redis_key
-
-    # Use Get From Redis method to extract object data
-    formatted_data = await redis_manager.get_from_redis(session_id, redis_key, prefix="temp")
-
-    recipe_name = formatted_data['recipe_name']
-    recipe_ingredients = formatted_data['recipe_ingredients_raw']
-    recipe_nutrition = formatted_data['recipe_nutrition_raw']
-    
-    clean_ingredients = await gpt.standardize_ingredients(recipe_name, recipe_ingredients)
-    logging.info("Ingredients successfully processed")
-    clean_nutrition = await gpt.standardize_nutrition(recipe_name, recipe_nutrition)
-    logging.info("Nutrition successfully processed")
-
-# Check if clean_ingredients is a string and convert only if necessary
-    if isinstance(clean_ingredients, str):
-        try:
-            clean_ingredients = json.loads(clean_ingredients)
-        except json.JSONDecodeError as e:
-            logging.error(f"Error decoding clean_ingredients: {e}")
-            raise
-
-    # Check if clean_nutrition is a string and convert only if necessary
-    if isinstance(clean_nutrition, str):
-        try:
-            clean_nutrition = json.loads(clean_nutrition)
-        except json.JSONDecodeError as e:
-            logging.error(f"Error decoding clean_nutrition: {e}")
-            raise
-
-    # Clean Data
-    clean_data = {
-        "user_id": gpt_request.user_id,
-        "session_id": gpt_request.session_id,
-        "recipe_url": formatted_data['recipe_url'],
-        "recipe_name": gpt_request.recipe_name,
-        "recipe_image": formatted_data['recipe_image'],
-        "recipe_video_url" : formatted_data['recipe_video_url'],
-        "recipe_ingredients_clean" : clean_ingredients,
-        "recipe_nutrition_clean" : clean_nutrition,
-        "bucket" : 'clean_processed_data'
-    }
-
-    # serialized_clean_data = json.dumps(clean_data)
-
-    logging.info(f"Serialized Clean Object: {clean_data}")
-
-    # Send to Redis
-    await redis_manager.save_to_redis(session_id, 'clean_processed_data', clean_data, prefix="temp")
+    # Standardize the recipe and store the clean data; the same handler runs in-process when PIPELINE_MODE=inprocess
+    await bt.background_process_gpt(gpt_request)
 
 # This block is executed when running the script directly, starting the FastAPI app using Uvicorn
 if __name__ == "__main__":
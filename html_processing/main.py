@@ -1,8 +1,18 @@
 from core.services import data_service as ds
+from core.services.codec_service import redis_codec
+from core.services.resilience_service import resilience
 from core.configs import schemas
 from core.configs import settings
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from core.services import background_service as bt
+from core.services import metrics_service as metrics
+from core.services.http_service import http_client
+from core.services.pipeline_service import pipeline, VALIDATION_COMPLETE
+from core.services.parse_service import parse_pool
+from core.services import recipe_service as rp
+from core.services.scheduler_service import fetch_scheduler
+from core.services.worker_service import html_workers, PoolFull
 import logging
 
 # Initialize RedisManager to handle storing and retrieving data from Redis
@@ -11,10 +21,102 @@ redis_manager = ds.RedisManager()
 # Initialize FastAPI application
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup():
+    # Open the shared, pooled HTTP client once per instance
+    await http_client.start()
+    # Start the parse workers up front so the first scrape does not pay for spawning them
+    parse_pool.start()
+    # Bounded pool that runs the scrapes accepted by /process-html
+    html_workers.start()
+    # In stream mode this service pulls its phase from the Redis stream instead of being called over HTTP
+    if settings.PIPELINE_MODE == "stream":
+        await pipeline.start_consumers([VALIDATION_COMPLETE])
+
+@app.on_event("shutdown")
+async def shutdown():
+    await pipeline.stop_consumers()
+    await html_workers.stop()
+    # Let the GPT phase hand-offs of the last scrapes reach facilitate-requests
+    await pipeline.drain()
+    await http_client.close()
+    await ds.close_redis_pool()
+    parse_pool.shutdown()
+
+# Export the counters this service keeps as gauges on /metrics
+metrics.registry.register_collector("parse_pool", parse_pool.stats)
+metrics.registry.register_collector("html_workers", html_workers.stats)
+metrics.registry.register_collector("fetch", rp.fetch_stats.stats)
+metrics.registry.register_collector("fetch_scheduler", fetch_scheduler.stats)
+metrics.registry.register_collector("recipe_cache", bt.recipe_cache.stats)
+metrics.registry.register_collector("singleflight_scrape", bt.scrape_flight.stats)
+metrics.registry.register_collector("pipeline", pipeline.stats)
+metrics.registry.register_collector("redis_pool", ds.redis_pool_stats)
+metrics.registry.register_collector("redis_codec", redis_codec.stats)
+metrics.registry.register_collector("resilience", resilience.stats)
+
+# Route to expose latency histograms and component counters in Prometheus text format
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Route to report parse pool queue depth and latency
+@app.get("/parse-pool/stats")
+async def parse_pool_stats():
+    return parse_pool.stats()
+
+# Route to report the scrape worker pool's queue depth, rejections and latency
+@app.get("/workers/stats")
+async def workers_stats():
+    return html_workers.stats()
+
+# Route to report page download sizes and the bytes saved by stopping early
+@app.get("/fetch/stats")
+async def fetch_stats():
+    return rp.fetch_stats.stats()
+
+# Route to report per-host fetch scheduling: waits, throttling and latency
+@app.get("/fetch-scheduler/stats")
+async def fetch_scheduler_stats():
+    return fetch_scheduler.stats()
+
+# Route to report shared recipe cache hit/miss counters
+@app.get("/recipe-cache/stats")
+async def recipe_cache_stats():
+    return bt.recipe_cache.stats()
+
+# Route to report how many scrapes were coalesced into another in-flight scrape of the same URL
+@app.get("/singleflight/stats")
+async def singleflight_stats():
+    return bt.scrape_flight.stats()
+
+# Route to report pipeline dispatch and stream consumer counters
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    return pipeline.stats()
+
+# Route to report shared Redis connection pool statistics
+@app.get("/redis-pool/stats")
+async def redis_pool_stats():
+    return ds.redis_pool_stats()
+
+# Route to report how Redis values are encoded: codec, compression, bytes stored and encode/decode time
+@app.get("/redis-codec/stats")
+async def redis_codec_stats():
+    return redis_codec.stats()
+
+# Route to report retries, hedges and circuit breaker states per dependency
+@app.get("/resilience/stats")
+async def resilience_stats():
+    return resilience.stats()
+
 # Route to process the HTML (retrieve submission from Redis, process HTML, and store in Redis)
 @app.post("/process-html") 
-async def process_html(submission: schemas.SubmissionRequest, background_tasks: BackgroundTasks):
+async def process_html(submission: schemas.SubmissionRequest):
     try:
+        # Turn the submission away before doing any work if the scrape queue is full
+        html_workers.check_capacity()
+
         session_id = submission.session_id  # Extract the session ID
         url = str(submission.url)
         user_id = submission.user_id
@@ -38,9 +140,16 @@ async def process_html(submission: schemas.SubmissionRequest, background_tasks:
             return {"error": "Failed to save session data to Redis"}
         logging.info("Session data retrieved successfully.")
 
-        # Add background task
-        background_tasks.add_task(bt.background_process_html, submission)
+        # Queue the scrape on the bounded worker pool
+        html_workers.submit(bt.background_process_html, submission)
         return {"message": "HTML processing has been started in the background."}
+    except PoolFull as e:
+        logging.warning(f"Rejected submission for session {submission.session_id}: {str(e)}")
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"error": "HTML processing is at capacity, retry later"},
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         logging.error(f"Error in process_html: {str(e)}")
         raise e
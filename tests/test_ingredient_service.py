@@ -0,0 +1,25 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from core.services.ingredient_service import DEFAULT_CONFIDENCE_THRESHOLD, parse_ingredient, parse_ingredients
+
+# The golden corpus shared with benchmarks/bench_ingredient_parser.py; an expected value of null means the
+# parser must escalate the line to GPT
+GOLDEN_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures" / "ingredients_golden.json"
+GOLDEN = json.loads(GOLDEN_PATH.read_text())
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=[case["line"] for case in GOLDEN])
+def test_golden_line(case):
+    result, confidence = parse_ingredient(case["line"])
+    actual = result if confidence >= DEFAULT_CONFIDENCE_THRESHOLD else None
+    assert actual == case["expected"]
+
+
+def test_parse_ingredients_escalates_only_uncertain_lines():
+    lines = [case["line"] for case in GOLDEN]
+    results, escalate = parse_ingredients(lines, DEFAULT_CONFIDENCE_THRESHOLD)
+    assert results == [case["expected"] for case in GOLDEN]
+    assert escalate == [case["line"] for case in GOLDEN if case["expected"] is None]
@@ -0,0 +1,35 @@
+import pytest
+
+from core.services.nutrition_service import (
+    normalize_fact, normalize_nutrition, normalize_nutrition_columns, nutrition_columns, parse_value,
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,5 g", (1.5, "g")),
+    ("1.500 mg", (1.5, "mg")),
+    ("12g", (12.0, "g")),
+    ("1,040 mg", (1040.0, "mg")),
+    ("12,50 g", (12.5, "g")),
+    ("about 12 (g)", (12.0, "g")),
+    ("315 kcal", (315.0, "kcal")),
+    ("1 1/2 cups", (1.5, "cup")),
+    (300, (300.0, None)),
+])
+def test_parse_value(value, expected):
+    assert parse_value(value) == expected
+
+
+def test_stated_unit_wins_over_schema_default():
+    assert normalize_fact("sodiumContent", "1,5 g") == {"name": "sodiumContent", "quantity": 1.5, "unit": "g"}
+    assert normalize_fact("sodiumContent", "300") == {"name": "sodiumContent", "quantity": 300.0, "unit": "mg"}
+
+
+def test_columns_match_single_records():
+    records = [
+        {"@type": "NutritionInformation", "calories": "200 kcal", "fiberContent": None, "sodiumContent": "1,5 g"},
+        {"sodiumContent": "300", "calories": "100", "fatContent": "0 g"},
+        {},
+        {"fatContent": "0 g", "recipeYield": ["8", "8 servings"], "recipeName": "Soup"},
+    ]
+    assert normalize_nutrition_columns(nutrition_columns(records)) == [normalize_nutrition(record) for record in records]
@@ -1,7 +1,18 @@
+import contextlib
 import logging
-from fastapi import FastAPI, HTTPException
+import secrets
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from core.configs import schemas, settings
 from core.services import data_service as ds
+from core.services.codec_service import redis_codec
+from core.services.resilience_service import resilience
+from core.services import metrics_service as metrics
+from core.services.batch_service import batch_importer, format_event
+from core.services.http_service import http_client
+from core.services.pipeline_service import pipeline, VALIDATION_COMPLETE
+from core.services import progress_service as progress
+from core.services.progress_service import progress_hub, format_sse
 
 # Set up logging to track important events and errors throughout the app
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -9,9 +20,95 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Initialize FastAPI application
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup():
+    # Open the shared, pooled HTTP client once per instance when submissions are posted to facilitate-requests;
+    # in the other pipeline modes it is only created if something needs it
+    if pipeline.mode == "http":
+        await http_client.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Let phases already running in-process finish before the clients they use are closed
+    await pipeline.drain()
+    await progress_hub.close()
+    await http_client.close()
+    await ds.close_redis_pool()
+
+# Export the counters this service keeps as gauges on /metrics
+metrics.registry.register_collector("pipeline", pipeline.stats)
+metrics.registry.register_collector("redis_pool", ds.redis_pool_stats)
+metrics.registry.register_collector("redis_codec", redis_codec.stats)
+metrics.registry.register_collector("resilience", resilience.stats)
+metrics.registry.register_collector("batch", batch_importer.stats)
+metrics.registry.register_collector("progress", progress_hub.stats)
+
+# Route to expose latency histograms and component counters in Prometheus text format
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Route to report how pipeline messages were dispatched
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    return pipeline.stats()
+
+# Route to report shared Redis connection pool statistics
+@app.get("/redis-pool/stats")
+async def redis_pool_stats():
+    return ds.redis_pool_stats()
+
+# Route to report how Redis values are encoded: codec, compression, bytes stored and encode/decode time
+@app.get("/redis-codec/stats")
+async def redis_codec_stats():
+    return redis_codec.stats()
+
+# Route to report retries, hedges and circuit breaker states per dependency
+@app.get("/resilience/stats")
+async def resilience_stats():
+    return resilience.stats()
+
+# Admin route to report Redis memory by key type, sampled with SCAN and MEMORY USAGE (Redis is shared, so one
+# service serves it). It loads the shared Redis, so it needs the ADMIN_TOKEN and is disabled without one
+@app.get("/redis-memory/stats")
+async def redis_memory_stats(sample: int = None, prefix: str = None, x_admin_token: str = Header(None)):
+    if not settings.ADMIN_TOKEN or not secrets.compare_digest((x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    try:
+        return await redis_manager.memory_report(sample=sample, prefix=prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Initialize RedisManager
 redis_manager = ds.RedisManager()
 
+async def submit_url(session_id: str, user_id: str, url: str):
+    """
+    Store a submission in Redis and hand it to the next phase.
+
+    :param session_id: The session the URL is processed under.
+    :param user_id: The submitting user.
+    :param url: The validated URL.
+    :return: The stored submission.
+    """
+    # Prepare the message data to be saved in Redis
+    message_data = {
+        "session_id": session_id,
+        "url": url,
+        "user_id": user_id,
+        "phase": VALIDATION_COMPLETE
+    }
+
+    # Save the submission data to Redis under the key "submission" for the given session ID
+    await redis_manager.save_to_redis(session_id, "submission", message_data, prefix="temp")
+    logging.info(f"Submission stored in Redis for session: {session_id}")
+
+    await progress_hub.publish(session_id, progress.SUBMITTED, {"url": url})
+
+    # Hand the submission to the next phase (facilitate-request, or the in-process dispatcher)
+    await pipeline.publish(message_data)
+    return message_data
+
 # Route for starting the URL processing workflow (validation and storing submission in Redis)
 @app.post("/start")
 async def start_processing(submission: schemas.SubmissionRequest):
@@ -30,25 +127,13 @@ async def start_processing(submission: schemas.SubmissionRequest):
             logging.error(f"Invalid URL submitted for session: {submission.session_id}")
             raise HTTPException(status_code=400, detail="Invalid URL")
 
-        # Prepare the message data to be saved in Redis
-        message_data = {
-            "session_id": submission.session_id,
-            "url": str(submission.url),
-            "user_id": submission.user_id,
-            "phase": "validation_complete"
-        }
-
-        # Save the submission data to Redis under the key "submission" for the given session ID
-        await redis_manager.save_to_redis(submission.session_id, "submission", message_data, prefix="temp")
-        logging.info(f"Submission stored in Redis for session: {submission.session_id}")
-
-        # Send data to the facilitate-request endpoint using send_to_service
-        await ds.send_to_service(settings.FACILITATE_REQUEST, message_data, submission.session_id, "Facilitate Request")
+        session_data = await submit_url(submission.session_id, submission.user_id, str(submission.url))
 
-        # Return a success message along with the stored session data retrieved from Redis
+        # Return a success message along with the stored session data (not re-read from Redis: a fast
+        # pipeline may already have completed the session and deleted its submission key)
         return {
             "message": "Validation successful", 
-            "session_data": await redis_manager.get_from_redis(submission.session_id, "submission", prefix="temp")
+            "session_data": session_data
         }
 
     # Handle any unexpected errors during the submission process
@@ -57,6 +142,73 @@ async def start_processing(submission: schemas.SubmissionRequest):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+# Route for importing many URLs at once, streaming each URL's progress as its phases complete
+@app.post("/start-batch")
+async def start_batch(batch: schemas.BatchSubmissionRequest, request: Request):
+    """
+    API route to submit a batch of URLs. Duplicate URLs (same canonical URL) are processed once, at most
+    BATCH_MAX_CONCURRENCY URLs are in the pipeline at a time, and progress is streamed one event per URL and phase:
+    NDJSON by default, or Server-Sent Events when the client accepts text/event-stream. Unavailable (503) when
+    progress events are disabled, since they are what the batch follows.
+
+    :param batch: The user id, the URLs and an optional batch id.
+    :param request: The HTTP request, used to pick the stream format.
+    :return: A streaming response of progress events, ending with a batch_complete summary.
+    """
+    # Batch progress is followed through the sessions' progress events: without them every URL would wait out
+    # BATCH_URL_TIMEOUT and be reported failed
+    if not settings.PROGRESS_EVENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Batch imports need PROGRESS_EVENTS_ENABLED")
+    if not batch.urls:
+        raise HTTPException(status_code=400, detail="No URLs submitted")
+    if len(batch.urls) > settings.BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {settings.BATCH_MAX_URLS} URLs")
+
+    logging.info(f"Starting batch of {len(batch.urls)} URLs for user: {batch.user_id}")
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def progress():
+        async for event in batch_importer.run(batch.user_id, batch.urls, submit_url, batch_id=batch.batch_id):
+            yield format_event(event, sse=sse)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(progress(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+# Route for following a session's progress as Server-Sent Events instead of polling for the result
+@app.get("/progress/{session_id}")
+async def session_progress(session_id: str, request: Request):
+    """
+    API route that streams a session's progress: phase transitions and partial results (recipe name and image,
+    then ingredients, then nutrition) as each is written, ending with a completed or failed event.
+    A client that reconnects with Last-Event-ID resumes after the last event it received.
+
+    :param session_id: The session to follow.
+    :param request: The HTTP request, read for Last-Event-ID.
+    :return: A text/event-stream response.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+
+    async def stream():
+        events = progress_hub.events(session_id, after=after, heartbeat=settings.PROGRESS_HEARTBEAT)
+        # Unsubscribe as soon as the client goes away
+        async with contextlib.aclosing(events):
+            async for event in events:
+                yield format_sse(event)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Route to report progress publishing and subscription counters
+@app.get("/progress-hub/stats")
+async def progress_stats():
+    return progress_hub.stats()
+
+# Route to report batch import counters
+@app.get("/batch/stats")
+async def batch_stats():
+    return batch_importer.stats()
+
+
 # This block is executed when running the script directly, starting the FastAPI app using Uvicorn
 if __name__ == "__main__":
     import uvicorn